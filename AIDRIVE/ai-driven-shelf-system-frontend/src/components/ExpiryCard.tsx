@@ -3,6 +3,7 @@
 import { AlertTriangle, Calendar, Package, Clock } from 'lucide-react';
 import { formatDate, getDaysUntilExpiry, isExpired, isExpiringSoon, getStatusColor } from '@/utils/helper';
 import { Expiry, Product } from '@/types';
+import { getApiUrl } from '@/config/api';
 
 interface ExpiryCardProps {
   expiry: Expiry;
@@ -124,8 +125,17 @@ const ExpiryCard = ({ expiry, product, showActions = true, onAction }: ExpiryCar
       {expiry.image_path && (
         <div className="mt-4 pt-4 border-t border-gray-100">
           <p className="text-xs text-gray-500 mb-2">Scanned Image:</p>
-          <div className="w-full h-32 bg-gray-100 rounded-md flex items-center justify-center">
-            <Package className="w-8 h-8 text-gray-400" />
+          <div className="w-full h-32 bg-gray-100 rounded-md flex items-center justify-center overflow-hidden">
+            {expiry.image_id ? (
+              <img
+                src={getApiUrl(`/images/${expiry.image_id}/thumbnail`)}
+                alt="Scanned label"
+                loading="lazy"
+                className="h-full w-full object-contain"
+              />
+            ) : (
+              <Package className="w-8 h-8 text-gray-400" />
+            )}
           </div>
         </div>
       )}
@@ -42,8 +42,15 @@ export const useExpiry = () => {
     setError(null);
     try {
       const response = await expiryAPI.scanImage(productId, file);
-      setExpiryData(prev => [...prev, response.data]);
-      return response.data;
+      let job = response.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        job = (await expiryAPI.getScanJob(job.job_id)).data;
+      }
+      if (job.status !== 'done') {
+        throw { response: { data: { detail: job.error } } };
+      }
+      setExpiryData(prev => [...prev, job.result]);
+      return job.result;
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to scan expiry image');
       throw err;
@@ -52,6 +52,8 @@ export const expiryAPI = {
       },
     });
   },
+  // Long-polls an OCR scan job; the server holds the request for up to `wait` seconds
+  getScanJob: (jobId: string, wait: number = 8) => api.get(`/expiry/scan/jobs/${jobId}?wait=${wait}`),
 };
 
 export const alertsAPI = {
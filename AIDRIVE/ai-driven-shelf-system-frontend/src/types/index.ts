@@ -30,7 +30,9 @@ export interface Expiry {
   product_id: number;
   expiry_date: string;
   image_path?: string;
+  image_id?: number;
   detected_text?: string;
+  confidence?: number;
   product?: Product;
 }
 
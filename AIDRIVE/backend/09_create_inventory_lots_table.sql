@@ -0,0 +1,62 @@
+-- Unified lot ledger
+-- Replaces the expiry, manual_expiry and ocr_expiry tables with a single
+-- inventory_lots table keyed by source, backfills it from the old tables and
+-- leaves read-only views with the old names for reports and procedures.
+-- Lot ids are renumbered; the original id is kept in legacy_id.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS inventory_lots (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    source VARCHAR(20) NOT NULL,
+    product_id INT NOT NULL,
+    expiry_date DATE NOT NULL,
+    quantity INT DEFAULT 1,
+    detected_text VARCHAR(1000),
+    image_path VARCHAR(500),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    legacy_id INT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    INDEX idx_source (source),
+    INDEX idx_expiry_date (expiry_date),
+    INDEX idx_lots_product_expiry (product_id, expiry_date)
+);
+
+-- Backfill from the old tables
+INSERT INTO inventory_lots (source, product_id, expiry_date, quantity, detected_text, image_path, created_at, legacy_id)
+SELECT 'legacy', product_id, expiry_date, 1, detected_text, image_path, CURRENT_TIMESTAMP, id
+FROM expiry;
+
+INSERT INTO inventory_lots (source, product_id, expiry_date, quantity, detected_text, image_path, created_at, legacy_id)
+SELECT 'manual', product_id, expiry_date, COALESCE(quantity, 1), NULL, NULL, created_at, id
+FROM manual_expiry;
+
+INSERT INTO inventory_lots (source, product_id, expiry_date, quantity, detected_text, image_path, created_at, legacy_id)
+SELECT 'ocr', product_id, expiry_date, COALESCE(quantity, 1), detected_text, image_path, created_at, id
+FROM ocr_expiry;
+
+-- Keep the old tables around until the backfill has been checked
+RENAME TABLE expiry TO expiry_pre_ledger,
+             manual_expiry TO manual_expiry_pre_ledger,
+             ocr_expiry TO ocr_expiry_pre_ledger;
+
+-- Compatibility views with the old table names and columns
+CREATE VIEW expiry AS
+SELECT id, product_id, expiry_date, image_path, detected_text
+FROM inventory_lots
+WHERE source = 'legacy';
+
+CREATE VIEW manual_expiry AS
+SELECT id, product_id, expiry_date, quantity, created_at
+FROM inventory_lots
+WHERE source = 'manual';
+
+CREATE VIEW ocr_expiry AS
+SELECT id, product_id, expiry_date, detected_text, image_path, quantity, created_at
+FROM inventory_lots
+WHERE source = 'ocr';
+
+-- Verify the backfill
+SELECT source, COUNT(*) AS lots, SUM(quantity) AS units
+FROM inventory_lots
+GROUP BY source;
@@ -0,0 +1,26 @@
+-- Content-addressed image store
+-- Uploaded images are stored once per SHA-256 under IMAGE_STORE_DIR and
+-- referenced from inventory_lots.image_id. ref_count tracks how many lots
+-- point at each image; the app deletes the file when it reaches zero.
+-- Existing rows keep their image_path and have no image_id.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS stored_images (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sha256 CHAR(64) NOT NULL,
+    path VARCHAR(500) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_stored_images_sha256 (sha256)
+);
+
+ALTER TABLE inventory_lots
+    ADD COLUMN image_id INT NULL AFTER image_path,
+    ADD INDEX idx_lots_image_id (image_id),
+    ADD CONSTRAINT fk_lots_image FOREIGN KEY (image_id) REFERENCES stored_images(id) ON DELETE SET NULL;
+
+-- Verify
+SELECT COUNT(*) AS stored_images, COALESCE(SUM(ref_count), 0) AS references_held
+FROM stored_images;
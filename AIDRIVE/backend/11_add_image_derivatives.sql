@@ -0,0 +1,19 @@
+-- Image derivatives and archival
+-- display_path / thumbnail_path hold the downscaled copies made at ingest.
+-- The archive job recompresses (or drops) originals older than
+-- IMAGE_ORIGINAL_RETENTION_DAYS and sets archived_at. Existing images get
+-- their derivatives on the job's next run.
+
+USE shelf_management;
+
+ALTER TABLE stored_images
+    ADD COLUMN display_path VARCHAR(500) NULL AFTER ref_count,
+    ADD COLUMN thumbnail_path VARCHAR(500) NULL AFTER display_path,
+    ADD COLUMN archived_at DATETIME NULL AFTER thumbnail_path,
+    ADD INDEX idx_stored_images_created_at (created_at);
+
+-- Verify
+SELECT COUNT(*) AS stored_images,
+       SUM(thumbnail_path IS NULL) AS without_derivatives,
+       SUM(archived_at IS NOT NULL) AS archived
+FROM stored_images;
@@ -0,0 +1,13 @@
+-- OCR confidence on expiry lots
+-- Lots read from label images store the OCR confidence (0-1) of their
+-- expiry date; manual entries and rows from before this migration keep NULL.
+
+USE shelf_management;
+
+ALTER TABLE inventory_lots
+    ADD COLUMN confidence FLOAT NULL AFTER detected_text;
+
+-- Verify
+SELECT source, COUNT(*) AS lots, AVG(confidence) AS mean_confidence
+FROM inventory_lots
+GROUP BY source;
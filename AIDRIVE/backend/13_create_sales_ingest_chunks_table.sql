@@ -0,0 +1,20 @@
+-- Idempotency keys for bulk sales uploads
+-- POST /api/v1/sales/bulk with an Idempotency-Key header records each
+-- stored chunk here in the same transaction as its sales, so a retried
+-- upload skips chunks that are already in. Rows can be pruned once clients
+-- no longer retry (e.g. after a day).
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS sales_ingest_chunks (
+    idempotency_key VARCHAR(100) NOT NULL,
+    chunk_index INT NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (idempotency_key, chunk_index),
+    INDEX idx_sales_ingest_chunks_created_at (created_at)
+);
+
+-- Verify
+SELECT COUNT(DISTINCT idempotency_key) AS uploads, COUNT(*) AS chunks, COALESCE(SUM(row_count), 0) AS sales_rows
+FROM sales_ingest_chunks;
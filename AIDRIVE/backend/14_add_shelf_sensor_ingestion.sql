@@ -0,0 +1,25 @@
+-- Shelf sensor ingestion
+-- Sensor readings are coalesced per product and written as one stock row
+-- per flush window: shelf_sensor_value is the last reading, sensor_min /
+-- sensor_max / reading_count describe the window. sensor_calibrations
+-- converts a product's sensor value into units on the shelf. Rows from
+-- before this migration keep NULL in the new columns.
+
+USE shelf_management;
+
+ALTER TABLE stock
+    ADD COLUMN sensor_min FLOAT NULL AFTER timestamp,
+    ADD COLUMN sensor_max FLOAT NULL AFTER sensor_min,
+    ADD COLUMN reading_count INT NULL AFTER sensor_max,
+    ADD INDEX idx_stock_product_timestamp (product_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_calibrations (
+    product_id INT PRIMARY KEY,
+    tare FLOAT NOT NULL DEFAULT 0,
+    unit_weight FLOAT NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT fk_sensor_calibrations_product FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Verify
+SELECT COUNT(*) AS calibrated_products FROM sensor_calibrations;
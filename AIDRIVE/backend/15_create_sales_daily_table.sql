@@ -0,0 +1,31 @@
+-- Daily sales rollup
+-- Units and number of sales per product and day. The app adds to it in the
+-- same transaction as the sales it inserts (INSERT ... ON DUPLICATE KEY
+-- UPDATE); forecasts, the waste projection and GET /api/v1/sales/daily read it
+-- instead of scanning sales. After loading sales outside the app, rebuild
+-- it with `python -m app.services.sales_rollup [--since YYYY-MM-DD]` or
+-- POST /api/v1/admin/sales-daily/rebuild.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+    product_id INT NOT NULL,
+    day DATE NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    transactions INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, day),
+    INDEX idx_sales_daily_day (day),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing sales
+DELETE FROM sales_daily;
+INSERT INTO sales_daily (product_id, day, units, transactions)
+SELECT product_id, DATE(timestamp), COALESCE(SUM(quantity_sold), 0), COUNT(*)
+FROM sales
+WHERE timestamp IS NOT NULL
+GROUP BY product_id, DATE(timestamp);
+
+-- Verify
+SELECT COUNT(*) AS product_days, COALESCE(SUM(units), 0) AS units, COALESCE(SUM(transactions), 0) AS transactions
+FROM sales_daily;
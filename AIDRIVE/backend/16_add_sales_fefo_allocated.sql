@@ -0,0 +1,14 @@
+-- FEFO allocation marker on sales
+-- Sales stored through POST /api/v1/sales/bulk consume expiry lots in the
+-- same transaction and are stored with fefo_allocated = TRUE.
+-- POST /api/v1/expiry/fefo/replay consumes the remaining sales (e.g. loaded
+-- outside the app) and marks them, so each sale is consumed once.
+
+USE shelf_management;
+
+ALTER TABLE sales
+    ADD COLUMN fefo_allocated BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD INDEX idx_sales_fefo_pending (fefo_allocated, product_id);
+
+-- Verify
+SELECT fefo_allocated, COUNT(*) AS sales FROM sales GROUP BY fefo_allocated;
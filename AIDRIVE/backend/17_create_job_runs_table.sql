@@ -0,0 +1,21 @@
+-- Background job runs
+-- Each worker's scheduler claims a run by inserting its (job_name,
+-- scheduled_at) row; the primary key lets one worker run each fire time.
+-- The row then records the outcome for GET /api/v1/admin/jobs.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    job_name VARCHAR(50) NOT NULL,
+    scheduled_at DATETIME NOT NULL,
+    worker VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    started_at DATETIME,
+    duration_ms FLOAT,
+    error VARCHAR(1000),
+    result JSON,
+    PRIMARY KEY (job_name, scheduled_at)
+);
+
+-- Verify
+SELECT job_name, status, COUNT(*) AS runs FROM job_runs GROUP BY job_name, status;
@@ -0,0 +1,15 @@
+-- Stored demand forecasts
+-- The scheduled forecast refresh replaces these rows; GET /api/v1/forecast/
+-- reads them on every worker instead of a per-process cache.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS product_forecasts (
+    product_id INT NOT NULL PRIMARY KEY,
+    forecast INT NOT NULL,
+    computed_at DATETIME NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Verify
+SELECT COUNT(*) AS products, MIN(computed_at) AS oldest FROM product_forecasts;
@@ -0,0 +1,27 @@
+-- Markdowns and alert history
+-- The discount job stores the markdown applied to lots close to expiry on
+-- inventory_lots; the alerts job keeps one alerts row per expiry or
+-- low-stock alert from when it is raised until it resolves.
+
+USE shelf_management;
+
+ALTER TABLE inventory_lots
+    ADD COLUMN discount_percent INT NULL,
+    ADD COLUMN discounted_at DATETIME NULL;
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    type VARCHAR(20) NOT NULL,
+    product_id INT NOT NULL,
+    lot_id INT NULL,
+    details JSON,
+    first_seen_at DATETIME NOT NULL,
+    last_seen_at DATETIME NOT NULL,
+    resolved_at DATETIME NULL,
+    INDEX idx_alerts_open (resolved_at, type, product_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    FOREIGN KEY (lot_id) REFERENCES inventory_lots(id) ON DELETE CASCADE
+);
+
+-- Verify
+SELECT type, COUNT(*) AS open_alerts FROM alerts WHERE resolved_at IS NULL GROUP BY type;
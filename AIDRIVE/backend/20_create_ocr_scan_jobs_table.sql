@@ -0,0 +1,22 @@
+-- OCR scan job status
+-- POST /api/v1/expiry/scan records each job here and updates it when the
+-- OCR finishes, so GET /api/v1/expiry/scan/jobs/{job_id} works on any
+-- uvicorn worker. Finished jobs are pruned after OCR_JOB_TTL_SECONDS.
+
+USE shelf_management;
+
+CREATE TABLE IF NOT EXISTS ocr_scan_jobs (
+    job_id VARCHAR(32) NOT NULL PRIMARY KEY,
+    product_id INT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    created_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    result JSON,
+    error VARCHAR(500),
+    timings JSON,
+    suggestions JSON,
+    INDEX idx_ocr_scan_jobs_finished (finished_at)
+);
+
+-- Verify
+SELECT status, COUNT(*) AS jobs FROM ocr_scan_jobs GROUP BY status;
@@ -0,0 +1,13 @@
+-- Last reference time on stored images
+-- The images job skips images acquired in the last few minutes when it
+-- recounts references, so an upload whose lot is not committed yet keeps
+-- its image. Existing rows start from their upload time.
+
+USE shelf_management;
+
+ALTER TABLE stored_images ADD COLUMN acquired_at DATETIME NULL;
+
+UPDATE stored_images SET acquired_at = created_at WHERE acquired_at IS NULL;
+
+-- Verify
+SELECT COUNT(*) AS images, MAX(acquired_at) AS last_acquired FROM stored_images;
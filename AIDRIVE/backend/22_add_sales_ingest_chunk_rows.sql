@@ -0,0 +1,11 @@
+-- Chunk size on bulk sales idempotency records
+-- Chunk indexes only line up between attempts cut into chunks of the same
+-- size, so each chunk records SALES_BULK_CHUNK_ROWS and a retry with another
+-- size is refused (409). Existing rows stay NULL and are accepted.
+
+USE shelf_management;
+
+ALTER TABLE sales_ingest_chunks ADD COLUMN chunk_rows INT NULL;
+
+-- Verify
+SELECT chunk_rows, COUNT(*) AS chunks FROM sales_ingest_chunks GROUP BY chunk_rows;
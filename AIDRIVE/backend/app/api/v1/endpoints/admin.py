@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.dependencies import get_db
+from app.db.database import async_pool_metrics, sync_pool_metrics
+from app.db.pool_metrics import pool_stats
+from app.middlewares.ocr_admission import ocr_admission
+from app.services.ocr_cache import ocr_cache
+from app.services.ocr_jobs import ocr_jobs
+from app.services.sales_rollup import rebuild_sales_daily
+from app.services.scheduler import scheduler
+from app.services.sensor_ingest import sensor_ingest
+
+router = APIRouter()
+
+@router.get("/jobs", status_code=status.HTTP_200_OK)
+def list_jobs(db: Session = Depends(get_db)):
+    """Schedule, last run status and duration of every background job"""
+    return scheduler.status(db)
+
+@router.post("/jobs/{job_name}/run", status_code=status.HTTP_200_OK)
+async def run_job(job_name: str):
+    """Run a background job immediately"""
+    if job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await scheduler.run_job(job_name)
+
+@router.get("/ocr-cache", status_code=status.HTTP_200_OK)
+def get_ocr_cache_stats():
+    """Hit/miss counters and size of the OCR result cache"""
+    return ocr_cache.stats()
+
+@router.delete("/ocr-cache", status_code=status.HTTP_204_NO_CONTENT)
+def clear_ocr_cache():
+    """Drop every cached OCR result (memory and disk)"""
+    ocr_cache.clear()
+
+@router.get("/ocr-timings", status_code=status.HTTP_200_OK)
+def get_ocr_timings():
+    """Time spent per OCR stage (decode, detect, each preprocessing variant) since startup"""
+    return ocr_jobs.stage_timings()
+
+@router.get("/ocr-admission", status_code=status.HTTP_200_OK)
+def get_ocr_admission():
+    """OCR uploads in flight and queued, pending worker images and rejection counts"""
+    return {"requests": ocr_admission.stats(), "workers": ocr_jobs.queue_stats()}
+
+@router.get("/db-pool", status_code=status.HTTP_200_OK)
+def get_db_pool():
+    """This worker's sync and async connection pools: checkouts, wait time, overflow, connections in use"""
+    return pool_stats(sync_pool_metrics, async_pool_metrics)
+
+@router.get("/sensor-ingest", status_code=status.HTTP_200_OK)
+def get_sensor_ingest():
+    """Shelf sensor readings received, buffered and written, drop counters and flush latency"""
+    return sensor_ingest.stats()
+
+@router.post("/sensor-ingest/flush", status_code=status.HTTP_200_OK)
+async def flush_sensor_ingest():
+    """Write buffered sensor readings now"""
+    return {"rows_written": await asyncio.to_thread(sensor_ingest.flush)}
+
+@router.post("/sales-daily/rebuild", status_code=status.HTTP_200_OK)
+def rebuild_sales_rollup(since: Optional[date] = None, db: Session = Depends(get_db)):
+    """Recompute the daily sales rollup from the sales table, from `since` on (all days when omitted)"""
+    try:
+        return rebuild_sales_daily(db, since)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to rebuild sales_daily: {e}")
+        raise HTTPException(status_code=500, detail="Failed to rebuild the daily sales rollup.")
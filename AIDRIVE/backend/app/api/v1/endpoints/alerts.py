@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status, HTTPException
 from sqlalchemy.orm import Session
 from app.dependencies import get_db
-from app.services.expiry_logic import get_expiry_alerts
-from app.db.models.product import Product
-from app.db.models.stock import Stock
+from app.services.expiry_logic import get_alerts as current_alerts, get_alert_history
 from app.core.logger import logger
 
 router = APIRouter()
@@ -11,25 +10,32 @@ router = APIRouter()
 @router.get("/", status_code=status.HTTP_200_OK)
 def get_alerts(db: Session = Depends(get_db)):
     try:
-        alerts = get_expiry_alerts(db)
-        # Add low-stock alerts
-        products = db.query(Product).all()
-        for product in products:
-            stock = db.query(Stock).filter(Stock.product_id == product.id).order_by(Stock.timestamp.desc()).first()
-            current_stock = getattr(stock, "current_stock", None)
-            min_stock = getattr(product, "min_stock", None)
-            if (
-                current_stock is not None
-                and min_stock is not None
-                and int(current_stock) < int(min_stock)
-            ):
-                alerts.append({
-                    "type": "low_stock",
-                    "product_id": product.id,
-                    "current_stock": current_stock,
-                    "min_stock": min_stock
-                })
-        return alerts
+        return current_alerts(db)
     except Exception as e:
         logger.error(f"Failed to get alerts: {e}")
         raise HTTPException(status_code=500, detail="Failed to get alerts.")
+
+@router.get("/history", status_code=status.HTTP_200_OK)
+def get_alerts_history(
+    open_only: Optional[bool] = False,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Alerts recorded by the alerts job, newest first; resolved_at is null while open"""
+    try:
+        return [
+            {
+                "id": alert.id,
+                "type": alert.type,
+                "product_id": alert.product_id,
+                "lot_id": alert.lot_id,
+                "details": alert.details,
+                "first_seen_at": alert.first_seen_at,
+                "last_seen_at": alert.last_seen_at,
+                "resolved_at": alert.resolved_at,
+            }
+            for alert in get_alert_history(db, open_only, limit)
+        ]
+    except Exception as e:
+        logger.error(f"Failed to get alert history: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get alert history.")
@@ -1,24 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.db.schemas.expiry import Expiry, ExpiryCreate
 from app.db.schemas.manual_expiry import ManualExpiry, ManualExpiryCreate
 from app.db.models.expiry import Expiry as ExpiryModel
 from app.db.models.manual_expiry import ManualExpiry as ManualExpiryModel
 from app.db.models.product import Product as ProductModel
-from app.dependencies import get_db
-from app.services.ocr_engine import extract_expiry_from_image
+from app.dependencies import get_async_db, get_db
+from app.services.ocr_jobs import OCRQueueFull, ocr_jobs
+from app.services.image_store import image_store
+from app.services.expiry_logic import get_expiry_calendar, invalidate_expiry_calendar
+from app.services.fefo_allocator import replay_sales
+from app.services.waste_projection import get_waste_projection
 from app.core.logger import logger
-import shutil
-import os
 from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/manual", response_model=ManualExpiry, status_code=status.HTTP_201_CREATED)
-def add_expiry_manual(expiry: ManualExpiryCreate, db: Session = Depends(get_db)):
+async def add_expiry_manual(expiry: ManualExpiryCreate, db: AsyncSession = Depends(get_async_db)):
     # Check product exists
-    if not db.query(ProductModel).filter(ProductModel.id == expiry.product_id).first():
+    if not await db.get(ProductModel, expiry.product_id):
         logger.error(f"Product not found for expiry: {expiry.product_id}")
         raise HTTPException(status_code=404, detail="Product not found")
     # Validate expiry_date
@@ -27,40 +31,96 @@ def add_expiry_manual(expiry: ManualExpiryCreate, db: Session = Depends(get_db))
         raise HTTPException(status_code=400, detail="Expiry date cannot be in the past.")
     db_expiry = ManualExpiryModel(**expiry.dict())
     db.add(db_expiry)
-    db.commit()
-    db.refresh(db_expiry)
+    await db.commit()
+    invalidate_expiry_calendar()
+    await db.refresh(db_expiry)
     return db_expiry
 
-@router.post("/scan", response_model=Expiry, status_code=status.HTTP_201_CREATED)
-def scan_expiry(product_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.post("/scan", status_code=status.HTTP_202_ACCEPTED)
+def scan_expiry(
+    background_tasks: BackgroundTasks,
+    product_id: Optional[int] = None,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue an OCR scan; poll /scan/jobs/{job_id} for the stored expiry.
+    Without `product_id` the product is matched from the label text.
+    """
     # Check product exists
-    if not db.query(ProductModel).filter(ProductModel.id == product_id).first():
+    if product_id is not None and not db.query(ProductModel).filter(ProductModel.id == product_id).first():
         logger.error(f"Product not found for expiry scan: {product_id}")
         raise HTTPException(status_code=404, detail="Product not found")
-    # Save uploaded file
-    upload_dir = "images/expiry_samples/"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename or "unknown.jpg")
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        expiry_date = extract_expiry_from_image(file_path)
-        if not expiry_date:
-            logger.warning(f"OCR failed to extract expiry date from {file.filename}")
-            raise HTTPException(status_code=422, detail="Could not extract expiry date from image.")
-        db_expiry = ExpiryModel(product_id=product_id, expiry_date=expiry_date, image_path=file_path, detected_text=None)
-        db.add(db_expiry)
+        # Streamed into the content-addressed store; the job holds one reference
+        image = image_store.save_stream(file.file)
+        image_id = image_store.acquire(db, [image])[image["sha256"]]
         db.commit()
-        db.refresh(db_expiry)
-        return db_expiry
+        background_tasks.add_task(image_store.ingest, [image_id])
     except Exception as e:
-        logger.error(f"OCR scan failed: {e}")
-        raise HTTPException(status_code=422, detail="OCR scan failed. Please upload a valid image.")
+        logger.error(f"Failed to store scan image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to store image")
+    try:
+        return ocr_jobs.submit(product_id, image, image_id)
+    except Exception as e:
+        image_store.release(db, image_id)
+        db.commit()
+        background_tasks.add_task(image_store.purge, [image_id])
+        if isinstance(e, OCRQueueFull):
+            logger.warning("OCR scan refused, queue full")
+            raise HTTPException(
+                status_code=503, detail="OCR queue is full. Please retry later.", headers={"Retry-After": str(e.retry_after)}
+            )
+        logger.error(f"Failed to queue OCR scan: {e}")
+        raise HTTPException(status_code=503, detail="OCR workers unavailable.")
+
+@router.get("/scan/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_scan_job(job_id: str, wait: float = Query(0, ge=0, le=30)):
+    """OCR job status; with `wait` > 0, hold the request until the job finishes or `wait` seconds pass"""
+    job = await ocr_jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job
 
 @router.get("/", response_model=List[Expiry])
-def list_expiry(db: Session = Depends(get_db)):
-    return db.query(ExpiryModel).all()
+async def list_expiry(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(ExpiryModel))).all()
 
 @router.get("/manual/", response_model=List[ManualExpiry])
-def list_manual_expiry(db: Session = Depends(get_db)):
-    return db.query(ManualExpiryModel).all()
+async def list_manual_expiry(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(ManualExpiryModel))).all()
+
+@router.get("/calendar", status_code=status.HTTP_200_OK)
+def expiry_calendar(days: int = Query(30, ge=1, le=365), db: Session = Depends(get_db)):
+    """Units expiring per day and category over the next `days` days"""
+    try:
+        return get_expiry_calendar(db, days)
+    except Exception as e:
+        logger.error(f"Failed to build expiry calendar: {e}")
+        raise HTTPException(status_code=500, detail="Failed to build expiry calendar.")
+
+@router.post("/fefo/replay", status_code=status.HTTP_200_OK)
+def fefo_replay(since: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """
+    Consume lot quantities, first-expired-first-out, for sales not allocated
+    when stored (e.g. loaded outside the app). Each sale is consumed once.
+    """
+    try:
+        return replay_sales(db, since)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"FEFO replay failed: {e}")
+        raise HTTPException(status_code=500, detail="FEFO replay failed.")
+
+@router.get("/waste-projection", status_code=status.HTTP_200_OK)
+def waste_projection(
+    days: int = Query(7, ge=1, le=60),
+    simulations: int = Query(0, ge=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    """Projected units expiring unsold per day, optionally with Monte Carlo bands"""
+    try:
+        return get_waste_projection(db, days, simulations)
+    except Exception as e:
+        logger.error(f"Failed to project waste: {e}")
+        raise HTTPException(status_code=500, detail="Failed to project waste.")
@@ -0,0 +1,38 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from app.dependencies import get_db
+from app.db.models.stored_image import StoredImage
+from app.services.image_store import image_store, MEDIA_TYPES
+from app.core.logger import logger
+
+router = APIRouter()
+
+def _serve(db, image_id, kind):
+    image = db.query(StoredImage).filter(StoredImage.id == image_id).first()
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        image_store.ensure_derivatives(db, image)
+    except Exception as e:
+        logger.error(f"Failed to make derivatives for image {image_id}: {e}")
+    path = image.thumbnail_path if kind == "thumbnail" else image.display_path
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image file not found")
+    # Image ids map to one content hash, so browsers may cache indefinitely
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{image.sha256}-{kind}"',
+    }
+    return FileResponse(path, media_type=MEDIA_TYPES.get(os.path.splitext(path)[1]), headers=headers)
+
+@router.get("/{image_id}", status_code=status.HTTP_200_OK)
+def get_image(image_id: int, db: Session = Depends(get_db)):
+    """Bounded-resolution display copy of a stored image"""
+    return _serve(db, image_id, "display")
+
+@router.get("/{image_id}/thumbnail", status_code=status.HTTP_200_OK)
+def get_image_thumbnail(image_id: int, db: Session = Depends(get_db)):
+    """Small thumbnail of a stored image for listings"""
+    return _serve(db, image_id, "thumbnail")
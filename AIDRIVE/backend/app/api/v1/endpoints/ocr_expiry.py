@@ -1,98 +1,232 @@
-from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, status, HTTPException, UploadFile, File, Form
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.dependencies import get_db
-from app.db.models.ocr_expiry import OCRExpiry
+from typing import List, Optional
+from app.dependencies import get_async_db, get_db
+from app.db.models.ocr_expiry import OCRExpiry as OCRExpiryModel
 from app.db.models.product import Product
 from app.db.schemas.ocr_expiry import OCRExpiryCreate, OCRExpiryUpdate, OCRExpiry
+from app.services.expiry_logic import invalidate_expiry_calendar
+from app.services.image_store import image_store
+from app.services.ocr_jobs import OCRQueueFull, ocr_jobs
+from app.services.product_index import product_index
+from app.core.config import settings
 from app.core.logger import logger
+import io
 import os
-from datetime import datetime
+import zipfile
+from datetime import date
 
 router = APIRouter()
 
 @router.post("/", response_model=OCRExpiry, status_code=status.HTTP_201_CREATED)
-def create_ocr_expiry(expiry: OCRExpiryCreate, db: Session = Depends(get_db)):
+async def create_ocr_expiry(expiry: OCRExpiryCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new OCR expiry entry"""
     try:
         # Check if product exists
-        product = db.query(Product).filter(Product.id == expiry.product_id).first()
+        product = await db.get(Product, expiry.product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        
-        db_expiry = OCRExpiry(**expiry.dict())
+
+        db_expiry = OCRExpiryModel(**expiry.dict())
         db.add(db_expiry)
-        db.commit()
-        db.refresh(db_expiry)
+        await db.commit()
+        invalidate_expiry_calendar()
+        await db.refresh(db_expiry)
         return db_expiry
     except Exception as e:
         logger.error(f"Failed to create OCR expiry: {e}")
         raise HTTPException(status_code=500, detail="Failed to create OCR expiry")
 
 @router.post("/upload", response_model=OCRExpiry, status_code=status.HTTP_201_CREATED)
-async def upload_ocr_expiry(
-    product_id: int,
-    expiry_date: str,
+def upload_ocr_expiry(
+    background_tasks: BackgroundTasks,
+    expiry_date: date,
+    product_id: Optional[int] = None,
     detected_text: str = None,
     quantity: int = 1,
     file: UploadFile = File(None),
     db: Session = Depends(get_db)
 ):
-    """Upload OCR expiry entry with optional image file"""
+    """
+    Upload OCR expiry entry with optional image file. Without `product_id`
+    the product is matched from `detected_text`.
+    """
+    if product_id is None:
+        match = product_index.best_match(db, detected_text) if detected_text else None
+        if match is None:
+            raise HTTPException(status_code=422, detail="Could not match detected_text to a product. Please give product_id.")
+        product_id = match["product_id"]
     try:
         # Check if product exists
         product = db.query(Product).filter(Product.id == product_id).first()
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        # Save image if provided
+        # Image is streamed into the content-addressed store
         image_path = None
+        image_id = None
         if file:
-            # Create uploads directory if it doesn't exist
-            upload_dir = "uploads/ocr_images"
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"ocr_{product_id}_{timestamp}_{file.filename}"
-            image_path = f"{upload_dir}/{filename}"
-            
-            # Save file
-            with open(image_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            image = image_store.save_stream(file.file)
+            image_path = image["path"]
+            image_id = image_store.acquire(db, [image])[image["sha256"]]
         
         # Create OCR expiry entry
-        db_expiry = OCRExpiry(
+        db_expiry = OCRExpiryModel(
             product_id=product_id,
             expiry_date=expiry_date,
             detected_text=detected_text,
             image_path=image_path,
+            image_id=image_id,
             quantity=quantity
         )
         db.add(db_expiry)
         db.commit()
+        invalidate_expiry_calendar()
+        if image_id is not None:
+            background_tasks.add_task(image_store.ingest, [image_id])
         db.refresh(db_expiry)
         return db_expiry
     except Exception as e:
         logger.error(f"Failed to upload OCR expiry: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload OCR expiry")
 
+def _expand_uploads(files):
+    """(filename, bytes) for every uploaded image, unpacking .zip archives."""
+    images = []
+    for file in files:
+        content = file.file.read()
+        if (file.filename or "").lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                members = [member for member in archive.infolist() if not member.is_dir()]
+                # The request size limit does not cover what an archive expands to
+                if sum(member.file_size for member in members) > settings.OCR_BATCH_MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413, detail=f"Archive expands to more than {settings.OCR_BATCH_MAX_UPLOAD_BYTES} bytes"
+                    )
+                for member in members:
+                    images.append((os.path.basename(member.filename), archive.read(member)))
+        else:
+            images.append((file.filename or "unknown.jpg", content))
+    return images
+
+# A plain def on purpose: FastAPI runs it in its threadpool, which keeps the
+# wait for the OCR workers, the file writes and the sync session off the loop
+@router.post("/batch", status_code=status.HTTP_200_OK)
+def upload_ocr_expiry_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    product_id: Optional[int] = Form(None),
+    product_ids: Optional[List[int]] = Form(None),
+    quantity: int = Form(1),
+    db: Session = Depends(get_db)
+):
+    """
+    OCR many label images (or .zip archives of them) in parallel and store
+    every extracted expiry with one bulk insert. Give either one `product_id`
+    for the whole batch or one `product_ids` entry per image.
+    """
+    try:
+        images = _expand_uploads(files)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    if not images:
+        raise HTTPException(status_code=400, detail="No images uploaded")
+    if len(images) > settings.OCR_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.OCR_BATCH_MAX_FILES} images per batch")
+    if product_ids:
+        if len(product_ids) != len(images):
+            raise HTTPException(status_code=400, detail="product_ids must have one entry per image")
+    elif product_id is not None:
+        product_ids = [product_id] * len(images)
+    else:
+        raise HTTPException(status_code=400, detail="product_id or product_ids is required")
+
+    known = dict(db.query(Product.id, Product.category).filter(Product.id.in_(set(product_ids))))
+    try:
+        readings = ocr_jobs.extract_many(
+            [content for _, content in images], [known.get(pid) for pid in product_ids]
+        )
+    except OCRQueueFull as e:
+        logger.warning(f"Batch OCR refused, queue full: {len(images)} images")
+        raise HTTPException(
+            status_code=503, detail="OCR queue is full. Please retry later.", headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        logger.error(f"Batch OCR failed: {e}")
+        raise HTTPException(status_code=503, detail="OCR workers unavailable.")
+
+    rows, results, stored = [], [], []
+    for (filename, content), pid, reading in zip(images, product_ids, readings):
+        result = {
+            "filename": filename,
+            "product_id": pid,
+            "expiry_date": None,
+            "confidence": reading["confidence"],
+            "image_path": None,
+            "error": None
+        }
+        if pid not in known:
+            result["error"] = "Product not found"
+        elif not reading["expiry_date"]:
+            result["error"] = "Could not extract expiry date from image."
+            if reading["confidence"]:
+                result["error"] = "Expiry date could not be read reliably. Please enter it manually."
+        else:
+            image = image_store.describe(content)
+            result.update(expiry_date=reading["expiry_date"], image_path=image["path"])
+            rows.append({
+                "product_id": pid,
+                "expiry_date": date.fromisoformat(reading["expiry_date"]),
+                "detected_text": reading["detected_text"],
+                "confidence": reading["confidence"],
+                "image_path": image["path"],
+                "quantity": quantity
+            })
+            stored.append((image, content))
+        results.append(result)
+
+    created = []
+    try:
+        if rows:
+            # Files go in before the rows that point at them; duplicates only once
+            created = image_store.write_new({image["sha256"]: (image, content) for image, content in stored}.values())
+            image_ids = image_store.acquire(db, [image for image, _ in stored])
+            for row, (image, _) in zip(rows, stored):
+                row["image_id"] = image_ids[image["sha256"]]
+            db.execute(insert(OCRExpiryModel), rows)
+            db.commit()
+            invalidate_expiry_calendar()
+            background_tasks.add_task(image_store.ingest, list(image_ids.values()))
+    except Exception as e:
+        db.rollback()
+        image_store.discard(db, created)
+        logger.error(f"Failed to store batch OCR expiries: {e}")
+        raise HTTPException(status_code=500, detail="Failed to store OCR expiries")
+
+    return {
+        "processed": len(results),
+        "inserted": len(rows),
+        "failed": len(results) - len(rows),
+        "results": results
+    }
+
 @router.get("/", response_model=List[OCRExpiry])
-def get_ocr_expiries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_ocr_expiries(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """Get all OCR expiry entries"""
     try:
-        expiries = db.query(OCRExpiry).offset(skip).limit(limit).all()
+        expiries = (await db.scalars(select(OCRExpiryModel).offset(skip).limit(limit))).all()
         return expiries
     except Exception as e:
         logger.error(f"Failed to get OCR expiries: {e}")
         raise HTTPException(status_code=500, detail="Failed to get OCR expiries")
 
 @router.get("/{expiry_id}", response_model=OCRExpiry)
-def get_ocr_expiry(expiry_id: int, db: Session = Depends(get_db)):
+async def get_ocr_expiry(expiry_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific OCR expiry entry"""
     try:
-        expiry = db.query(OCRExpiry).filter(OCRExpiry.id == expiry_id).first()
+        expiry = await db.scalar(select(OCRExpiryModel).where(OCRExpiryModel.id == expiry_id))
         if not expiry:
             raise HTTPException(status_code=404, detail="OCR expiry not found")
         return expiry
@@ -101,39 +235,44 @@ def get_ocr_expiry(expiry_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to get OCR expiry")
 
 @router.put("/{expiry_id}", response_model=OCRExpiry)
-def update_ocr_expiry(expiry_id: int, expiry: OCRExpiryUpdate, db: Session = Depends(get_db)):
+async def update_ocr_expiry(expiry_id: int, expiry: OCRExpiryUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update an OCR expiry entry"""
     try:
-        db_expiry = db.query(OCRExpiry).filter(OCRExpiry.id == expiry_id).first()
+        db_expiry = await db.scalar(select(OCRExpiryModel).where(OCRExpiryModel.id == expiry_id))
         if not db_expiry:
             raise HTTPException(status_code=404, detail="OCR expiry not found")
-        
+
         update_data = expiry.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_expiry, field, value)
-        
-        db.commit()
-        db.refresh(db_expiry)
+
+        await db.commit()
+        invalidate_expiry_calendar()
+        await db.refresh(db_expiry)
         return db_expiry
     except Exception as e:
         logger.error(f"Failed to update OCR expiry: {e}")
         raise HTTPException(status_code=500, detail="Failed to update OCR expiry")
 
 @router.delete("/{expiry_id}", status_code=status.HTTP_200_OK)
-def delete_ocr_expiry(expiry_id: int, db: Session = Depends(get_db)):
+async def delete_ocr_expiry(expiry_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """Delete an OCR expiry entry"""
     try:
-        expiry = db.query(OCRExpiry).filter(OCRExpiry.id == expiry_id).first()
+        expiry = await db.scalar(select(OCRExpiryModel).where(OCRExpiryModel.id == expiry_id))
         if not expiry:
             raise HTTPException(status_code=404, detail="OCR expiry not found")
-        
-        # Delete associated image file if it exists
-        if expiry.image_path and os.path.exists(expiry.image_path):
-            os.remove(expiry.image_path)
-        
-        db.delete(expiry)
-        db.commit()
+
+        # Drop the image reference; the file goes once nothing else uses it
+        if expiry.image_id is not None:
+            await db.run_sync(image_store.release, expiry.image_id)
+            background_tasks.add_task(image_store.purge, [expiry.image_id])
+        elif expiry.image_path:
+            background_tasks.add_task(image_store.purge_legacy_path, expiry.image_path)
+
+        await db.delete(expiry)
+        await db.commit()
+        invalidate_expiry_calendar()
         return {"message": "OCR expiry deleted successfully"}
     except Exception as e:
         logger.error(f"Failed to delete OCR expiry: {e}")
-        raise HTTPException(status_code=500, detail="Failed to delete OCR expiry") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to delete OCR expiry") 
@@ -1,60 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.schemas.product import Product, ProductCreate, ProductUpdate
 from app.db.models.product import Product as ProductModel
-from app.dependencies import get_db
+from app.dependencies import get_async_db, get_db
+from app.services.expiry_logic import invalidate_expiry_calendar
+from app.services.product_index import product_index
 from app.core.logger import logger
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Product])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(ProductModel).all()
+async def list_products(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(ProductModel))).all()
 
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db)):
     # Check for duplicate barcode
-    if db.query(ProductModel).filter(ProductModel.barcode == product.barcode).first():
+    if await db.scalar(select(ProductModel.id).where(ProductModel.barcode == product.barcode)):
         logger.warning(f"Attempt to create duplicate barcode: {product.barcode}")
         raise HTTPException(status_code=409, detail="Product with this barcode already exists.")
     db_product = ProductModel(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    product_index.upsert(db_product)
     return db_product
 
+@router.get("/match", status_code=status.HTTP_200_OK)
+def match_products(text: str = Query(..., min_length=1), limit: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)):
+    """Products whose name or barcode best matches OCR label text, best first"""
+    # Sync: scoring (and the first index load) is CPU work for the threadpool
+    try:
+        return product_index.match(db, text, limit)
+    except Exception as e:
+        logger.error(f"Failed to match products: {e}")
+        raise HTTPException(status_code=500, detail="Failed to match products.")
+
 @router.get("/{product_id}", response_model=Product)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    product = await db.get(ProductModel, product_id)
     if not product:
         logger.error(f"Product not found: {product_id}")
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 @router.put("/{product_id}", response_model=Product)
-def update_product(product_id: int, product: ProductUpdate, db: Session = Depends(get_db)):
-    db_product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+async def update_product(product_id: int, product: ProductUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_product = await db.get(ProductModel, product_id)
     if not db_product:
         logger.error(f"Product not found for update: {product_id}")
         raise HTTPException(status_code=404, detail="Product not found")
     # Check for duplicate barcode if changed
     if product.barcode and product.barcode != db_product.barcode:
-        if db.query(ProductModel).filter(ProductModel.barcode == product.barcode).first():
+        if await db.scalar(select(ProductModel.id).where(ProductModel.barcode == product.barcode)):
             logger.warning(f"Attempt to update to duplicate barcode: {product.barcode}")
             raise HTTPException(status_code=409, detail="Product with this barcode already exists.")
     for key, value in product.dict(exclude_unset=True).items():
         setattr(db_product, key, value)
-    db.commit()
-    db.refresh(db_product)
+    await db.commit()
+    invalidate_expiry_calendar()
+    await db.refresh(db_product)
+    product_index.upsert(db_product)
     return db_product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_product = await db.get(ProductModel, product_id)
     if not db_product:
         logger.error(f"Product not found for delete: {product_id}")
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(db_product)
-    db.commit()
+    await db.delete(db_product)
+    await db.commit()
+    invalidate_expiry_calendar()
+    product_index.remove(product_id)
     return {"detail": "Deleted"}
@@ -0,0 +1,214 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.dependencies import get_async_db
+from app.db.models.product import Product
+from app.db.models.sales import Sales as SalesModel
+from app.db.models.sales_daily import SalesDaily as SalesDailyModel
+from app.db.models.sales_ingest_chunk import SalesIngestChunk
+from app.db.schemas.sales import SalesDaily
+from app.services.fefo_allocator import allocate_sales
+from app.services.sales_rollup import add_statement, daily_totals
+from app.services.sales_ingest import CSV_TYPES, NDJSON_TYPES, BodyTooLarge, iter_lines, parse_rows, read_csv_header
+from app.core.config import settings
+from app.core.logger import logger
+from datetime import date, datetime, timedelta
+import time
+
+router = APIRouter()
+
+class _BulkUpload:
+    """State of one bulk upload: counters, reported errors and product ids known to exist."""
+
+    def __init__(self, idempotency_key, stored_chunks):
+        self.idempotency_key = idempotency_key
+        self.stored_chunks = stored_chunks
+        self.known_products = set()
+        self.received = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.duplicate = 0
+        self.chunks = 0
+        self.errors = []
+
+    def reject(self, errors):
+        self.rejected += len(errors)
+        room = settings.SALES_BULK_MAX_ERRORS - len(self.errors)
+        self.errors.extend(errors[:max(room, 0)])
+
+async def _store_chunk(db, upload, lines, columns):
+    """Validate one chunk and insert its rows in a single transaction."""
+    index = upload.chunks
+    upload.chunks += 1
+    upload.received += len(lines)
+    if index in upload.stored_chunks:
+        upload.duplicate += upload.stored_chunks[index]
+        return
+
+    # Parsing and validation are CPU work; keep them off the event loop
+    rows, errors = await run_in_threadpool(parse_rows, lines, columns)
+    unknown = {row["product_id"] for row in rows} - upload.known_products
+    if unknown:
+        upload.known_products.update(await db.scalars(select(Product.id).where(Product.id.in_(unknown))))
+    errors.extend(
+        {"line": row["line"], "error": f"product_id: product {row['product_id']} not found"}
+        for row in rows if row["product_id"] not in upload.known_products
+    )
+    now = datetime.utcnow()
+    values = [
+        {"product_id": row["product_id"], "timestamp": row["timestamp"] or now, "quantity_sold": row["quantity_sold"], "fefo_allocated": True}
+        for row in rows if row["product_id"] in upload.known_products
+    ]
+
+    if upload.idempotency_key:
+        try:
+            await db.execute(insert(SalesIngestChunk).values(
+                idempotency_key=upload.idempotency_key, chunk_index=index, row_count=len(values),
+                chunk_rows=settings.SALES_BULK_CHUNK_ROWS,
+            ))
+        except IntegrityError:
+            # A concurrent attempt with the same key stored this chunk first
+            await db.rollback()
+            upload.duplicate += len(values)
+            return
+    if values:
+        await db.execute(insert(SalesModel), values)
+        # Same transaction, so the daily rollup never counts a chunk twice or misses one
+        await db.execute(add_statement(db.get_bind().dialect.name), daily_totals(values))
+        # Consume expiry lots first-expired-first-out, also in this transaction
+        await db.run_sync(allocate_sales, values)
+    await db.commit()
+    upload.inserted += len(values)
+    upload.reject(sorted(errors, key=lambda error: error["line"]))
+
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def bulk_create_sales(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Stream sales line items as NDJSON (application/x-ndjson) or CSV
+    (text/csv with a product_id,quantity_sold[,timestamp] header). Rows are
+    validated and inserted in chunks, one transaction per chunk that also
+    consumes the sold units from expiry lots; invalid lines are skipped and
+    reported, as are lines over SALES_BULK_MAX_LINE_BYTES. Bodies over
+    SALES_BULK_MAX_BODY_BYTES get 413 (chunks stored before the limit was
+    reached are kept). Retrying with the same Idempotency-Key skips the
+    chunks an earlier attempt stored; a retry under a different
+    SALES_BULK_CHUNK_ROWS gets 409, since its chunks would not line up.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_TYPES | CSV_TYPES:
+        raise HTTPException(status_code=415, detail="Send sales as application/x-ndjson or text/csv.")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > settings.SALES_BULK_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload larger than {settings.SALES_BULK_MAX_BODY_BYTES} bytes.")
+    started = time.perf_counter()
+    try:
+        stored_chunks = {}
+        if idempotency_key:
+            stored = (await db.execute(
+                select(SalesIngestChunk.chunk_index, SalesIngestChunk.row_count, SalesIngestChunk.chunk_rows)
+                .where(SalesIngestChunk.idempotency_key == idempotency_key)
+            )).all()
+            # Release the connection while waiting for the body
+            await db.commit()
+            # Rows stored before chunk_rows was recorded are taken as matching
+            sizes = {chunk_rows for _, _, chunk_rows in stored if chunk_rows is not None}
+            if sizes - {settings.SALES_BULK_CHUNK_ROWS}:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Idempotency-Key was used with {sizes.pop()} rows per chunk, "
+                    f"not {settings.SALES_BULK_CHUNK_ROWS}. Send the upload under a new key.",
+                )
+            stored_chunks = {chunk_index: row_count for chunk_index, row_count, _ in stored}
+        upload = _BulkUpload(idempotency_key, stored_chunks)
+        columns = None
+        chunk = []
+        lines = iter_lines(request.stream(), settings.SALES_BULK_MAX_LINE_BYTES, settings.SALES_BULK_MAX_BODY_BYTES)
+        async for number, line in lines:
+            if line is None:
+                if media_type in CSV_TYPES and columns is None:
+                    raise HTTPException(status_code=400, detail="CSV header line is too long")
+                upload.received += 1
+                upload.reject([{"line": number, "error": f"line longer than {settings.SALES_BULK_MAX_LINE_BYTES} bytes"}])
+                continue
+            if not line.strip():
+                continue
+            if media_type in CSV_TYPES and columns is None:
+                try:
+                    columns = read_csv_header(line)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                continue
+            chunk.append((number, line))
+            if len(chunk) >= settings.SALES_BULK_CHUNK_ROWS:
+                await _store_chunk(db, upload, chunk, columns)
+                chunk = []
+        if chunk:
+            await _store_chunk(db, upload, chunk, columns)
+    except HTTPException:
+        raise
+    except BodyTooLarge as e:
+        logger.warning(f"Bulk sales upload refused: {e}")
+        raise HTTPException(status_code=413, detail=f"{e}. Chunks stored before the limit are kept.")
+    except Exception as e:
+        logger.error(f"Failed to ingest sales: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to ingest sales. Stored chunks are kept; retry with the same Idempotency-Key to resume."
+        )
+    seconds = time.perf_counter() - started
+    return {
+        "received": upload.received,
+        "inserted": upload.inserted,
+        "rejected": upload.rejected,
+        "duplicate": upload.duplicate,
+        "chunks": upload.chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(upload.received / seconds) if seconds else 0,
+        "errors": upload.errors,
+    }
+
+@router.get("/daily", response_model=List[SalesDaily])
+async def get_daily_sales(
+    product_id: int,
+    days: int = Query(90, ge=1, le=3660),
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Units and number of sales per day for a product over the `days` days
+    ending with `end` (default today), from the daily rollup; days without
+    sales are included with zeros.
+    """
+    end = end or date.today()
+    first = end - timedelta(days=days - 1)
+    try:
+        rows = {
+            row.day: row for row in await db.scalars(
+                select(SalesDailyModel).where(
+                    SalesDailyModel.product_id == product_id,
+                    SalesDailyModel.day >= first,
+                    SalesDailyModel.day <= end,
+                )
+            )
+        }
+    except Exception as e:
+        logger.error(f"Failed to get daily sales for product {product_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get daily sales.")
+    history = []
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        row = rows.get(day)
+        history.append({
+            "product_id": product_id,
+            "day": day,
+            "units": row.units if row else 0,
+            "transactions": row.transactions if row else 0,
+        })
+    return history
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from app.dependencies import get_async_db
+from app.db.models.product import Product
+from app.db.models.sensor_calibration import SensorCalibration as SensorCalibrationModel
+from app.db.schemas.stock import SensorCalibration, SensorCalibrationBase, SensorReading
+from app.services.sensor_ingest import sensor_ingest
+from app.core.logger import logger
+
+router = APIRouter()
+
+@router.post("/readings", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_readings(readings: List[SensorReading]):
+    """
+    Buffer shelf sensor readings. They are coalesced per product and written
+    to stock in the next flush; readings that do not fit the buffer are dropped.
+    """
+    accepted = sensor_ingest.submit_many(
+        [(reading.product_id, reading.value, reading.timestamp) for reading in readings]
+    )
+    return {"accepted": accepted, "dropped": len(readings) - accepted}
+
+@router.get("/calibration/{product_id}", response_model=SensorCalibration)
+async def get_calibration(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Sensor calibration of a product"""
+    calibration = await db.get(SensorCalibrationModel, product_id)
+    if not calibration:
+        raise HTTPException(status_code=404, detail="Sensor calibration not found")
+    return calibration
+
+@router.put("/calibration/{product_id}", response_model=SensorCalibration)
+async def set_calibration(product_id: int, calibration: SensorCalibrationBase, db: AsyncSession = Depends(get_async_db)):
+    """Set how a product's sensor value converts to units: (value - tare) / unit_weight"""
+    if not await db.get(Product, product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    try:
+        db_calibration = await db.get(SensorCalibrationModel, product_id)
+        if db_calibration is None:
+            db_calibration = SensorCalibrationModel(product_id=product_id)
+            db.add(db_calibration)
+        for field, value in calibration.dict().items():
+            setattr(db_calibration, field, value)
+        await db.commit()
+        await db.refresh(db_calibration)
+        return db_calibration
+    except Exception as e:
+        logger.error(f"Failed to set sensor calibration: {e}")
+        raise HTTPException(status_code=500, detail="Failed to set sensor calibration")
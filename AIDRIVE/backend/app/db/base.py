@@ -3,4 +3,4 @@ from sqlalchemy.orm import declarative_base
 Base = declarative_base()
 
 # Import all models here for Alembic autogeneration and metadata
-from .models import product, expiry, stock, sales, manual_expiry, ocr_expiry
+from .models import product, job_run, stored_image, inventory_lot, expiry, stock, sales, sales_daily, product_forecast, sales_ingest_chunk, sensor_calibration, manual_expiry, ocr_expiry, ocr_scan_job, alert
@@ -1,17 +1,131 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from app.core.config import settings
+from app.db.pool_metrics import PoolMetrics
 
-# Use the MySQL database URL
-DATABASE_URL = settings.get_database_url
+# In-memory SQLite is reopened as one named shared-cache database, so the
+# sync and async engines (and every thread) see the same tables
+SQLITE_MEMORY_DATABASE = "file:shelf_management?mode=memory&cache=shared&uri=true"
 
-# Create MySQL engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
-)
+def is_sqlite_memory(url):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+def normalize_database_url(url):
+    """`url`, with plain in-memory SQLite URLs pointed at the shared in-memory database."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return f"{parsed.drivername}:///{SQLITE_MEMORY_DATABASE}"
+    return url
+
+DATABASE_URL = normalize_database_url(settings.get_database_url)
+
+def engine_options(url, metrics):
+    """
+    create_engine keyword arguments from the DB_* settings, with the
+    dialect's default pool class instrumented by `metrics`. Size, overflow
+    and timeout only apply to queue pools. In-memory SQLite keeps a single
+    connection (StaticPool), which also keeps the database alive; see
+    TransactionLock.
+    """
+    base = make_url(url).get_dialect().get_pool_class(make_url(url))
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "echo": settings.DB_ECHO,
+    }
+    if is_sqlite_memory(url):
+        base = StaticPool
+        options["connect_args"] = {"check_same_thread": False}
+        # Sessions end their own transactions; a rollback on return would
+        # land in whichever transaction holds the shared connection by then
+        options["pool_reset_on_return"] = None
+    options["poolclass"] = metrics.pool_class(base)
+    if issubclass(base, QueuePool):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+class TransactionLock:
+    """
+    Lets one transaction at a time use the single connection of an
+    in-memory SQLite engine; threads sharing it would otherwise commit each
+    other's transactions. The thread holding it may begin more (nested
+    sessions share the connection anyway). Any thread may end a
+    transaction, as FastAPI can close a request's session on another
+    thread than the one that used it.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._changed = threading.Condition()
+        self._owner = None
+        self._depth = 0
+
+    def begin(self, conn):
+        thread = threading.get_ident()
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._depth == 0 or self._owner == thread, self.timeout):
+                raise TimeoutError(f"No transaction slot on the in-memory database after {self.timeout}s")
+            self._owner = thread
+            self._depth += 1
+
+    def end(self):
+        with self._changed:
+            if self._depth:
+                self._depth -= 1
+            if not self._depth:
+                self._owner = None
+                self._changed.notify_all()
+
+    def _ending(self, end_transaction):
+        def wrapper(dbapi_connection):
+            try:
+                end_transaction(dbapi_connection)
+            finally:
+                self.end()
+        return wrapper
+
+    def attach(self, engine):
+        event.listen(engine, "begin", self.begin)
+        # The commit and rollback events fire before the DBAPI call, so the
+        # slot is only given up once the dialect has actually ended it
+        dialect = engine.dialect
+        dialect.do_commit = self._ending(dialect.do_commit)
+        dialect.do_rollback = self._ending(dialect.do_rollback)
+
+sync_pool_metrics = PoolMetrics("sync")
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, sync_pool_metrics))
+sync_pool_metrics.attach(engine)
+if is_sqlite_memory(DATABASE_URL):
+    TransactionLock(settings.DB_POOL_TIMEOUT).attach(engine)
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Enforce foreign keys (and their ON DELETE actions) as MySQL does, and
+    use WAL with a busy timeout on database files so readers do not block
+    the writer. In-memory databases ignore the journal mode.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+def listen_sqlite_pragmas(engine):
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+
+listen_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -21,3 +135,31 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async drivers for the same databases, used by the async request path
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url):
+    """`url` with its sync driver swapped for the async one (ASYNC_DATABASE_URL wins if set)."""
+    if settings.ASYNC_DATABASE_URL:
+        return normalize_database_url(settings.ASYNC_DATABASE_URL)
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+ASYNC_DATABASE = async_database_url(DATABASE_URL)
+async_pool_metrics = PoolMetrics("async")
+async_engine = create_async_engine(ASYNC_DATABASE, **engine_options(ASYNC_DATABASE, async_pool_metrics))
+async_pool_metrics.attach(async_engine.sync_engine)
+listen_sqlite_pragmas(async_engine.sync_engine)
+
+# Objects stay usable after commit without another round trip to refresh them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,15 +1,33 @@
 from .product import Product
+from .job_run import JobRun
+from .stored_image import StoredImage
+from .inventory_lot import InventoryLot
 from .expiry import Expiry
 from .stock import Stock
 from .sales import Sales
+from .sales_daily import SalesDaily
+from .product_forecast import ProductForecast
+from .sales_ingest_chunk import SalesIngestChunk
+from .sensor_calibration import SensorCalibration
 from .manual_expiry import ManualExpiry
 from .ocr_expiry import OCRExpiry
+from .ocr_scan_job import OCRScanJob
+from .alert import Alert
 
 __all__ = [
     "Product",
+    "JobRun",
+    "StoredImage",
+    "InventoryLot",
     "Expiry", 
     "Stock",
     "Sales",
+    "SalesDaily",
+    "ProductForecast",
+    "SalesIngestChunk",
+    "SensorCalibration",
     "ManualExpiry",
-    "OCRExpiry"
+    "OCRExpiry",
+    "OCRScanJob",
+    "Alert"
 ]
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, JSON
+from app.db.base import Base
+from datetime import datetime
+
+class Alert(Base):
+    """
+    Alert history written by the scheduled alerts job: one row per alert
+    (type, product and lot) from when it is first raised until it clears.
+    """
+    __tablename__ = "alerts"
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(20), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    lot_id = Column(Integer, ForeignKey("inventory_lots.id", ondelete="CASCADE"), nullable=True)
+    details = Column(JSON, nullable=True)
+    first_seen_at = Column(DateTime, default=datetime.now, nullable=False)
+    last_seen_at = Column(DateTime, default=datetime.now, nullable=False)
+    # NULL while the alert is still open
+    resolved_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_alerts_open", "resolved_at", "type", "product_id"),
+    )
@@ -1,10 +1,5 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
-from app.db.base import Base
+from app.db.models.inventory_lot import InventoryLot
 
-class Expiry(Base):
-    __tablename__ = "expiry"
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    expiry_date = Column(Date, nullable=False)
-    image_path = Column(String(500), nullable=True)
-    detected_text = Column(String(1000), nullable=True)
+class Expiry(InventoryLot):
+    """Lots from the original OCR scan endpoint, stored in inventory_lots."""
+    __mapper_args__ = {"polymorphic_identity": "legacy"}
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, Index
+from app.db.base import Base
+from datetime import datetime
+
+class InventoryLot(Base):
+    """
+    Single ledger for every expiry lot. `source` tells where the lot came
+    from; Expiry, ManualExpiry and OCRExpiry are mapped onto this table
+    with single-table inheritance.
+    """
+    __tablename__ = "inventory_lots"
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(20), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    expiry_date = Column(Date, nullable=False, index=True)
+    quantity = Column(Integer, default=1)
+    detected_text = Column(String(1000), nullable=True)
+    # OCR confidence (0-1) of the date read from the image; NULL for manual entries
+    confidence = Column(Float, nullable=True)
+    image_path = Column(String(500), nullable=True)
+    # Content-addressed image; image_path is kept as its path for readers
+    image_id = Column(Integer, ForeignKey("stored_images.id", ondelete="SET NULL"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Markdown applied by the discount job to lots close to expiry
+    discount_percent = Column(Integer, nullable=True)
+    discounted_at = Column(DateTime, nullable=True)
+    # Id of the row in the pre-ledger table, kept for rows backfilled by 09_create_inventory_lots_table.sql
+    legacy_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("idx_lots_product_expiry", "product_id", "expiry_date"),
+    )
+    __mapper_args__ = {"polymorphic_on": source}
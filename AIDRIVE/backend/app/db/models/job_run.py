@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Float, String, DateTime, JSON
+from app.db.base import Base
+from datetime import datetime
+
+class JobRun(Base):
+    """
+    One row per scheduled run of a background job. Workers claim a run by
+    inserting its (job_name, scheduled_at) key, so each fire time runs on
+    exactly one worker; the row then records the outcome.
+    """
+    __tablename__ = "job_runs"
+    job_name = Column(String(50), primary_key=True)
+    scheduled_at = Column(DateTime, primary_key=True)
+    worker = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False, default="running")
+    started_at = Column(DateTime, default=datetime.now)
+    duration_ms = Column(Float, nullable=True)
+    error = Column(String(1000), nullable=True)
+    result = Column(JSON, nullable=True)
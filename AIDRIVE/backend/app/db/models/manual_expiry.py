@@ -1,11 +1,5 @@
-from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey
-from app.db.base import Base
-from datetime import datetime
+from app.db.models.inventory_lot import InventoryLot
 
-class ManualExpiry(Base):
-    __tablename__ = "manual_expiry"
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    expiry_date = Column(Date, nullable=False)
-    quantity = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+class ManualExpiry(InventoryLot):
+    """Manually entered lots, stored in inventory_lots."""
+    __mapper_args__ = {"polymorphic_identity": "manual"}
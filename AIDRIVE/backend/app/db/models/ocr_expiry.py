@@ -1,13 +1,5 @@
-from sqlalchemy import Column, Integer, Date, String, DateTime, ForeignKey
-from app.db.base import Base
-from datetime import datetime
+from app.db.models.inventory_lot import InventoryLot
 
-class OCRExpiry(Base):
-    __tablename__ = "ocr_expiry"
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    expiry_date = Column(Date, nullable=False)
-    detected_text = Column(String(1000), nullable=True)
-    image_path = Column(String(500), nullable=True)
-    quantity = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+class OCRExpiry(InventoryLot):
+    """Lots captured through OCR uploads, stored in inventory_lots."""
+    __mapper_args__ = {"polymorphic_identity": "ocr"}
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from app.db.base import Base
+from datetime import datetime
+
+class OCRScanJob(Base):
+    """
+    Status of a queued OCR scan, written by the worker that queued it so a
+    poll handled by any other worker finds it too.
+    """
+    __tablename__ = "ocr_scan_jobs"
+    job_id = Column(String(32), primary_key=True)
+    product_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False, default="queued")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set once the job is done or failed; finished jobs expire after OCR_JOB_TTL_SECONDS
+    finished_at = Column(DateTime, nullable=True, index=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String(500), nullable=True)
+    timings = Column(JSON, nullable=True)
+    suggestions = Column(JSON, nullable=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.db.base import Base
+from datetime import datetime
+
+class ProductForecast(Base):
+    """
+    Latest demand forecast per product, written by the scheduled forecast
+    refresh so every worker serves the same forecasts without running the
+    model per request.
+    """
+    __tablename__ = "product_forecasts"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    forecast = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.now, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Boolean, DateTime, ForeignKey, Index, false
 from app.db.base import Base
 from datetime import datetime
 
@@ -7,4 +7,10 @@ class Sales(Base):
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    quantity_sold = Column(Integer, default=0) 
\ No newline at end of file
+    quantity_sold = Column(Integer, default=0)
+    # Set once the sale has been consumed from expiry lots (see fefo_allocator)
+    fefo_allocated = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    __table_args__ = (
+        Index("idx_sales_fefo_pending", "fefo_allocated", "product_id"),
+    )
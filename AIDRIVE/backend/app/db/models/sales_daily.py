@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from app.db.base import Base
+
+class SalesDaily(Base):
+    """
+    Units sold and number of sales per product and day, kept up to date as
+    sales are inserted (see app/services/sales_rollup.py) so history
+    queries read one row per product-day instead of every transaction.
+    """
+    __tablename__ = "sales_daily"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True, index=True)
+    units = Column(Integer, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
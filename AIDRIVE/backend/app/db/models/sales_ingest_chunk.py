@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db.base import Base
+from datetime import datetime
+
+class SalesIngestChunk(Base):
+    """
+    One row per stored chunk of a bulk sales upload sent with an
+    Idempotency-Key. It is committed together with the chunk's sales, so a
+    retry of the same upload skips the chunks that are already in.
+    """
+    __tablename__ = "sales_ingest_chunks"
+    idempotency_key = Column(String(100), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True, autoincrement=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    # SALES_BULK_CHUNK_ROWS when stored: chunk indexes only line up with it
+    chunk_rows = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from app.db.base import Base
+from datetime import datetime
+
+class SensorCalibration(Base):
+    """
+    Converts a product's shelf sensor value to units on the shelf:
+    current_stock = (value - tare) / unit_weight, rounded.
+    """
+    __tablename__ = "sensor_calibrations"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    tare = Column(Float, nullable=False, default=0.0)
+    unit_weight = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
 from app.db.base import Base
 from datetime import datetime
 
@@ -8,4 +8,13 @@ class Stock(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     current_stock = Column(Integer, default=0)
     shelf_sensor_value = Column(Float, default=0.0)
-    timestamp = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    # Rows written by sensor ingestion stand for a window of readings:
+    # shelf_sensor_value is the last one, these are its range and count
+    sensor_min = Column(Float, nullable=True)
+    sensor_max = Column(Float, nullable=True)
+    reading_count = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("idx_stock_product_timestamp", "product_id", "timestamp"),
+    )
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from app.db.base import Base
+from datetime import datetime
+
+class StoredImage(Base):
+    """
+    One row per distinct uploaded image in the content-addressed store.
+    `ref_count` is the number of lots pointing at it; the file is deleted
+    once it drops to zero. `display_path` and `thumbnail_path` are the
+    downscaled copies made at ingest; once `archived_at` is set, `path` is
+    the recompressed original (or the display copy if it was purged).
+    """
+    __tablename__ = "stored_images"
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    path = Column(String(500), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    display_path = Column(String(500), nullable=True)
+    thumbnail_path = Column(String(500), nullable=True)
+    archived_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Last time a reference was added; reconcile leaves recent images alone
+    # while the lots that will hold those references are being inserted
+    acquired_at = Column(DateTime, default=datetime.utcnow, nullable=True)
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Counters for one engine's connection pool: checkouts, how long they
+    waited for a connection (including opening one and the pre-ping),
+    timeouts, new connections and invalidations. Read them next to the
+    pool's own size/overflow/checked-out numbers to size pools per worker.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.counts = {"checkouts": 0, "checkins": 0, "connects": 0, "invalidations": 0, "timeouts": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def pool_class(self, base):
+        """A subclass of `base` that reports checkouts and their wait to these metrics."""
+        metrics = self
+
+        class InstrumentedPool(base):
+            def connect(self):
+                started = time.perf_counter()
+                try:
+                    return super().connect()
+                except exc.TimeoutError:
+                    metrics._count("timeouts")
+                    raise
+                finally:
+                    metrics._record_wait(time.perf_counter() - started)
+
+        InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+        return InstrumentedPool
+
+    def attach(self, engine):
+        """Listen to `engine`'s pool events (kept across engine.dispose())."""
+        self.pool = engine.pool
+        event.listen(engine, "checkin", lambda *args: self._count("checkins"))
+        event.listen(engine, "connect", lambda *args: self._count("connects"))
+        event.listen(engine, "invalidate", lambda *args: self._count("invalidations"))
+        event.listen(engine, "engine_disposed", lambda conn: setattr(self, "pool", engine.pool))
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self.counts["checkouts"] += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self):
+        pool = self.pool
+        with self._lock:
+            checkouts = self.counts["checkouts"]
+            stats = {
+                **self.counts,
+                "wait_ms_total": round(self._wait_total * 1000, 2),
+                "wait_ms_mean": round(self._wait_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 2),
+            }
+        stats["pool"] = type(pool).__name__ if pool is not None else None
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                in_use=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+def pool_stats(*metrics):
+    """Stats for several pools, tagged with this worker's pid."""
+    return {"pid": os.getpid(), **{m.name: m.stats() for m in metrics}}
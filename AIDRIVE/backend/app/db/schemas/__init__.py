@@ -12,8 +12,9 @@ __all__ = [
     "ExpiryBase", "ExpiryCreate", "ExpiryUpdate", "Expiry",
     # Stock schemas
     "StockBase", "StockCreate", "StockUpdate", "Stock",
+    "SensorReading", "SensorCalibrationBase", "SensorCalibration",
     # Sales schemas
-    "SalesBase", "SalesCreate", "SalesUpdate", "Sales",
+    "SalesBase", "SalesCreate", "SalesUpdate", "Sales", "SalesBulkRow", "SalesDaily",
     # Manual Expiry schemas
     "ManualExpiryBase", "ManualExpiryCreate", "ManualExpiryUpdate", "ManualExpiry",
     # OCR Expiry schemas
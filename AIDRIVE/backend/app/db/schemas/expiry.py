@@ -13,6 +13,8 @@ class ExpiryCreate(ExpiryBase):
 
 class Expiry(ExpiryBase):
     id: int
+    image_id: Optional[int] = None
+    confidence: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -6,6 +6,7 @@ class OCRExpiryBase(BaseModel):
     product_id: int
     expiry_date: date
     detected_text: Optional[str] = None
+    confidence: Optional[float] = None
     image_path: Optional[str] = None
     quantity: Optional[int] = 1
 
@@ -16,11 +17,13 @@ class OCRExpiryUpdate(BaseModel):
     product_id: Optional[int] = None
     expiry_date: Optional[date] = None
     detected_text: Optional[str] = None
+    confidence: Optional[float] = None
     image_path: Optional[str] = None
     quantity: Optional[int] = None
 
 class OCRExpiry(OCRExpiryBase):
     id: int
+    image_id: Optional[int] = None
     created_at: datetime
 
     class Config:
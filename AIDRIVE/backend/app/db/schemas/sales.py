@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 class SalesBase(BaseModel):
     product_id: int
@@ -14,4 +14,17 @@ class Sales(SalesBase):
     id: int
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class SalesBulkRow(SalesBase):
+    """One line item of a bulk upload; the timestamp defaults to the time it is stored."""
+    quantity_sold: int = Field(..., gt=0)
+
+class SalesDaily(BaseModel):
+    product_id: int
+    day: date
+    units: int
+    transactions: int
+
+    class Config:
+        from_attributes = True
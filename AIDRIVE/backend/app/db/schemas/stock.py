@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
@@ -13,6 +13,25 @@ class StockCreate(StockBase):
 
 class Stock(StockBase):
     id: int
+    sensor_min: Optional[float] = None
+    sensor_max: Optional[float] = None
+    reading_count: Optional[int] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class SensorReading(BaseModel):
+    product_id: int
+    value: float
+    timestamp: Optional[datetime] = None
+
+class SensorCalibrationBase(BaseModel):
+    tare: float = 0.0
+    unit_weight: float = Field(..., gt=0)
+
+class SensorCalibration(SensorCalibrationBase):
+    product_id: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
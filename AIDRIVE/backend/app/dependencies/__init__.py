@@ -1,4 +1,4 @@
-from app.db.database import get_db
+from app.db.database import get_async_db, get_db
 
 # Placeholder for authentication dependency
 def get_current_user():
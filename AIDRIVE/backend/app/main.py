@@ -1,8 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1.endpoints import products, expiry, alerts, forecast, manual_expiry, ocr_expiry
+from app.api.v1.endpoints import products, expiry, alerts, forecast, manual_expiry, ocr_expiry, admin, images, sales, sensors
+from app.core.config import settings
+from app.middlewares.ocr_admission import OCRAdmissionMiddleware, ocr_admission
+from app.db.database import async_engine
+from app.services.scheduler import scheduler
+from app.services.ocr_jobs import ocr_jobs
+from app.services.sensor_ingest import sensor_ingest
+from app.services import waste_projection
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+    await sensor_ingest.start(settings.SENSOR_UDP_HOST, settings.SENSOR_UDP_PORT, settings.SENSOR_UNIX_SOCKET)
+    yield
+    await sensor_ingest.stop()
+    await scheduler.stop()
+    ocr_jobs.shutdown()
+    waste_projection.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
+
+# Bound OCR uploads in flight so they cannot starve other endpoints; added
+# first so CORS headers still reach rejected requests
+app.add_middleware(OCRAdmissionMiddleware, admission=ocr_admission)
 
 # CORS for frontend
 app.add_middleware(
@@ -19,6 +43,10 @@ app.include_router(alerts.router, prefix="/api/v1/alerts", tags=["alerts"])
 app.include_router(forecast.router, prefix="/api/v1/forecast", tags=["forecast"])
 app.include_router(manual_expiry.router, prefix="/api/v1/manual-expiry", tags=["manual-expiry"])
 app.include_router(ocr_expiry.router, prefix="/api/v1/ocr-expiry", tags=["ocr-expiry"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(images.router, prefix="/api/v1/images", tags=["images"])
+app.include_router(sales.router, prefix="/api/v1/sales", tags=["sales"])
+app.include_router(sensors.router, prefix="/api/v1/sensors", tags=["sensors"])
 
 # --- Auto-create DB tables on startup ---
 from app.db.base import Base
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import math
+import time
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class OCRAdmission:
+    """
+    Admission control for OCR uploads. At most `max_in_flight` requests run
+    at once and up to `max_queued` more wait for a slot; beyond that requests
+    are turned away with 429, and queued requests that wait longer than
+    `queue_timeout` seconds get 503. Both carry a Retry-After estimated from
+    recent request durations. Bodies larger than the per-path byte limit get
+    413 before they are spooled to disk.
+    """
+
+    def __init__(self, max_in_flight, max_queued, queue_timeout, limits):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        # Path -> maximum request body bytes
+        self.limits = limits
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore = None
+        self._loop = None
+        # Moving average of admitted request durations
+        self._mean_seconds = 1.0
+        self.metrics = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_too_large": 0,
+        }
+
+    def _slots(self):
+        # asyncio primitives belong to one event loop; a new loop (app restart,
+        # test client) starts with all slots free
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free, at least 1."""
+        waiting = self.queued + self.in_flight + 1
+        return max(1, math.ceil(self._mean_seconds * waiting / self.max_in_flight))
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed; returns None or (status, detail)."""
+        slots = self._slots()
+        if self.in_flight + self.queued >= self.max_in_flight + self.max_queued:
+            self.metrics["rejected_queue_full"] += 1
+            return 429, "Too many OCR uploads in progress. Please retry later."
+        self.queued += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.metrics["rejected_queue_timeout"] += 1
+            return 503, "OCR is saturated. Please retry later."
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self.metrics["admitted"] += 1
+        return None
+
+    def release(self, seconds):
+        self.in_flight -= 1
+        self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * seconds
+        self._semaphore.release()
+
+    def stats(self):
+        return {
+            **self.metrics,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "mean_request_seconds": round(self._mean_seconds, 3),
+            "retry_after": self.retry_after(),
+        }
+
+
+class OCRAdmissionMiddleware:
+    """ASGI middleware applying an OCRAdmission to POSTs to its paths."""
+
+    def __init__(self, app, admission):
+        self.app = app
+        self.admission = admission
+
+    async def _reject(self, send, status, detail, retry_after=None):
+        headers = [(b"content-type", b"application/json")]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = self.admission.limits.get(scope["path"].rstrip("/"))
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        admission = self.admission
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            admission.metrics["rejected_too_large"] += 1
+            return await self._reject(send, 413, f"Upload larger than {limit} bytes.")
+
+        rejected = await admission.acquire()
+        if rejected is not None:
+            logger.warning(f"OCR admission rejected {scope['path']}: {rejected[1]}")
+            return await self._reject(send, *rejected, retry_after=admission.retry_after())
+
+        # Chunked bodies have no Content-Length; count bytes as they arrive
+        # and cut the request off once it exceeds the limit
+        received = 0
+        too_large = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if too_large and not started:
+                return
+            started = True
+            await send(message)
+
+        began = time.perf_counter()
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        finally:
+            admission.release(time.perf_counter() - began)
+        if too_large and not started:
+            admission.metrics["rejected_too_large"] += 1
+            await self._reject(send, 413, f"Upload larger than {limit} bytes.")
+
+
+ocr_admission = OCRAdmission(
+    settings.OCR_MAX_IN_FLIGHT_REQUESTS,
+    settings.OCR_MAX_QUEUED_REQUESTS,
+    settings.OCR_QUEUE_TIMEOUT_SECONDS,
+    {
+        "/api/v1/expiry/scan": settings.OCR_MAX_UPLOAD_BYTES,
+        "/api/v1/ocr-expiry/upload": settings.OCR_MAX_UPLOAD_BYTES,
+        "/api/v1/ocr-expiry/batch": settings.OCR_BATCH_MAX_UPLOAD_BYTES,
+    },
+)
@@ -1,78 +1,177 @@
-from datetime import date, timedelta
-from app.db.models.expiry import Expiry
-from app.db.models.manual_expiry import ManualExpiry
-from app.db.models.ocr_expiry import OCRExpiry
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, update
+from app.core.config import settings
+from app.db.models.alert import Alert
+from app.db.models.inventory_lot import InventoryLot
 from app.db.models.product import Product
 from app.db.models.stock import Stock
 from app.utils.date_utils import days_until
 
+# Lots expiring within this many days raise alerts and get discounted
+EXPIRY_ALERT_DAYS = 3
+
+# Calendar results keyed by (day computed, window length). Buckets are relative
+# to today, so entries from previous days are dropped on the next lookup.
+_calendar_cache = {}
+
+def _expiring_lots(db):
+    """Lots with stock left that expire within EXPIRY_ALERT_DAYS (incl. past)."""
+    # Lots fully consumed by sales (see fefo_allocator) no longer need alerts
+    cutoff = date.today() + timedelta(days=EXPIRY_ALERT_DAYS)
+    return (
+        db.query(InventoryLot)
+        .filter(InventoryLot.expiry_date < cutoff, InventoryLot.quantity > 0)
+        .order_by(InventoryLot.expiry_date)
+    )
+
 def get_expiry_alerts(db):
-    """Get expiry alerts from all expiry tables (legacy, manual, and OCR)"""
+    """Get expiry alerts for every lot in the ledger (legacy, manual, and OCR)"""
     alerts = []
-    
-    # Get alerts from legacy expiry table
-    expiry_items = db.query(Expiry).all()
-    for item in expiry_items:
-        days_left = days_until(item.expiry_date)
-        if days_left < 3:
-            alerts.append({
-                "type": "expiry",
-                "product_id": item.product_id,
-                "expiry_date": item.expiry_date,
-                "days_left": days_left,
-                "source": "legacy"
-            })
-    
-    # Get alerts from manual expiry table
-    manual_expiry_items = db.query(ManualExpiry).all()
-    for item in manual_expiry_items:
-        days_left = days_until(item.expiry_date)
-        if days_left < 3:
-            alerts.append({
-                "type": "expiry",
-                "product_id": item.product_id,
-                "expiry_date": item.expiry_date,
-                "days_left": days_left,
-                "quantity": item.quantity,
-                "source": "manual"
-            })
-    
-    # Get alerts from OCR expiry table
-    ocr_expiry_items = db.query(OCRExpiry).all()
-    for item in ocr_expiry_items:
-        days_left = days_until(item.expiry_date)
-        if days_left < 3:
+    for item in _expiring_lots(db):
+        alert = {
+            "type": "expiry",
+            "product_id": item.product_id,
+            "lot_id": item.id,
+            "expiry_date": item.expiry_date,
+            "days_left": days_until(item.expiry_date),
+            "source": item.source,
+            "discount_percent": item.discount_percent
+        }
+        if item.source != "legacy":
+            alert["quantity"] = item.quantity
+        if item.source == "ocr":
+            alert["detected_text"] = item.detected_text
+            alert["image_path"] = item.image_path
+        alerts.append(alert)
+    return alerts
+
+def get_low_stock_alerts(db):
+    """Low-stock alerts for products whose latest stock reading is below min_stock"""
+    alerts = []
+    products = db.query(Product).all()
+    for product in products:
+        stock = db.query(Stock).filter(Stock.product_id == product.id).order_by(Stock.timestamp.desc()).first()
+        current_stock = getattr(stock, "current_stock", None)
+        min_stock = getattr(product, "min_stock", None)
+        if (
+            current_stock is not None
+            and min_stock is not None
+            and int(current_stock) < int(min_stock)
+        ):
             alerts.append({
-                "type": "expiry",
-                "product_id": item.product_id,
-                "expiry_date": item.expiry_date,
-                "days_left": days_left,
-                "quantity": item.quantity,
-                "detected_text": item.detected_text,
-                "image_path": item.image_path,
-                "source": "ocr"
+                "type": "low_stock",
+                "product_id": product.id,
+                "current_stock": current_stock,
+                "min_stock": min_stock
             })
-    
     return alerts
 
-def apply_discount_logic(db):
-    """Example: mark products with <3 days to expiry for discount"""
-    # Check all expiry tables
-    expiry_items = db.query(Expiry).all()
-    manual_expiry_items = db.query(ManualExpiry).all()
-    ocr_expiry_items = db.query(OCRExpiry).all()
-    
-    for item in expiry_items:
-        if days_until(item.expiry_date) < 3:
-            # Here you could update a discount flag or similar
-            pass
-    
-    for item in manual_expiry_items:
-        if days_until(item.expiry_date) < 3:
-            # Apply discount logic for manual entries
-            pass
-    
-    for item in ocr_expiry_items:
-        if days_until(item.expiry_date) < 3:
-            # Apply discount logic for OCR entries
-            pass
+def get_alerts(db):
+    """Current expiry and low-stock alerts"""
+    return get_expiry_alerts(db) + get_low_stock_alerts(db)
+
+def apply_discount_logic(db, percent=None):
+    """
+    Mark down lots that expire within EXPIRY_ALERT_DAYS and can still be
+    sold (expiring today or later) by `percent` (default DISCOUNT_PERCENT).
+    Lots keep their first markdown. Returns the lots and products marked
+    down by this run.
+    """
+    percent = settings.DISCOUNT_PERCENT if percent is None else percent
+    due = _expiring_lots(db).filter(
+        InventoryLot.expiry_date >= date.today(), InventoryLot.discount_percent.is_(None)
+    ).order_by(None)
+    lots = due.with_entities(InventoryLot.id, InventoryLot.product_id).all()
+    if lots:
+        db.execute(
+            update(InventoryLot)
+            .where(InventoryLot.id.in_([lot_id for lot_id, _ in lots]))
+            .values(discount_percent=percent, discounted_at=datetime.now())
+        )
+        db.commit()
+    return {"lots_discounted": len(lots), "products": sorted({product_id for _, product_id in lots})}
+
+def _alert_details(alert):
+    return {
+        key: value.isoformat() if isinstance(value, date) else value
+        for key, value in alert.items()
+        if key not in ("type", "product_id", "lot_id")
+    }
+
+def record_alerts(db):
+    """
+    Sync the alerts table with the current alerts: raise new ones, refresh
+    the details and last_seen_at of open ones, and resolve open alerts that
+    no longer apply. Returns the counts.
+    """
+    now = datetime.now()
+    current = {(a["type"], a["product_id"], a.get("lot_id")): a for a in get_alerts(db)}
+    open_alerts = db.query(Alert).filter(Alert.resolved_at.is_(None)).all()
+    raised = resolved = 0
+    for row in open_alerts:
+        alert = current.pop((row.type, row.product_id, row.lot_id), None)
+        if alert is None:
+            row.resolved_at = now
+            resolved += 1
+        else:
+            row.details = _alert_details(alert)
+            row.last_seen_at = now
+    for (alert_type, product_id, lot_id), alert in current.items():
+        db.add(Alert(
+            type=alert_type, product_id=product_id, lot_id=lot_id, details=_alert_details(alert),
+            first_seen_at=now, last_seen_at=now,
+        ))
+        raised += 1
+    db.commit()
+    return {"open": len(open_alerts) - resolved + raised, "raised": raised, "resolved": resolved}
+
+def get_alert_history(db, open_only=False, limit=100):
+    """Recorded alerts, newest first"""
+    query = db.query(Alert)
+    if open_only:
+        query = query.filter(Alert.resolved_at.is_(None))
+    return query.order_by(Alert.first_seen_at.desc(), Alert.id.desc()).limit(limit).all()
+
+def get_expiry_calendar(db, days=30):
+    """Units expiring per day and per category for the next `days` days.
+
+    Results are cached for the current day; call invalidate_expiry_calendar()
+    whenever expiry lots or product categories change.
+    """
+    today = date.today()
+    key = (today, days)
+    if key in _calendar_cache:
+        return _calendar_cache[key]
+
+    end = today + timedelta(days=days - 1)
+    query = (
+        select(
+            InventoryLot.expiry_date,
+            Product.category,
+            func.coalesce(func.sum(InventoryLot.quantity), 0).label("units"),
+            func.count().label("lots"),
+        )
+        .join(Product, Product.id == InventoryLot.product_id)
+        .where(InventoryLot.expiry_date.between(today, end), InventoryLot.quantity > 0)
+        .group_by(InventoryLot.expiry_date, Product.category)
+        .order_by(InventoryLot.expiry_date, Product.category)
+    )
+    buckets = [
+        {
+            "expiry_date": row.expiry_date,
+            "category": row.category,
+            "units": int(row.units),
+            "lots": int(row.lots),
+        }
+        for row in db.execute(query)
+    ]
+
+    # Only keep today's entries around
+    for stale in [k for k in _calendar_cache if k[0] != today]:
+        del _calendar_cache[stale]
+    _calendar_cache[key] = buckets
+    return buckets
+
+def invalidate_expiry_calendar():
+    """Drop cached calendar buckets after a write to any expiry source."""
+    _calendar_cache.clear()
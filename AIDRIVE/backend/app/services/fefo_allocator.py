@@ -0,0 +1,234 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from sqlalchemy import bindparam, func, update
+from app.db.models.inventory_lot import InventoryLot
+from app.db.models.sales import Sales
+from app.services.expiry_logic import invalidate_expiry_calendar
+
+# Lot sources that carry a real quantity and can be consumed by sales
+CONSUMABLE_SOURCES = ("manual", "ocr")
+
+# Products per lot lookup
+LOAD_BATCH = 500
+
+
+def consumable_lots(db, *columns):
+    return db.query(*columns).filter(
+        InventoryLot.source.in_(CONSUMABLE_SOURCES), InventoryLot.quantity > 0
+    )
+
+
+class FEFOAllocator:
+    """
+    First-expired-first-out allocation of sales to expiry lots.
+
+    Lots are loaded per product into a min-heap ordered by expiry date the
+    first time a sale for that product is seen, and locked for the rest of
+    the transaction. A lot only serves sales made between its creation and
+    its expiry day. Consumed units are kept in memory and subtracted from
+    the lots in one batched UPDATE on flush().
+    """
+
+    def __init__(self):
+        self._heaps = {}
+        self._consumed = defaultdict(int)
+
+    def load(self, db, product_ids):
+        """Load the consumable lots of the products not loaded yet, in one query."""
+        missing = sorted(set(product_ids) - self._heaps.keys())
+        for product_id in missing:
+            self._heaps[product_id] = []
+        for start in range(0, len(missing), LOAD_BATCH):
+            lots = consumable_lots(
+                db, InventoryLot.id, InventoryLot.product_id, InventoryLot.expiry_date,
+                InventoryLot.quantity, InventoryLot.created_at,
+            ).filter(InventoryLot.product_id.in_(missing[start:start + LOAD_BATCH])).order_by(InventoryLot.id).with_for_update()
+            for lot_id, product_id, expiry_date, quantity, created_at in lots:
+                # Lists so the remaining quantity can be decremented in place
+                self._heaps[product_id].append([expiry_date, created_at or datetime.min, lot_id, int(quantity)])
+        for product_id in missing:
+            heapq.heapify(self._heaps[product_id])
+
+    def allocate(self, db, sale):
+        """
+        Consume the sale's quantity_sold from the product's oldest unexpired
+        lots. `sale` is a dict with product_id, quantity_sold and timestamp.
+        Returns the list of (lot_id, units) taken and the number of units
+        that could not be matched to any lot.
+        """
+        if sale["product_id"] not in self._heaps:
+            self.load(db, [sale["product_id"]])
+        heap = self._heaps[sale["product_id"]]
+
+        sold_at = sale["timestamp"] or datetime.utcnow()
+        sold_on = sold_at.date()
+        remaining = int(sale["quantity_sold"] or 0)
+        taken = []
+        newer = []
+        while remaining > 0 and heap:
+            lot = heap[0]
+            expiry_date, created_at, lot_id, quantity = lot
+            if expiry_date < sold_on:
+                # Already expired when the sale happened; cannot be sold from
+                heapq.heappop(heap)
+                continue
+            if created_at > sold_at:
+                # Not in stock yet at the time of the sale
+                newer.append(heapq.heappop(heap))
+                continue
+            units = min(quantity, remaining)
+            lot[3] = quantity - units
+            remaining -= units
+            self._consumed[lot_id] += units
+            taken.append((lot_id, units))
+            if lot[3] == 0:
+                heapq.heappop(heap)
+        for lot in newer:
+            heapq.heappush(heap, lot)
+        return taken, remaining
+
+    def allocate_many(self, db, sales):
+        """Allocate sales in time order. Returns the units not matched to any lot."""
+        # Load (and lock) every product's lots up front, in id order
+        self.load(db, {sale["product_id"] for sale in sales})
+        unmatched = 0
+        now = datetime.utcnow()
+        for sale in sorted(sales, key=lambda s: s["timestamp"] or now):
+            _, remaining = self.allocate(db, sale)
+            unmatched += remaining
+        return unmatched
+
+    def flush(self, db):
+        """Subtract the consumed units from the lots in one batched UPDATE. Returns lots updated."""
+        written = _consume_lots(db, self._consumed)
+        self._consumed.clear()
+        # Heaps are reloaded on the next batch so edits made through the
+        # CRUD endpoints in between are picked up
+        self._heaps.clear()
+        if written:
+            invalidate_expiry_calendar()
+        return written
+
+
+def _consume_lots(db, consumed):
+    """Subtract {lot_id: units} from lot quantities in one executemany."""
+    rows = [{"lot_id": lot_id, "units": int(units)} for lot_id, units in sorted(consumed.items()) if units]
+    if rows:
+        lots = InventoryLot.__table__
+        db.execute(
+            update(lots).where(lots.c.id == bindparam("lot_id")).values(quantity=lots.c.quantity - bindparam("units")),
+            rows,
+        )
+    return len(rows)
+
+
+def allocate_sales(db, sales):
+    """
+    Consume lots for newly stored sales (dicts with product_id,
+    quantity_sold and timestamp) in the caller's transaction. The sales
+    should be stored with fefo_allocated set so replay_sales skips them.
+    Returns (lots updated, units not matched to any lot).
+    """
+    allocator = FEFOAllocator()
+    unmatched = allocator.allocate_many(db, sales)
+    return allocator.flush(db), unmatched
+
+
+def fefo_consumption(lot_expiry, lot_quantity, sale_times, sale_units, lot_created=None):
+    """
+    Units consumed from each lot under FEFO, one vectorized pass per
+    distinct lot creation time.
+
+    `lot_expiry`/`lot_quantity` must be sorted by expiry date. A lot serves
+    sales made from its creation (`lot_created`; all lots are in stock from
+    the start when omitted) through its expiry day. While the set of lots in
+    stock is fixed, with C the cumulative lot quantity and D the cumulative
+    demand up to each lot's expiry, the units consumed from the first i lots
+    are C_i + min(0, min_{j<=i}(D_j - C_j)); each new creation time starts a
+    new pass on what is left.
+    """
+    quantity = np.asarray(lot_quantity, dtype=np.int64)
+    if quantity.size == 0:
+        return quantity
+    remaining = quantity.copy()
+    # Sales up to the end of the expiry day can be served from a lot
+    lot_end = np.asarray(lot_expiry, dtype="datetime64[D]").astype("datetime64[s]") + np.timedelta64(1, "D")
+
+    sale_times = np.asarray(sale_times, dtype="datetime64[s]")
+    order = np.argsort(sale_times, kind="stable")
+    sale_times = sale_times[order]
+    sale_units = np.asarray(sale_units, dtype=np.int64)[order]
+    if lot_created is None:
+        created = np.full(quantity.size, np.datetime64(datetime.min, "s"))
+    else:
+        created = np.asarray(lot_created, dtype="datetime64[s]")
+
+    starts = np.unique(created)
+    bounds = np.searchsorted(sale_times, starts, side="left").tolist() + [sale_times.size]
+    for start, low, high in zip(starts, bounds, bounds[1:]):
+        if low == high:
+            continue
+        in_stock = np.flatnonzero(created <= start)
+        cum_sales = np.concatenate(([0], np.cumsum(sale_units[low:high])))
+        demand = cum_sales[np.searchsorted(sale_times[low:high], lot_end[in_stock], side="left")]
+        capacity = np.cumsum(remaining[in_stock])
+        consumed = capacity + np.minimum(np.minimum.accumulate(demand - capacity), 0)
+        remaining[in_stock] -= np.diff(np.concatenate(([0], consumed)))
+    return quantity - remaining
+
+
+def replay_sales(db, since=None):
+    """
+    Consume lot quantities for sales that were not allocated when they were
+    stored (e.g. loaded outside the app), one vectorized pass per product.
+
+    Replayed sales are marked, so each sale is consumed once and running the
+    replay again only picks up sales stored since. Sales before `since` are
+    left for a later replay. Returns a summary of sales replayed, lots
+    updated and units consumed.
+    """
+    last_id = db.query(func.max(Sales.id)).scalar()
+    if last_id is None:
+        return {"sales_replayed": 0, "lots_updated": 0, "units_consumed": 0}
+    # Sales stored after this point are allocated by their own request
+    pending = [Sales.fefo_allocated.is_(False), Sales.id <= last_id]
+    if since is not None:
+        pending.append(Sales.timestamp >= since)
+
+    lots_by_product = defaultdict(list)
+    rows = consumable_lots(
+        db, InventoryLot.id, InventoryLot.product_id, InventoryLot.expiry_date,
+        InventoryLot.quantity, InventoryLot.created_at,
+    ).order_by(InventoryLot.id).with_for_update()
+    for lot_id, product_id, expiry_date, quantity, created_at in rows:
+        lots_by_product[product_id].append((expiry_date, created_at or datetime.min, lot_id, int(quantity)))
+
+    consumed = {}
+    for product_id, lots in lots_by_product.items():
+        sales = db.query(Sales.timestamp, Sales.quantity_sold).filter(
+            Sales.product_id == product_id, Sales.timestamp.is_not(None), *pending
+        ).all()
+        if not sales:
+            continue
+
+        lots.sort()
+        units = fefo_consumption(
+            [lot[0] for lot in lots],
+            [lot[3] for lot in lots],
+            [timestamp for timestamp, _ in sales],
+            [quantity or 0 for _, quantity in sales],
+            lot_created=[lot[1] for lot in lots],
+        )
+        consumed.update((lot[2], int(used)) for lot, used in zip(lots, units) if used > 0)
+
+    lots_updated = _consume_lots(db, consumed)
+    replayed = db.execute(update(Sales.__table__).where(*pending).values(fefo_allocated=True)).rowcount
+    db.commit()
+    invalidate_expiry_calendar()
+    return {
+        "sales_replayed": replayed,
+        "lots_updated": lots_updated,
+        "units_consumed": sum(consumed.values()),
+    }
@@ -2,6 +2,12 @@ import numpy as np
 import pandas as pd
 import joblib
 import os
+from datetime import datetime
+from sqlalchemy import delete, insert
+from app.core.config import settings
+from app.db.models.product import Product
+from app.db.models.product_forecast import ProductForecast
+from app.services.sales_rollup import daily_units
 
 # Try to import TensorFlow, but handle gracefully if not available
 try:
@@ -227,5 +233,54 @@ def predict_multi_day_demand(features, days=7):
         base_prediction = _fallback_predict_demand(features)
         return [int(base_prediction * (0.8 + 0.4 * np.random.random())) for _ in range(days)]
 
+def forecast_products(db, product_ids=None):
+    """
+    Demand forecast for every product (or those in `product_ids`), with
+    units_sold from the mean daily sales over the last FORECAST_HISTORY_DAYS
+    days (read from the sales_daily rollup, one row per product and day).
+    Products without sales in that window keep the model's default.
+    """
+    _, history = daily_units(db, settings.FORECAST_HISTORY_DAYS, product_ids=product_ids)
+    query = db.query(Product.id)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(product_ids))
+    forecasts = []
+    for (product_id,) in query.order_by(Product.id):
+        features = {"product_id": product_id}
+        if product_id in history:
+            features["units_sold"] = float(history[product_id].mean())
+        forecasts.append({"product_id": product_id, "forecast": predict_demand(features)})
+    return forecasts
+
+def refresh_forecasts(db):
+    """
+    Recompute the demand forecast for every product and replace the rows in
+    product_forecasts, so the forecast endpoint on every worker reads them
+    instead of running the model per request.
+    """
+    forecasts = forecast_products(db)
+    computed_at = datetime.now()
+    db.execute(delete(ProductForecast))
+    if forecasts:
+        db.execute(insert(ProductForecast), [{**forecast, "computed_at": computed_at} for forecast in forecasts])
+    db.commit()
+    return forecasts
+
+def get_forecasts(db):
+    """
+    Stored forecasts for every product; products added since the last
+    refresh are forecast on the fly (and picked up by the next refresh).
+    """
+    stored = {
+        product_id: forecast
+        for product_id, forecast in db.query(ProductForecast.product_id, ProductForecast.forecast).join(
+            Product, Product.id == ProductForecast.product_id
+        )
+    }
+    missing = [product_id for (product_id,) in db.query(Product.id) if product_id not in stored]
+    if missing:
+        stored.update((row["product_id"], row["forecast"]) for row in forecast_products(db, missing))
+    return [{"product_id": product_id, "forecast": forecast} for product_id, forecast in sorted(stored.items())]
+
 # Initialize model loading on module import
 load_trained_model()
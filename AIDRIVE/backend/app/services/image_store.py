@@ -0,0 +1,419 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import cv2
+from sqlalchemy import func, or_, update
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.db.models.inventory_lot import InventoryLot
+from app.db.models.stored_image import StoredImage
+
+# Files touched this recently are never deleted: a concurrent upload of the
+# same image may have just deduplicated against them
+PURGE_GRACE_SECONDS = 300
+
+_MAGIC = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+    (b"BM", ".bmp"),
+)
+
+
+# Extension and OpenCV quality flag per IMAGE_DERIVATIVE_FORMAT
+_ENCODINGS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+}
+
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".webp": "image/webp",
+}
+
+
+def _extension(head):
+    for magic, extension in _MAGIC:
+        if head.startswith(magic):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return ".bin"
+
+
+def _bounded(image, max_side):
+    """Downscale so the longest side is at most `max_side`; never upscales."""
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _insert_refs(db, rows):
+    """
+    Insert stored_images rows or add to their ref_count if the hash exists.
+    Re-uploading an archived image brings its original back, so the path,
+    size and archived_at are reset from the new row as well.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(StoredImage).values(rows)
+        new = stmt.inserted
+        stmt = stmt.on_duplicate_key_update(
+            ref_count=StoredImage.ref_count + new.ref_count, path=new.path, size_bytes=new.size_bytes, archived_at=None,
+            acquired_at=new.acquired_at,
+        )
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(StoredImage).values(rows)
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sha256"],
+            set_={
+                "ref_count": StoredImage.ref_count + new.ref_count,
+                "path": new.path,
+                "size_bytes": new.size_bytes,
+                "archived_at": None,
+                "acquired_at": new.acquired_at,
+            }
+        )
+    db.execute(stmt)
+
+
+class ImageStore:
+    """
+    Content-addressed storage for uploaded images.
+
+    Files live at <root>/<aa>/<bb>/<sha256><ext>, so identical uploads share
+    one file. Each distinct image has a stored_images row whose ref_count is
+    the number of lots using it; files are removed in the background once
+    nothing references them. Next to each original sit a bounded display
+    copy and a thumbnail (<sha256>.display.<ext>, <sha256>.thumbnail.<ext>),
+    which is all the UI ever downloads.
+    """
+
+    def __init__(self, root, chunk_size):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def path_for(self, sha256, extension):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256 + extension)
+
+    def _tmp_dir(self):
+        path = os.path.join(self.root, "tmp")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _commit_file(self, tmp_path, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # Deduplicated: keep the existing file, mark it as freshly used
+            os.remove(tmp_path)
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+
+    def save_stream(self, fileobj):
+        """
+        Copy an upload to the store in chunks while hashing it, without
+        holding the whole file in memory. Returns sha256, path and size.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        head = b""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if not head:
+                        head = chunk[:16]
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            sha256 = hasher.hexdigest()
+            path = self.path_for(sha256, _extension(head))
+            self._commit_file(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {"sha256": sha256, "path": path, "size_bytes": size}
+
+    def describe(self, data):
+        """sha256, path and size for image bytes already in memory."""
+        sha256 = hashlib.sha256(memoryview(data)).hexdigest()
+        return {"sha256": sha256, "path": self.path_for(sha256, _extension(bytes(data[:16]))), "size_bytes": len(data)}
+
+    def write_bytes(self, data, path):
+        """Write in-memory image bytes to their store path, keeping an existing file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        self._commit_file(tmp_path, path)
+
+    def write_new(self, images):
+        """
+        Write in-memory images, (describe() dict, bytes) pairs, to the store
+        before rows point at them. Returns the describe() dicts of files this
+        call created, for discard() if the rows are rolled back.
+        """
+        created = []
+        try:
+            for image, data in images:
+                existed = os.path.exists(image["path"])
+                self.write_bytes(data, image["path"])
+                if not existed:
+                    created.append(image)
+        except Exception:
+            for image in created:
+                os.remove(image["path"])
+            raise
+        return created
+
+    def discard(self, db, images):
+        """
+        Remove files written by write_new() whose rows were rolled back,
+        unless a stored_images row for the same image exists by now (a
+        concurrent upload deduplicated against the file).
+        """
+        if not images:
+            return
+        kept = {
+            sha256 for (sha256,) in
+            db.query(StoredImage.sha256).filter(StoredImage.sha256.in_([image["sha256"] for image in images]))
+        }
+        for image in images:
+            if image["sha256"] not in kept:
+                try:
+                    os.remove(image["path"])
+                except FileNotFoundError:
+                    pass
+
+    def derivative_path(self, sha256, kind):
+        extension = _ENCODINGS[settings.IMAGE_DERIVATIVE_FORMAT][0]
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}.{kind}{extension}")
+
+    def _write_encoded(self, image, path, max_side, quality):
+        """Write `image` downscaled to `max_side` and return the pixels written."""
+        extension, quality_flag = _ENCODINGS[settings.IMAGE_DERIVATIVE_FORMAT]
+        image = _bounded(image, max_side)
+        ok, encoded = cv2.imencode(extension, image, [quality_flag, quality])
+        if not ok:
+            raise ValueError(f"Could not encode {path}")
+        self.write_bytes(encoded, path)
+        return image
+
+    def _make_derivatives(self, image):
+        """Write the display copy and thumbnail of a StoredImage row; False if unreadable."""
+        # IMREAD_COLOR applies EXIF orientation, so phone photos come out upright
+        original = cv2.imread(image.path, cv2.IMREAD_COLOR)
+        if original is None:
+            logger.warning(f"Stored image {image.id} could not be decoded: {image.path}")
+            return False
+        quality = settings.IMAGE_DERIVATIVE_QUALITY
+        display_path = self.derivative_path(image.sha256, "display")
+        thumbnail_path = self.derivative_path(image.sha256, "thumbnail")
+        display = self._write_encoded(original, display_path, settings.IMAGE_DISPLAY_MAX_SIDE, quality)
+        # Resizing the display copy is much cheaper than the original
+        self._write_encoded(display, thumbnail_path, settings.IMAGE_THUMBNAIL_MAX_SIDE, quality)
+        image.display_path, image.thumbnail_path = display_path, thumbnail_path
+        return True
+
+    def ensure_derivatives(self, db, image):
+        """Make missing derivatives on demand, e.g. before background ingest ran."""
+        if image.thumbnail_path is None and self._make_derivatives(image):
+            db.commit()
+
+    def ingest(self, image_ids):
+        """Make display copies and thumbnails for new uploads. Runs as a background task."""
+        db = SessionLocal()
+        try:
+            images = (
+                db.query(StoredImage)
+                .filter(StoredImage.id.in_(image_ids), StoredImage.thumbnail_path.is_(None))
+                .all()
+            )
+            made = sum(self._make_derivatives(image) for image in images)
+            db.commit()
+            return made
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to make derivatives for stored images {image_ids}: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def acquire(self, db, images):
+        """
+        Add one reference per entry in `images` (dicts from save_stream or
+        describe; repeats count twice) and return {sha256: image_id}. Runs in
+        the caller's transaction.
+        """
+        counts = {}
+        now = datetime.utcnow()
+        for image in images:
+            entry = counts.setdefault(image["sha256"], dict(image, ref_count=0, acquired_at=now))
+            entry["ref_count"] += 1
+        if not counts:
+            return {}
+        _insert_refs(db, list(counts.values()))
+        rows = db.query(StoredImage.sha256, StoredImage.id).filter(StoredImage.sha256.in_(counts))
+        return dict(rows)
+
+    def release(self, db, image_id):
+        """Drop one reference in the caller's transaction; purge() removes the file."""
+        db.execute(
+            update(StoredImage)
+            .where(StoredImage.id == image_id, StoredImage.ref_count > 0)
+            .values(ref_count=StoredImage.ref_count - 1)
+        )
+
+    def _remove_file(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) < PURGE_GRACE_SECONDS:
+                return False
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def purge(self, image_ids):
+        """Delete images whose ref_count reached zero. Runs as a background task."""
+        db = SessionLocal()
+        try:
+            query = db.query(StoredImage).filter(StoredImage.id.in_(image_ids), StoredImage.ref_count <= 0)
+            if db.get_bind().dialect.name == "mysql":
+                query = query.with_for_update()
+            images = query.all()
+            paths = [
+                path for image in images
+                for path in (image.path, image.display_path, image.thumbnail_path) if path
+            ]
+            for image in images:
+                db.delete(image)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to purge stored images {image_ids}: {e}")
+            return 0
+        finally:
+            db.close()
+        return sum(self._remove_file(path) for path in paths)
+
+    def purge_legacy_path(self, path):
+        """Remove a pre-store image file once no lot points at it any more."""
+        db = SessionLocal()
+        try:
+            in_use = db.query(InventoryLot.id).filter(InventoryLot.image_path == path).first()
+        finally:
+            db.close()
+        if in_use is None and os.path.exists(path):
+            os.remove(path)
+
+    def reconcile(self, db):
+        """
+        Recount references from inventory_lots (lots removed by cascading
+        product deletes never release theirs), purge unreferenced images
+        and sweep files that have no stored_images row. Images acquired in
+        the last PURGE_GRACE_SECONDS are skipped: their references may
+        belong to lots (or scan jobs) not committed yet.
+        """
+        settled = or_(
+            StoredImage.acquired_at.is_(None),
+            StoredImage.acquired_at < datetime.utcnow() - timedelta(seconds=PURGE_GRACE_SECONDS),
+        )
+        counts = dict(
+            db.query(InventoryLot.image_id, func.count(InventoryLot.id))
+            .filter(InventoryLot.image_id.isnot(None))
+            .group_by(InventoryLot.image_id)
+        )
+        fixed = []
+        for image_id, ref_count in db.query(StoredImage.id, StoredImage.ref_count).filter(settled):
+            actual = counts.get(image_id, 0)
+            if actual != ref_count:
+                fixed.append({"id": image_id, "ref_count": actual})
+        if fixed:
+            db.execute(update(StoredImage), fixed)
+        db.commit()
+
+        orphaned = [image_id for (image_id,) in db.query(StoredImage.id).filter(StoredImage.ref_count <= 0, settled)]
+        removed = self.purge(orphaned) if orphaned else 0
+
+        known = {
+            path
+            for paths in db.query(StoredImage.path, StoredImage.display_path, StoredImage.thumbnail_path)
+            for path in paths if path
+        }
+        swept = 0
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if path not in known and self._remove_file(path):
+                    swept += 1
+        return {"refcounts_fixed": len(fixed), "images_purged": removed, "files_swept": swept}
+
+    def archive(self, db, retention_days, mode):
+        """
+        Backfill missing derivatives, then shrink originals uploaded more
+        than `retention_days` ago: "recompress" re-encodes them bounded to
+        IMAGE_ARCHIVE_MAX_SIDE at IMAGE_ARCHIVE_QUALITY (kept only if
+        smaller), "purge" drops them and points the image at its display
+        copy. Lots referencing the image get the new image_path.
+        """
+        made = sum(
+            self._make_derivatives(image)
+            for image in db.query(StoredImage).filter(StoredImage.thumbnail_path.is_(None)).all()
+        )
+        db.commit()
+
+        now = datetime.utcnow()
+        due = (
+            db.query(StoredImage)
+            .filter(
+                StoredImage.archived_at.is_(None),
+                StoredImage.created_at < now - timedelta(days=retention_days),
+                StoredImage.display_path.isnot(None),
+            )
+            .all()
+        )
+        replaced = []
+        for image in due:
+            if mode == "purge":
+                new_path = image.display_path
+            else:
+                pixels = cv2.imread(image.path, cv2.IMREAD_COLOR)
+                if pixels is None:
+                    continue
+                new_path = self.derivative_path(image.sha256, "archive")
+                self._write_encoded(pixels, new_path, settings.IMAGE_ARCHIVE_MAX_SIDE, settings.IMAGE_ARCHIVE_QUALITY)
+                if os.path.getsize(new_path) >= image.size_bytes:
+                    # Already compact; keep the original as it is
+                    os.remove(new_path)
+                    image.archived_at = now
+                    continue
+            db.query(InventoryLot).filter(InventoryLot.image_id == image.id).update(
+                {"image_path": new_path}, synchronize_session=False
+            )
+            new_size = os.path.getsize(new_path)
+            # A purged original's display copy already existed, so it frees the whole file
+            replaced.append((image.path, image.size_bytes - (new_size if mode != "purge" else 0)))
+            image.path, image.size_bytes, image.archived_at = new_path, new_size, now
+        db.commit()
+
+        freed = sum(saved for path, saved in replaced if self._remove_file(path))
+        return {"derivatives_made": made, "originals_archived": len(replaced), "bytes_freed": freed}
+
+
+image_store = ImageStore(settings.IMAGE_STORE_DIR, settings.IMAGE_UPLOAD_CHUNK_BYTES)
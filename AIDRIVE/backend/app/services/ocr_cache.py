@@ -0,0 +1,253 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.ocr_engine import config_version
+from app.utils.image_utils import decode_image, preprocess_image
+
+# dHash grid: 32x8 horizontal gradients = 256 bits, wide like a label line
+DHASH_WIDTH = 32
+DHASH_HEIGHT = 8
+
+
+def dhash(image):
+    """Difference hash of the preprocessed (grayscale, 400x100, Otsu) image."""
+    processed = preprocess_image(image)
+    small = cv2.resize(processed, (DHASH_WIDTH + 1, DHASH_HEIGHT), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class OCRResultCache:
+    """
+    Maps uploaded label images to the expiry date and text OCR read from them.
+
+    Lookups try the exact SHA-256 of the upload first, then, when
+    `dhash_distance` >= 0, the closest cached perceptual hash within that many
+    bits. Recent entries live in an LRU dict; every entry is also written to
+    an SQLite file so results survive restarts and are shared between
+    uvicorn workers.
+
+    Each entry records the OCR `config` (see ocr_engine.config_version) and
+    the product category it was read with. An exact-hash entry read with
+    another config or category is dropped on lookup and counts as a miss.
+    """
+
+    def __init__(self, max_entries, path, disk_max_entries, dhash_distance, config):
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.dhash_distance = dhash_distance
+        self.config = config
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.metrics = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "stale_dropped": 0,
+            "disk_errors": 0,
+        }
+
+    def _disk(self):
+        if not self.path:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_results ("
+                "sha256 TEXT PRIMARY KEY, dhash TEXT, expiry_date TEXT NOT NULL, "
+                "detected_text TEXT, created_at REAL NOT NULL, confidence REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ocr_results)")}
+            # Cache files written before these were recorded; rows without a
+            # config never match one and are dropped when looked up
+            for column, column_type in (("confidence", "REAL"), ("config", "TEXT"), ("category", "TEXT")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE ocr_results ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_dhash ON ocr_results (dhash)")
+            self._conn = conn
+        return self._conn
+
+    def fingerprint(self, content, sha256=None, category=None):
+        """
+        (sha256, dhash, category) for an upload given as bytes or a stored
+        file path, to be read with `category`; pass `sha256` when it is
+        already known. dhash is only computed when it is used.
+        """
+        is_path = isinstance(content, (str, os.PathLike))
+        if sha256 is None:
+            if is_path:
+                hasher = hashlib.sha256()
+                with open(content, "rb") as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        hasher.update(chunk)
+                sha256 = hasher.hexdigest()
+            else:
+                sha256 = hashlib.sha256(memoryview(content)).hexdigest()
+        phash = None
+        if self.dhash_distance >= 0:
+            image = cv2.imread(os.fspath(content)) if is_path else decode_image(content)
+            if image is not None:
+                phash = dhash(image)
+        return sha256, phash, category or ""
+
+    def _remember(self, sha256, entry):
+        self._memory[sha256] = entry
+        self._memory.move_to_end(sha256)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _matches(self, entry, category):
+        return entry["config"] == self.config and entry["category"] == category
+
+    def _closest_in_memory(self, phash, category):
+        best, best_distance = None, self.dhash_distance + 1
+        for entry in self._memory.values():
+            if entry["dhash"] is None or not self._matches(entry, category):
+                continue
+            distance = (entry["dhash"] ^ phash).bit_count()
+            if distance < best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def _from_disk(self, sha256, phash, category):
+        """(entry or None, whether a stale exact-hash row was dropped)"""
+        conn = self._disk()
+        if conn is None:
+            return None, False
+        dropped = False
+        columns = "expiry_date, detected_text, dhash, confidence, config, category"
+        row = conn.execute(f"SELECT {columns} FROM ocr_results WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is not None and (row[4], row[5]) != (self.config, category):
+            conn.execute("DELETE FROM ocr_results WHERE sha256 = ?", (sha256,))
+            conn.commit()
+            dropped, row = True, None
+        if row is None and phash is not None:
+            # The disk tier only matches identical perceptual hashes
+            row = conn.execute(
+                f"SELECT {columns} FROM ocr_results WHERE dhash = ? AND config = ? AND category = ? LIMIT 1",
+                (format(phash, "x"), self.config, category)
+            ).fetchone()
+        if row is None:
+            return None, dropped
+        return {
+            "expiry_date": row[0],
+            "detected_text": row[1],
+            "dhash": int(row[2], 16) if row[2] else None,
+            "confidence": row[3],
+            "config": row[4],
+            "category": row[5],
+        }, dropped
+
+    def get(self, fingerprint):
+        """Cached {"expiry_date", "detected_text", "confidence"} for a fingerprint, or None."""
+        sha256, phash, category = fingerprint
+        with self._lock:
+            entry = self._memory.get(sha256)
+            stale = entry is not None and not self._matches(entry, category)
+            if stale:
+                del self._memory[sha256]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(sha256)
+                self.metrics["memory_hits"] += 1
+                return entry
+            if phash is not None:
+                entry = self._closest_in_memory(phash, category)
+                if entry is not None:
+                    self.metrics["similar_hits"] += 1
+                    self.metrics["stale_dropped"] += stale
+                    return entry
+            try:
+                entry, dropped = self._from_disk(sha256, phash, category)
+                stale = stale or dropped
+            except sqlite3.Error as e:
+                logger.warning(f"OCR cache disk lookup failed: {e}")
+                self.metrics["disk_errors"] += 1
+                entry = None
+            if stale:
+                # Counted once when both tiers held the same stale entry
+                self.metrics["stale_dropped"] += 1
+            if entry is not None:
+                self.metrics["disk_hits"] += 1
+                self._remember(sha256, entry)
+                return entry
+            self.metrics["misses"] += 1
+            return None
+
+    def put(self, fingerprint, expiry_date, detected_text, confidence=None):
+        sha256, phash, category = fingerprint
+        entry = {
+            "expiry_date": expiry_date,
+            "detected_text": detected_text,
+            "dhash": phash,
+            "confidence": confidence,
+            "config": self.config,
+            "category": category,
+        }
+        with self._lock:
+            self._remember(sha256, entry)
+            self.metrics["stores"] += 1
+            try:
+                conn = self._disk()
+                if conn is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ocr_results (sha256, dhash, expiry_date, detected_text, "
+                        "created_at, confidence, config, category) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (sha256, format(phash, "x") if phash is not None else None,
+                         expiry_date, detected_text, time.time(), confidence, self.config, category)
+                    )
+                    # Trim the oldest rows now and then rather than on every write
+                    if self.metrics["stores"] % 1000 == 0:
+                        conn.execute(
+                            "DELETE FROM ocr_results WHERE sha256 NOT IN "
+                            "(SELECT sha256 FROM ocr_results ORDER BY created_at DESC LIMIT ?)",
+                            (self.disk_max_entries,)
+                        )
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"OCR cache disk write failed: {e}")
+                self.metrics["disk_errors"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM ocr_results")
+                conn.commit()
+
+    def stats(self):
+        lookups = sum(self.metrics[k] for k in ("memory_hits", "disk_hits", "similar_hits", "misses"))
+        hits = lookups - self.metrics["misses"]
+        return {
+            **self.metrics,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_path": self.path or None,
+            "dhash_distance": self.dhash_distance,
+            "config": self.config,
+        }
+
+
+ocr_cache = OCRResultCache(
+    settings.OCR_CACHE_MAX_ENTRIES,
+    settings.OCR_CACHE_PATH,
+    settings.OCR_CACHE_DISK_MAX_ENTRIES,
+    settings.OCR_CACHE_DHASH_DISTANCE,
+    config_version(),
+)
@@ -1,27 +1,224 @@
+import hashlib
+import os
+import shlex
+import threading
+import time
 import pytesseract
 import cv2
-import re
-from app.utils.image_utils import preprocess_image
-from app.utils.date_utils import parse_date
+import numpy as np
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.image_utils import decode_image, iter_ocr_candidates, prepare_sparse
+from app.utils.date_utils import find_date_candidates, parse_expiry_date
 from datetime import date, timedelta
 
-def extract_expiry_from_image(image_path: str):
-    image = cv2.imread(image_path)
-    if image is None:
-        # Could not read image, return a default expiry far in the future for test
-        return (date.today() + timedelta(days=365)).isoformat()
-    try:
-        processed = preprocess_image(image)
-        text = pytesseract.image_to_string(processed)
-        # Regex to find date-like patterns
-        match = re.search(r"(\d{2,4}[/-]\d{1,2}[/-]\d{1,4})", text)
-        if match:
+# tesserocr is optional; it keeps Tesseract loaded instead of forking per image
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+if settings.OCR_BACKEND == "tesserocr" and not TESSEROCR_AVAILABLE:
+    logger.warning("OCR_BACKEND=tesserocr but tesserocr is not installed. Using pytesseract.")
+
+# Bump when a change to the OCR pipeline or the date parser can change what
+# is read from an image, so cached results from older versions are dropped
+PARSER_VERSION = 1
+
+def config_version():
+    """Short hash of PARSER_VERSION and the OCR settings a reading depends on."""
+    backend = "tesserocr" if settings.OCR_BACKEND == "tesserocr" and TESSEROCR_AVAILABLE else "pytesseract"
+    config = (
+        PARSER_VERSION, backend, settings.OCR_PSM, settings.OCR_CHAR_WHITELIST, settings.OCR_TESSDATA_PATH,
+        settings.OCR_CONFIDENCE_THRESHOLD, settings.OCR_MIN_CONFIDENCE,
+    )
+    return hashlib.sha256(repr(config).encode()).hexdigest()[:16]
+
+# One Tesseract instance per thread (each OCR worker process has its own)
+_local = threading.local()
+
+def _tesserocr_api():
+    api = getattr(_local, "api", None)
+    if api is None:
+        kwargs = {"psm": settings.OCR_PSM}
+        if settings.OCR_TESSDATA_PATH:
+            kwargs["path"] = settings.OCR_TESSDATA_PATH
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        if settings.OCR_CHAR_WHITELIST:
+            api.SetVariable("tessedit_char_whitelist", settings.OCR_CHAR_WHITELIST)
+        _local.api = api
+    return api
+
+def _pytesseract_config(psm=None):
+    config = f"--psm {psm or settings.OCR_PSM}"
+    if settings.OCR_CHAR_WHITELIST:
+        # Quoted so a space in the whitelist survives pytesseract's argument splitting
+        config += " -c " + shlex.quote(f"tessedit_char_whitelist={settings.OCR_CHAR_WHITELIST}")
+    return config
+
+def _tesserocr_set_image(image, psm):
+    api = _tesserocr_api()
+    api.SetPageSegMode(psm or settings.OCR_PSM)
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+    return api
+
+def image_to_text(image, backend=None, psm=None):
+    """Run Tesseract on a decoded image with the configured backend."""
+    backend = backend or settings.OCR_BACKEND
+    if backend == "tesserocr" and TESSEROCR_AVAILABLE:
+        return _tesserocr_set_image(image, psm).GetUTF8Text()
+    return pytesseract.image_to_string(image, config=_pytesseract_config(psm))
+
+def image_to_data(image, backend=None, psm=None):
+    """Words Tesseract read, in reading order, as (word, confidence 0-100) pairs."""
+    backend = backend or settings.OCR_BACKEND
+    if backend == "tesserocr" and TESSEROCR_AVAILABLE:
+        api = _tesserocr_set_image(image, psm)
+        api.Recognize()
+        level = tesserocr.RIL.WORD
+        words = []
+        for word in tesserocr.iterate_level(api.GetIterator(), level):
             try:
-                expiry = parse_date(match.group(1))
-                return str(expiry)
-            except Exception:
-                return None
-        return None
-    except Exception:
-        # If any error in processing, return a default expiry far in the future for test
-        return (date.today() + timedelta(days=365)).isoformat()
+                text = word.GetUTF8Text(level)
+            except RuntimeError:
+                # Raised for word boxes that hold no text
+                continue
+            if text and text.strip():
+                words.append((text.strip(), word.Confidence(level)))
+        return words
+    data = pytesseract.image_to_data(image, config=_pytesseract_config(psm), output_type=pytesseract.Output.DICT)
+    # Non-word boxes (blocks, lines) have confidence -1
+    return [
+        (text.strip(), float(conf))
+        for text, conf in zip(data["text"], data["conf"])
+        if text.strip() and float(conf) >= 0
+    ]
+
+def load_image(source):
+    """Accept a file path, encoded image bytes/buffer, or an already decoded array."""
+    if isinstance(source, (str, os.PathLike)):
+        return cv2.imread(os.fspath(source))
+    if isinstance(source, np.ndarray) and source.ndim >= 2:
+        return source
+    return decode_image(source)
+
+def parse_expiry_text(text, category=None):
+    """Most likely expiry date in the OCR text as an ISO string, or None."""
+    expiry = parse_expiry_date(text, category=category)
+    return expiry.isoformat() if expiry else None
+
+def rank_expiry_candidates(words, category=None):
+    """
+    Join OCR words into text and rank the dates in it. Each candidate from
+    find_date_candidates gets a `confidence` (0-1): the lowest OCR word
+    confidence over the date's characters, halved when the date is outside
+    the category's plausible window. Candidates are ordered by parser score
+    plus confidence. Returns (text, candidates).
+    """
+    text, spans = "", []
+    for word, confidence in words:
+        if text:
+            text += " "
+        spans.append((len(text), len(text) + len(word), confidence))
+        text += word
+    candidates = []
+    for candidate in find_date_candidates(text, category=category):
+        start, end = candidate["span"]
+        overlapping = [confidence for s, e, confidence in spans if s < end and e > start]
+        confidence = min(overlapping) / 100.0 if overlapping else 0.0
+        if not candidate["plausible"]:
+            confidence /= 2
+        candidate["confidence"] = round(confidence, 3)
+        candidates.append(candidate)
+    candidates.sort(key=lambda candidate: candidate["score"] + candidate["confidence"], reverse=True)
+    return text, candidates
+
+def find_expiry(image, category=None, threshold=None):
+    """
+    OCR detected text lines first, then progressively more expensive
+    variants (see iter_ocr_candidates), ranking the dates read from each.
+    Stops as soon as the best date's confidence reaches `threshold`
+    (OCR_CONFIDENCE_THRESHOLD by default); otherwise the best date over all
+    variants wins. Returns (expiry_date or None, stats) where stats counts
+    OCR attempts and pixels fed to Tesseract, and holds the stage that
+    produced the date, its OCR text, its confidence and milliseconds spent
+    per stage ("detect" is text-line detection).
+    `category` picks the shelf-life window used to resolve ambiguous dates.
+    """
+    if threshold is None:
+        threshold = settings.OCR_CONFIDENCE_THRESHOLD
+    stats = {"attempts": 0, "pixels": 0, "stage": None, "text": None, "confidence": None, "timings": {}}
+    timings = stats["timings"]
+    best, best_rank = None, None
+    candidates = iter_ocr_candidates(image)
+    while True:
+        started = time.perf_counter()
+        step = next(candidates, None)
+        prepared = time.perf_counter()
+        if step is None:
+            break
+        stage, candidate, psm = step
+        if stats["attempts"] == 0:
+            # The first step also finds the text lines
+            timings["detect"] = round((prepared - started) * 1000, 2)
+            started = prepared
+        stats["attempts"] += 1
+        stats["pixels"] += candidate.size
+        text, ranked = rank_expiry_candidates(image_to_data(candidate, psm=psm), category)
+        timings[stage] = round(timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000, 2)
+        if ranked:
+            top = ranked[0]
+            rank = top["score"] + top["confidence"]
+            if best is None or rank > best_rank:
+                best, best_rank = top, rank
+                stats.update(stage=stage, text=text, confidence=top["confidence"])
+            if top["confidence"] >= threshold:
+                break
+    if best is None:
+        return None, stats
+    return best["date"].isoformat(), stats
+
+def read_label_text(image):
+    """All text on the label from one sparse-text OCR pass, e.g. to identify the product."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return " ".join(word for word, _ in image_to_data(prepare_sparse(gray), psm=11))
+
+def read_expiry(source, category=None, label_text=False):
+    """
+    Expiry date, the OCR text it was read from, its confidence and per-stage
+    timings, as a dict. Dates below OCR_MIN_CONFIDENCE are dropped
+    (expiry_date None). The text is None when nothing was read, including
+    the far-future fallback below, whose confidence is 0 and which is
+    therefore only returned when OCR_MIN_CONFIDENCE is 0.
+    With `label_text`, the whole label is also read into "label_text".
+    """
+    started = time.perf_counter()
+    image = load_image(source)
+    timings = {"decode": round((time.perf_counter() - started) * 1000, 2)}
+    result = {"expiry_date": None, "detected_text": None, "confidence": None, "label_text": None, "timings": timings}
+    try:
+        if image is None:
+            raise ValueError("Could not decode image")
+        expiry, stats = find_expiry(image, category)
+        timings.update(stats["timings"])
+        if label_text:
+            started = time.perf_counter()
+            result["label_text"] = read_label_text(image)
+            timings["label"] = round((time.perf_counter() - started) * 1000, 2)
+        result["confidence"] = stats["confidence"]
+        if expiry is not None and stats["confidence"] >= settings.OCR_MIN_CONFIDENCE:
+            result.update(expiry_date=expiry, detected_text=stats["text"].strip())
+    except Exception as e:
+        logger.warning(f"OCR could not read expiry from image: {e}")
+        # Could not read the image: a default expiry far in the future for test
+        result["confidence"] = 0.0
+        if settings.OCR_MIN_CONFIDENCE <= 0:
+            result["expiry_date"] = (date.today() + timedelta(days=365)).isoformat()
+    return result
+
+def extract_expiry_from_image(source, category=None):
+    return read_expiry(source, category)["expiry_date"]
@@ -0,0 +1,446 @@
+import asyncio
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.database import DATABASE_URL, SessionLocal, engine, is_sqlite_memory
+from app.db.models.expiry import Expiry
+from app.db.models.ocr_scan_job import OCRScanJob
+from app.db.models.product import Product
+from app.services.expiry_logic import invalidate_expiry_calendar
+from app.services.image_store import image_store
+from app.services.ocr_cache import ocr_cache
+from app.services.ocr_engine import read_expiry
+from app.services.product_index import product_index
+
+
+# Job fields mirrored to ocr_scan_jobs for polls handled by other workers
+_STORED_FIELDS = ("product_id", "status", "result", "error", "timings", "suggestions")
+
+# Seconds between ocr_scan_jobs reads while long-polling a job queued by another worker
+STORED_POLL_SECONDS = 0.5
+
+
+def _init_worker():
+    # Connections inherited from the parent process must not be reused
+    engine.dispose(close=False)
+
+
+def _store_expiry(db, product_id, image_path, image_id, result):
+    db_expiry = Expiry(
+        product_id=product_id,
+        expiry_date=date.fromisoformat(result["expiry_date"]),
+        image_path=image_path,
+        image_id=image_id,
+        detected_text=result["detected_text"],
+        confidence=result["confidence"]
+    )
+    db.add(db_expiry)
+    db.commit()
+    db.refresh(db_expiry)
+    return {
+        "id": db_expiry.id,
+        "product_id": db_expiry.product_id,
+        "expiry_date": db_expiry.expiry_date.isoformat(),
+        "image_path": db_expiry.image_path,
+        "detected_text": db_expiry.detected_text,
+        "confidence": db_expiry.confidence,
+    }
+
+
+def _run_scan_job(product_id, image_path, image_id, cached=None, category=None):
+    """
+    Runs in an OCR worker process: OCR the stored label (unless the result
+    cache already had it) with the product's `category` and store the
+    Expiry row referencing the image.
+    Without a `product_id` the whole label is read too and the reading is
+    returned unstored ("unmatched"); the parent process, which holds the
+    product index, picks the product and stores it.
+    """
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if cached is not None:
+            result = dict(cached, timings={})
+        elif product_id is None:
+            result = read_expiry(image_path, label_text=True)
+        else:
+            result = read_expiry(image_path, category)
+        if not result["expiry_date"]:
+            error = "Could not extract expiry date from image."
+            if result["confidence"]:
+                error = "Expiry date could not be read reliably. Please enter it manually."
+            return {"status": "failed", "error": error, "confidence": result["confidence"], "timings": result["timings"]}
+        if product_id is None:
+            return {"status": "unmatched", "reading": result, "timings": result["timings"]}
+        return {
+            "status": "done",
+            "expiry": _store_expiry(db, product_id, image_path, image_id, result),
+            "ocr_ms": round((time.perf_counter() - started) * 1000, 2),
+            "timings": result["timings"],
+            "cached": cached is not None,
+        }
+    finally:
+        db.close()
+
+
+class OCRQueueFull(Exception):
+    """Raised when `max_pending` images are already waiting for or in the OCR workers."""
+
+    def __init__(self, retry_after):
+        super().__init__("OCR queue is full")
+        self.retry_after = retry_after
+
+
+class OCRJobQueue:
+    """
+    Hands OCR scans to a pool of worker processes and tracks their status,
+    in memory and in ocr_scan_jobs so any uvicorn worker can answer a poll.
+    Finished jobs are kept for OCR_JOB_TTL_SECONDS so clients can fetch them.
+    Time spent per OCR stage is totalled across jobs and batches. At most
+    `max_pending` images are queued or being read at once; more are refused
+    with OCRQueueFull rather than piling up in memory.
+    """
+
+    def __init__(self, workers, ttl_seconds, max_pending):
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Notified when pending images finish, for batches waiting for room
+        self._room = threading.Condition(self._lock)
+        self._stage_totals = defaultdict(lambda: [0, 0.0])
+        self._pending = 0
+        # Moving average of seconds per image in the workers
+        self._mean_seconds = 1.0
+        self.metrics = {"accepted": 0, "rejected": 0}
+
+    def _get_pool(self):
+        if self._pool is None:
+            if is_sqlite_memory(DATABASE_URL):
+                # An in-memory database only exists in this process; a worker
+                # process would store scans in its own empty copy
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished"] is not None and job["finished"] < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    def _save_job(self, job, prune=False):
+        """Write the job's status to ocr_scan_jobs; with `prune`, drop expired rows."""
+        db = SessionLocal()
+        try:
+            db.merge(OCRScanJob(
+                job_id=job["job_id"],
+                created_at=job["created_at"],
+                finished_at=datetime.utcfromtimestamp(job["finished"]) if job["finished"] else None,
+                **{field: job[field] for field in _STORED_FIELDS},
+            ))
+            if prune:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+                db.query(OCRScanJob).filter(OCRScanJob.finished_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to save OCR job {job['job_id']}: {e}")
+        finally:
+            db.close()
+
+    def _stored_status(self, job_id):
+        """Status of a job from ocr_scan_jobs, e.g. one queued by another worker."""
+        db = SessionLocal()
+        try:
+            row = db.get(OCRScanJob, job_id)
+        finally:
+            db.close()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        if row is None or (row.finished_at is not None and row.finished_at < cutoff):
+            return None
+        return {
+            "job_id": row.job_id,
+            "created_at": row.created_at,
+            **{field: getattr(row, field) for field in _STORED_FIELDS},
+        }
+
+    def _reserve(self, images):
+        """Count `images` as pending, or raise OCRQueueFull when there is no room."""
+        with self._lock:
+            if self._pending + images > self.max_pending:
+                self.metrics["rejected"] += 1
+                raise OCRQueueFull(self.retry_after())
+            self._pending += images
+            self.metrics["accepted"] += images
+
+    def _reserve_window(self, images, timeout):
+        """
+        Count up to `images` images as pending, as many as there is room
+        for, waiting up to `timeout` seconds for room for at least one.
+        Returns how many were counted, or raises OCRQueueFull.
+        """
+        deadline = time.monotonic() + timeout
+        with self._room:
+            while self._pending >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics["rejected"] += 1
+                    raise OCRQueueFull(self.retry_after())
+                self._room.wait(remaining)
+            window = min(images, self.max_pending - self._pending)
+            self._pending += window
+            self.metrics["accepted"] += window
+            return window
+
+    def _done(self, images, seconds=None):
+        with self._room:
+            self._pending -= images
+            if images and seconds is not None:
+                self._mean_seconds = 0.8 * self._mean_seconds + 0.2 * seconds / images
+            self._room.notify_all()
+
+    def retry_after(self):
+        """Seconds until the pending images are likely to be read, at least 1."""
+        return max(1, math.ceil(self._mean_seconds * (self._pending + 1) / self.workers))
+
+    def queue_stats(self):
+        return {
+            **self.metrics,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "mean_image_seconds": round(self._mean_seconds, 3),
+            "retry_after": self.retry_after(),
+        }
+
+    def _cache_lookup(self, content, sha256=None, category=None):
+        if not settings.OCR_CACHE_ENABLED:
+            return None, None
+        fingerprint = ocr_cache.fingerprint(content, sha256, category)
+        return fingerprint, ocr_cache.get(fingerprint)
+
+    def submit(self, product_id, image, image_id):
+        """
+        Queue OCR of an image already in the image store (`image` as returned
+        by image_store.save_stream). The job owns one reference to
+        `image_id`, which is handed to the Expiry row or released on failure.
+        Without a `product_id` the product is matched from the label text.
+        Raises OCRQueueFull when the workers are saturated.
+        """
+        category = None
+        if product_id is not None:
+            db = SessionLocal()
+            try:
+                category = db.query(Product.category).filter(Product.id == product_id).scalar()
+            finally:
+                db.close()
+        fingerprint, cached = self._cache_lookup(image["path"], image["sha256"], category)
+        if product_id is None:
+            # Cached results hold the date line only, not the product name
+            cached = None
+        self._reserve(1)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "product_id": product_id,
+            "status": "queued",
+            "created_at": datetime.utcnow(),
+            "submitted": time.time(),
+            "result": None,
+            "error": None,
+            "finished": None,
+            "future": None,
+            "fingerprint": fingerprint,
+            "image_id": image_id,
+            "image_path": image["path"],
+            "timings": None,
+            "suggestions": None,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        # Saved before the pool can finish the job, so the final status wins
+        self._save_job(job, prune=True)
+        try:
+            future = self._get_pool().submit(_run_scan_job, product_id, image["path"], image_id, cached, category)
+        except Exception:
+            with self._lock:
+                del self._jobs[job_id]
+            job.update(status="failed", error="OCR workers unavailable.", finished=time.time())
+            self._save_job(job)
+            self._done(1)
+            raise
+        job["future"] = future
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return self.status(job_id)
+
+    def _finish(self, job, future):
+        try:
+            outcome = future.result()
+            if outcome["status"] == "unmatched":
+                outcome = self._store_matched(job, outcome)
+            job["status"] = outcome["status"]
+            job["result"] = outcome.get("expiry")
+            job["error"] = outcome.get("error")
+            job["timings"] = outcome.get("timings")
+            self._record_timings(job["timings"])
+            if outcome["status"] == "done":
+                # The calendar and OCR caches live in this process, not the worker
+                invalidate_expiry_calendar()
+                expiry = outcome["expiry"]
+                if job["fingerprint"] is not None and not outcome["cached"] and expiry["detected_text"]:
+                    ocr_cache.put(
+                        job["fingerprint"], expiry["expiry_date"], expiry["detected_text"], expiry["confidence"]
+                    )
+        except Exception as e:
+            logger.error(f"OCR job {job['job_id']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = "OCR scan failed. Please upload a valid image."
+        if job["status"] != "done":
+            self._release_image(job["image_id"])
+        job["finished"] = time.time()
+        self._save_job(job)
+        self._done(1, job["finished"] - job["submitted"])
+
+    def _store_matched(self, job, outcome):
+        """Pick the product for an unmatched reading by its label text and store the expiry."""
+        reading = outcome["reading"]
+        db = SessionLocal()
+        try:
+            job["suggestions"] = product_index.match(db, reading["label_text"])
+            best = job["suggestions"][0] if job["suggestions"] else None
+            if best is None or best["score"] < settings.PRODUCT_MATCH_MIN_SCORE:
+                return {
+                    "status": "failed",
+                    "error": "Could not match the label to a product. Please pick the product.",
+                    "timings": outcome["timings"],
+                }
+            job["product_id"] = best["product_id"]
+            expiry = _store_expiry(db, best["product_id"], job["image_path"], job["image_id"], reading)
+            return {"status": "done", "expiry": expiry, "timings": outcome["timings"], "cached": False}
+        finally:
+            db.close()
+
+    def _record_timings(self, timings):
+        if not timings:
+            return
+        with self._lock:
+            for stage, ms in timings.items():
+                totals = self._stage_totals[stage]
+                totals[0] += 1
+                totals[1] += ms
+
+    def stage_timings(self):
+        """Per OCR stage: images that reached it, total and mean milliseconds."""
+        with self._lock:
+            return {
+                stage: {"images": count, "total_ms": round(total, 2), "mean_ms": round(total / count, 2)}
+                for stage, (count, total) in sorted(self._stage_totals.items())
+            }
+
+    def _release_image(self, image_id):
+        db = SessionLocal()
+        try:
+            image_store.release(db, image_id)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Failed to release image {image_id}: {e}")
+        finally:
+            db.close()
+        image_store.purge([image_id])
+
+    def extract_many(self, contents, categories=None):
+        """
+        OCR a batch of images in parallel across the worker processes and
+        return read_expiry() results in order. Images already in the result
+        cache are not sent to the workers. `categories` (one per image)
+        resolve ambiguous dates. The rest go to the workers in windows of at
+        most `max_pending` images, each as large as the room left: the first
+        raises OCRQueueFull when the workers have no room at all, later ones
+        wait up to OCR_QUEUE_TIMEOUT_SECONDS for it. Results read before an
+        OCRQueueFull are in the cache, so a retry skips them.
+        """
+        categories = categories or [None] * len(contents)
+        lookups = [self._cache_lookup(content, category=category) for content, category in zip(contents, categories)]
+        results = [dict(cached, timings={}) if cached else None for _, cached in lookups]
+        misses = [i for i, (_, cached) in enumerate(lookups) if cached is None]
+        timeout = 0
+        while misses:
+            window = self._reserve_window(len(misses), timeout)
+            batch, misses = misses[:window], misses[window:]
+            timeout = settings.OCR_QUEUE_TIMEOUT_SECONDS
+            started = time.time()
+            try:
+                chunksize = max(1, len(batch) // (self.workers * 4))
+                read = self._get_pool().map(
+                    read_expiry, [contents[i] for i in batch], [categories[i] for i in batch], chunksize=chunksize
+                )
+                for i, result in zip(batch, read):
+                    results[i] = result
+                    self._record_timings(result["timings"])
+                    fingerprint = lookups[i][0]
+                    if fingerprint is not None and result["expiry_date"] and result["detected_text"]:
+                        ocr_cache.put(fingerprint, result["expiry_date"], result["detected_text"], result["confidence"])
+            finally:
+                # Wall time over the window, spread across the workers
+                self._done(len(batch), (time.time() - started) * min(self.workers, len(batch)))
+        return results
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return self._stored_status(job_id)
+        status = job["status"]
+        if status == "queued" and job["future"] is not None and job["future"].running():
+            status = "running"
+        return {
+            "job_id": job["job_id"],
+            "product_id": job["product_id"],
+            "status": status,
+            "created_at": job["created_at"],
+            "result": job["result"],
+            "error": job["error"],
+            "timings": job["timings"],
+            "suggestions": job["suggestions"],
+        }
+
+    async def wait(self, job_id, timeout):
+        """Long-poll: return once the job has finished or `timeout` seconds pass."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            # Queued by another worker: follow its row in ocr_scan_jobs
+            deadline = time.monotonic() + timeout
+            while True:
+                status = await asyncio.to_thread(self._stored_status, job_id)
+                remaining = deadline - time.monotonic()
+                if status is None or status["status"] in ("done", "failed") or remaining <= 0:
+                    return status
+                await asyncio.sleep(min(STORED_POLL_SECONDS, remaining))
+        if job["finished"] is None and job["future"] is not None and timeout > 0:
+            # _finish was registered on the future first, so it has already
+            # run by the time the wrapped future resolves
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job["future"])), timeout)
+            except Exception:
+                # Timeouts and worker errors are both reported through status()
+                pass
+        return self.status(job_id)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+ocr_jobs = OCRJobQueue(settings.OCR_WORKERS, settings.OCR_JOB_TTL_SECONDS, settings.OCR_MAX_PENDING_JOBS)
@@ -0,0 +1,190 @@
+import re
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from app.core.config import settings
+from app.db.models.product import Product
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+
+def trigrams(text):
+    """
+    pg_trgm-style trigrams of upper-cased alphanumeric words, each padded
+    with two spaces in front and one behind, so short words still count.
+    """
+    grams = set()
+    for word in _NON_ALNUM.sub(" ", (text or "").upper()).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _TrigramPostings:
+    """
+    Trigram -> slots of the products containing it, and each slot's trigram
+    count. Postings are turned into numpy arrays on first use and cached
+    until a product containing that trigram changes, so a query is one
+    bincount over the concatenated postings of its trigrams.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.grams = {}
+        self.sizes = np.zeros(0)
+        self._arrays = {}
+
+    def add(self, slot, text):
+        self.remove(slot)
+        grams = trigrams(text)
+        if slot >= len(self.sizes):
+            self.sizes = np.concatenate([self.sizes, np.zeros(max(slot + 1, 2 * len(self.sizes)) - len(self.sizes))])
+        self.grams[slot] = grams
+        self.sizes[slot] = len(grams)
+        for gram in grams:
+            self.postings[gram].add(slot)
+            self._arrays.pop(gram, None)
+
+    def remove(self, slot):
+        for gram in self.grams.pop(slot, ()):
+            slots = self.postings[gram]
+            slots.discard(slot)
+            self._arrays.pop(gram, None)
+            if not slots:
+                del self.postings[gram]
+        if slot < len(self.sizes):
+            self.sizes[slot] = 0
+
+    def containment(self, query, slots):
+        """Per slot (first `slots`), the share of the product's trigrams found in `query`."""
+        arrays = []
+        for gram in query:
+            array = self._arrays.get(gram)
+            if array is None and gram in self.postings:
+                array = self._arrays[gram] = np.fromiter(self.postings[gram], dtype=np.int64)
+            if array is not None:
+                arrays.append(array)
+        if not arrays:
+            return np.zeros(slots)
+        hits = np.bincount(np.concatenate(arrays), minlength=slots)[:slots]
+        sizes = self.sizes[:slots]
+        return np.divide(hits, sizes, out=np.zeros(slots), where=sizes > 0)
+
+
+class ProductIndex:
+    """
+    In-memory trigram index over product names and barcodes that suggests
+    which product a piece of OCR text belongs to. A product scores the share
+    of its name (or barcode) trigrams that appear in the text, so a label
+    containing the whole name scores 1.0 whatever else is printed on it.
+
+    The index is loaded from the database on first use and kept current by
+    the product endpoints; it is rebuilt after PRODUCT_INDEX_MAX_AGE_SECONDS
+    to pick up changes made by other worker processes.
+    """
+
+    def __init__(self, max_age_seconds):
+        self.max_age_seconds = max_age_seconds
+        self._reset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _reset(self):
+        self._names = _TrigramPostings()
+        self._barcodes = _TrigramPostings()
+        # Products live in dense slots so scores are plain arrays; freed
+        # slots are reused
+        self._slots = {}
+        self._products = []
+        self._free = []
+
+    def _add(self, product_id, name, barcode):
+        slot = self._slots.get(product_id)
+        if slot is None:
+            slot = self._free.pop() if self._free else len(self._products)
+            if slot == len(self._products):
+                self._products.append(None)
+            self._slots[product_id] = slot
+        self._products[slot] = (product_id, name, barcode)
+        self._names.add(slot, name)
+        self._barcodes.add(slot, barcode)
+
+    def load(self, rows):
+        """Replace the index contents with (id, name, barcode) rows."""
+        with self._lock:
+            self._reset()
+            for product_id, name, barcode in rows:
+                self._add(product_id, name, barcode)
+            self._loaded_at = time.monotonic()
+
+    def rebuild(self, db):
+        self.load(db.query(Product.id, Product.name, Product.barcode).all())
+
+    def _ensure_loaded(self, db):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age_seconds:
+            self.rebuild(db)
+
+    def upsert(self, product):
+        """Index a created or updated product; no-op until the index is loaded."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._add(product.id, product.name, product.barcode)
+
+    def remove(self, product_id):
+        with self._lock:
+            slot = self._slots.pop(product_id, None) if self._loaded_at is not None else None
+            if slot is not None:
+                self._products[slot] = None
+                self._names.remove(slot)
+                self._barcodes.remove(slot)
+                self._free.append(slot)
+
+    def match(self, db, text, limit=5):
+        """
+        Best-matching products for `text`, best first, as dicts with
+        `product_id`, `name`, `barcode`, `score` (0-1) and `matched_on`.
+        """
+        self._ensure_loaded(db)
+        query = trigrams(text)
+        if not query:
+            return []
+        with self._lock:
+            slots = len(self._products)
+            by_name = self._names.containment(query, slots)
+            by_barcode = self._barcodes.containment(query, slots)
+            scores = np.maximum(by_name, by_barcode)
+            # Ties go to the longer, more specific name
+            ranked = scores + self._names.sizes[:slots] * 1e-6
+            top = np.argpartition(-ranked, limit - 1)[:limit] if slots > limit else np.arange(slots)
+            matches = []
+            for slot in top[np.argsort(-ranked[top])]:
+                if scores[slot] <= 0:
+                    break
+                product_id, name, barcode = self._products[slot]
+                matches.append({
+                    "product_id": product_id,
+                    "name": name,
+                    "barcode": barcode,
+                    "score": round(float(scores[slot]), 3),
+                    "matched_on": "barcode" if by_barcode[slot] > by_name[slot] else "name",
+                })
+            return matches
+
+    def best_match(self, db, text):
+        """The top match if it reaches PRODUCT_MATCH_MIN_SCORE, else None."""
+        matches = self.match(db, text, limit=1)
+        if matches and matches[0]["score"] >= settings.PRODUCT_MATCH_MIN_SCORE:
+            return matches[0]
+        return None
+
+    def stats(self):
+        return {
+            "products": len(self._slots),
+            "name_trigrams": len(self._names.postings),
+            "barcode_trigrams": len(self._barcodes.postings),
+            "age_seconds": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1),
+        }
+
+
+product_index = ProductIndex(settings.PRODUCT_INDEX_MAX_AGE_SECONDS)
@@ -0,0 +1,95 @@
+import csv
+import json
+from datetime import timezone
+from pydantic import ValidationError
+from app.db.schemas.sales import SalesBulkRow
+
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+CSV_TYPES = {"text/csv", "application/csv"}
+REQUIRED_COLUMNS = {"product_id", "quantity_sold"}
+
+
+class BodyTooLarge(Exception):
+    """Raised by iter_lines once the body exceeds its byte limit."""
+
+
+async def iter_lines(stream, max_line_bytes=None, max_body_bytes=None):
+    """
+    (line number, bytes) for each line of a streamed request body, numbered
+    from 1. Lines longer than `max_line_bytes` are yielded as None without
+    being buffered; more than `max_body_bytes` in all raises BodyTooLarge.
+    """
+    buffer = b""
+    number = 0
+    received = 0
+    # The current line is over the limit; its bytes are dropped until its end
+    skipping = False
+    async for piece in stream:
+        received += len(piece)
+        if max_body_bytes is not None and received > max_body_bytes:
+            raise BodyTooLarge(f"Request body larger than {max_body_bytes} bytes")
+        if b"\n" not in piece:
+            if not skipping:
+                buffer += piece
+                if max_line_bytes is not None and len(buffer) > max_line_bytes:
+                    buffer, skipping = b"", True
+            continue
+        *lines, rest = (buffer + piece).split(b"\n")
+        for line in lines:
+            number += 1
+            too_long = skipping or (max_line_bytes is not None and len(line) > max_line_bytes)
+            skipping = False
+            yield number, None if too_long else line
+        buffer = rest
+        if max_line_bytes is not None and len(buffer) > max_line_bytes:
+            buffer, skipping = b"", True
+    if buffer or skipping:
+        yield number + 1, None if skipping else buffer
+
+
+def read_csv_header(line):
+    """Lower-cased column names from a CSV header line; product_id and quantity_sold are required."""
+    columns = [column.strip().lower() for column in next(csv.reader([line.decode("utf-8-sig")]))]
+    missing = REQUIRED_COLUMNS - set(columns)
+    if missing:
+        raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+    return columns
+
+
+def _describe(error):
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+
+def parse_rows(lines, columns=None):
+    """
+    Validate numbered lines: NDJSON objects, or CSV rows with `columns`.
+    Returns (rows, errors). Rows are dicts with the line number, product_id,
+    quantity_sold and a naive UTC timestamp (None when not given); errors
+    are {"line", "error"} for each rejected line.
+    """
+    rows, errors = [], []
+    for number, line in lines:
+        try:
+            text = line.decode("utf-8").strip()
+            if columns is None:
+                data = json.loads(text)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+            else:
+                values = next(csv.reader([text]))
+                if len(values) != len(columns):
+                    raise ValueError(f"expected {len(columns)} fields, got {len(values)}")
+                data = {column: value.strip() or None for column, value in zip(columns, values)}
+            row = SalesBulkRow(**data)
+        except ValidationError as e:
+            errors.append({"line": number, "error": _describe(e)})
+            continue
+        except ValueError as e:
+            # Also JSON syntax errors and undecodable bytes
+            errors.append({"line": number, "error": str(e)})
+            continue
+        timestamp = row.timestamp
+        if timestamp is not None and timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        rows.append({"line": number, "product_id": row.product_id, "quantity_sold": row.quantity_sold, "timestamp": timestamp})
+    return rows, errors
@@ -0,0 +1,128 @@
+"""
+Daily sales rollup: units and number of sales per product and day in
+sales_daily, maintained as sales are inserted.
+
+Writers add their rows' totals with `add_statement` in the same
+transaction as the sales (insert, or add to the existing product-day row),
+and `rebuild_sales_daily` recomputes the table from sales for backfills
+and data loaded outside the app:
+
+    python -m app.services.sales_rollup [--since 2026-01-01]
+"""
+
+import argparse
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from app.db.database import SessionLocal
+from app.db.models.sales import Sales
+from app.db.models.sales_daily import SalesDaily
+
+
+def daily_totals(rows):
+    """
+    sales_daily values (units and transactions per product and day) for
+    sales dicts with product_id, quantity_sold and timestamp, sorted so
+    concurrent writers lock product-days in the same order.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        total = totals[(row["product_id"], row["timestamp"].date())]
+        total[0] += row["quantity_sold"] or 0
+        total[1] += 1
+    return [
+        {"product_id": product_id, "day": day, "units": units, "transactions": transactions}
+        for (product_id, day), (units, transactions) in sorted(totals.items())
+    ]
+
+
+def add_statement(dialect_name):
+    """
+    Upsert adding daily_totals values to sales_daily (insert, or add to the
+    existing product-day). Executed with the list of values, so it is
+    compiled once and sent as an executemany. Only the databases the app
+    runs on (MySQL and SQLite) are supported.
+    """
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(SalesDaily)
+        return statement.on_duplicate_key_update(
+            units=SalesDaily.units + statement.inserted.units,
+            transactions=SalesDaily.transactions + statement.inserted.transactions,
+        )
+    if dialect_name != "sqlite":
+        raise ValueError(f"Unsupported database for sales_daily: {dialect_name} (use MySQL or SQLite)")
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    statement = sqlite_insert(SalesDaily)
+    return statement.on_conflict_do_update(
+        index_elements=[SalesDaily.product_id, SalesDaily.day],
+        set_={
+            "units": SalesDaily.units + statement.excluded.units,
+            "transactions": SalesDaily.transactions + statement.excluded.transactions,
+        },
+    )
+
+
+def rebuild_sales_daily(db, since=None):
+    """
+    Recompute sales_daily from sales, for the days from `since` on (all days
+    when omitted), in one transaction. Returns the product-days written.
+    """
+    started = time.perf_counter()
+    # DATE() on both MySQL and SQLite; CAST(... AS DATE) is numeric on SQLite
+    day = func.date(Sales.timestamp)
+    totals = (
+        select(Sales.product_id, day, func.coalesce(func.sum(Sales.quantity_sold), 0), func.count())
+        .where(Sales.timestamp.is_not(None))
+        .group_by(Sales.product_id, day)
+    )
+    clear = delete(SalesDaily)
+    if since is not None:
+        totals = totals.where(Sales.timestamp >= datetime.combine(since, datetime.min.time()))
+        clear = clear.where(SalesDaily.day >= since)
+    db.execute(clear)
+    result = db.execute(
+        insert(SalesDaily).from_select(["product_id", "day", "units", "transactions"], totals)
+    )
+    db.commit()
+    return {"product_days": result.rowcount, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def daily_units(db, days, end=None, product_ids=None):
+    """
+    Units sold per product and day over the `days` days ending with `end`
+    (default yesterday). Returns (first day, {product_id: array of `days`
+    units}); products without sales in the range are left out.
+    """
+    end = end or date.today() - timedelta(days=1)
+    first = end - timedelta(days=days - 1)
+    query = db.query(SalesDaily.product_id, SalesDaily.day, SalesDaily.units).filter(
+        SalesDaily.day >= first, SalesDaily.day <= end
+    )
+    if product_ids is not None:
+        query = query.filter(SalesDaily.product_id.in_(product_ids))
+    history = {}
+    for product_id, day, units in query:
+        if product_id not in history:
+            history[product_id] = np.zeros(days, dtype=np.int64)
+        history[product_id][(day - first).days] = units
+    return first, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to rebuild (default: all)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = rebuild_sales_daily(db, args.since)
+    finally:
+        db.close()
+    print(f"sales_daily: {result['product_days']:,} product-days in {result['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.db.models.job_run import JobRun
+from app.services.expiry_logic import apply_discount_logic, record_alerts
+from app.services.forecast_model import refresh_forecasts
+from app.services.image_store import image_store
+
+
+def _parse_cron_field(field, low, high):
+    """Expand one cron field (`*`, `*/n`, `a-b`, `a,b`, `a-b/n`) to a set."""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-"))
+        else:
+            start = end = int(part)
+        if start < low or end > high or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Minimal 5-field cron expression: minute hour day-of-month month
+    day-of-week. As in standard cron, when both day fields are restricted
+    (neither starts with `*`) a day matches if either of them does.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        # Cron uses 0 (or 7) for Sunday, Python's weekday() uses 6
+        self.weekdays = {(d - 1) % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self.either_day = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = moment.weekday() in self.weekdays
+        return in_days or in_weekdays if self.either_day else in_days and in_weekdays
+
+    def next_after(self, moment):
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # A full leap-year cycle, so schedules on February 29 are found
+        limit = candidate + timedelta(days=4 * 366)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+
+class Job:
+    def __init__(self, name, schedule, func):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.func = func
+        self.next_run_at = None
+        self.last_run_at = None
+        self.last_status = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self.last_result = None
+        self.run_count = 0
+        self._local_lock = threading.Lock()
+
+    def status(self):
+        return {
+            "name": self.name,
+            "schedule": self.schedule.expression,
+            "next_run_at": self.next_run_at,
+            "last_run_at": self.last_run_at,
+            "last_status": self.last_status,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+            "run_count": self.run_count,
+        }
+
+
+# Identifies this process in job_runs rows
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim_run(db, name, scheduled_at):
+    """
+    Claim the run of `name` due at `scheduled_at` by inserting its job_runs
+    row. Every worker computes the same fire times, so the primary key lets
+    exactly one of them run each one, however long the run takes. Returns
+    the row, or None when another worker already claimed it.
+    """
+    try:
+        db.execute(insert(JobRun).values(
+            job_name=name, scheduled_at=scheduled_at, worker=WORKER_ID, status="running", started_at=datetime.now()
+        ))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    cutoff = datetime.now() - timedelta(days=settings.JOB_RUN_RETENTION_DAYS)
+    db.query(JobRun).filter(JobRun.job_name == name, JobRun.scheduled_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return db.get(JobRun, (name, scheduled_at))
+
+
+def _alerts_job(db):
+    return record_alerts(db)
+
+
+def _discount_job(db):
+    return apply_discount_logic(db)
+
+
+def _forecast_job(db):
+    return {"products_forecast": len(refresh_forecasts(db))}
+
+
+def _images_job(db):
+    return image_store.reconcile(db)
+
+
+def _archive_job(db):
+    return image_store.archive(db, settings.IMAGE_ORIGINAL_RETENTION_DAYS, settings.IMAGE_ARCHIVE_MODE)
+
+
+class Scheduler:
+    """
+    In-process asyncio scheduler. Each job gets its own task that sleeps
+    until the next cron match and then runs the job in a worker thread.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._tasks = []
+
+    def add_job(self, name, schedule, func):
+        self.jobs[name] = Job(name, schedule, func)
+
+    def _run_job_sync(self, job, scheduled_at):
+        # Skip instead of queueing if the previous run is still going
+        if not job._local_lock.acquire(blocking=False):
+            return "skipped", None
+        try:
+            db = SessionLocal()
+            try:
+                run = _claim_run(db, job.name, scheduled_at)
+                if run is None:
+                    return "skipped", None
+                started = time.perf_counter()
+                try:
+                    result = job.func(db)
+                except Exception as e:
+                    db.rollback()
+                    run.status, run.error = "failed", str(e)[:1000]
+                    raise
+                else:
+                    run.status, run.result = "success", result
+                    return "success", result
+                finally:
+                    run.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+                    db.commit()
+            finally:
+                db.close()
+        finally:
+            job._local_lock.release()
+
+    async def run_job(self, name, scheduled_at=None):
+        """
+        Run a job for the fire time `scheduled_at`; manual runs use the
+        current second, so they don't collide with scheduled ones.
+        """
+        job = self.jobs[name]
+        started = time.perf_counter()
+        job.last_run_at = datetime.now()
+        scheduled_at = scheduled_at or job.last_run_at.replace(microsecond=0)
+        try:
+            job.last_status, result = await asyncio.to_thread(self._run_job_sync, job, scheduled_at)
+            if job.last_status == "success":
+                job.last_result = result
+            job.last_error = None
+        except Exception as e:
+            logger.error(f"Scheduled job {name} failed: {e}")
+            job.last_status = "failed"
+            job.last_error = str(e)
+        job.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        job.run_count += 1
+        return job.status()
+
+    async def _job_loop(self, job):
+        while True:
+            job.next_run_at = job.schedule.next_after(datetime.now())
+            delay = (job.next_run_at - datetime.now()).total_seconds()
+            await asyncio.sleep(max(delay, 0))
+            await self.run_job(job.name, job.next_run_at)
+
+    def start(self):
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job)))
+        logger.info(f"Scheduler started with jobs: {', '.join(self.jobs)}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self, db):
+        """
+        Job schedules with the latest run of each from job_runs, whichever
+        worker ran it; run_count counts this process's attempts.
+        """
+        latest = (
+            db.query(JobRun.job_name, func.max(JobRun.scheduled_at).label("scheduled_at"))
+            .group_by(JobRun.job_name)
+            .subquery()
+        )
+        runs = {
+            run.job_name: run
+            for run in db.query(JobRun).join(
+                latest, (JobRun.job_name == latest.c.job_name) & (JobRun.scheduled_at == latest.c.scheduled_at)
+            )
+        }
+        statuses = []
+        for job in self.jobs.values():
+            status = job.status()
+            run = runs.get(job.name)
+            if run is not None:
+                status.update({
+                    "last_run_at": run.started_at,
+                    "last_scheduled_at": run.scheduled_at,
+                    "last_worker": run.worker,
+                    "last_status": run.status,
+                    "last_duration_ms": run.duration_ms,
+                    "last_error": run.error,
+                    "last_result": run.result,
+                })
+            statuses.append(status)
+        return statuses
+
+
+scheduler = Scheduler()
+scheduler.add_job("alerts", settings.ALERTS_JOB_CRON, _alerts_job)
+scheduler.add_job("discounts", settings.DISCOUNT_JOB_CRON, _discount_job)
+scheduler.add_job("forecast", settings.FORECAST_JOB_CRON, _forecast_job)
+scheduler.add_job("images", settings.IMAGE_GC_JOB_CRON, _images_job)
+scheduler.add_job("archive", settings.IMAGE_ARCHIVE_JOB_CRON, _archive_job)
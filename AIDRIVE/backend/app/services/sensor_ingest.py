@@ -0,0 +1,318 @@
+import asyncio
+import math
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert, select
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.db.models.product import Product
+from app.db.models.sensor_calibration import SensorCalibration
+from app.db.models.stock import Stock
+
+# Ids per IN (...) lookup and rows per insert statement when flushing
+FLUSH_BATCH = 500
+
+
+def _utc_naive(timestamp):
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _parse_timestamp(field):
+    field = field.strip()
+    try:
+        return datetime.fromtimestamp(float(field), timezone.utc).replace(tzinfo=None)
+    except ValueError:
+        return _utc_naive(datetime.fromisoformat(field.replace("Z", "+00:00")))
+
+
+def parse_datagram(data):
+    """
+    Readings from a datagram of "product_id,value[,timestamp]" lines, the
+    timestamp in Unix seconds or ISO 8601. Returns (readings, invalid lines).
+    """
+    readings, invalid = [], 0
+    for line in data.decode("utf-8", "replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            fields = line.split(",")
+            if len(fields) not in (2, 3):
+                raise ValueError(line)
+            timestamp = _parse_timestamp(fields[2]) if len(fields) == 3 and fields[2].strip() else None
+            readings.append((int(fields[0]), float(fields[1]), timestamp))
+        except ValueError:
+            invalid += 1
+    return readings, invalid
+
+
+def sensor_to_units(value, calibration, max_stock):
+    """
+    Units on the shelf for a sensor value: (value - tare) / unit_weight with
+    a calibration, otherwise the value read as the shelf's fill fraction of
+    max_stock.
+    """
+    if calibration is not None:
+        return max(round((value - calibration.tare) / calibration.unit_weight), 0)
+    return round(min(max(value, 0.0), 1.0) * (max_stock or 0))
+
+
+class _Window:
+    """Readings of one product since the last flush."""
+    __slots__ = ("value", "low", "high", "count", "last_at", "received")
+
+    def __init__(self, value, at, received):
+        self.value = self.low = self.high = value
+        self.count = 1
+        self.last_at = at
+        self.received = received
+
+    def add(self, value, at):
+        self.count += 1
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        # Late datagrams update the range but not the current value
+        if at >= self.last_at:
+            self.value = value
+            self.last_at = at
+
+    def merge(self, newer):
+        """Fold in a window opened after this one, e.g. while a flush of this one failed."""
+        self.count += newer.count
+        self.low = min(self.low, newer.low)
+        self.high = max(self.high, newer.high)
+        if newer.last_at >= self.last_at:
+            self.value = newer.value
+            self.last_at = newer.last_at
+
+
+class _SensorProtocol(asyncio.DatagramProtocol):
+    def __init__(self, ingest):
+        self.ingest = ingest
+
+    def datagram_received(self, data, addr):
+        readings, invalid = parse_datagram(data)
+        self.ingest.submit_many(readings, invalid)
+
+
+class SensorIngest:
+    """
+    In-memory buffer between shelf sensors and the stock table. Readings
+    are coalesced per product (last value, min/max, count) and every
+    `flush_interval` seconds each product's window becomes one stock row,
+    written in batched inserts with current_stock from the product's
+    calibration. A window is opened for at most `max_products` products;
+    readings for others are dropped until the next flush. Windows whose
+    flush fails go back into the buffer for the next one.
+    """
+
+    def __init__(self, flush_interval, max_products):
+        self.flush_interval = flush_interval
+        self.max_products = max_products
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = {}
+        self.counters = {
+            "received": 0,
+            "rows_written": 0,
+            "flushes": 0,
+            "dropped_invalid": 0,
+            "dropped_buffer_full": 0,
+            "dropped_unknown_product": 0,
+            "flush_failures": 0,
+        }
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._latency_max = 0.0
+        self._flush_seconds_max = 0.0
+        self._last_flush_seconds = 0.0
+        self._task = None
+        self._transports = []
+        self._unix_path = None
+
+    def submit_many(self, readings, invalid=0):
+        """Buffer (product_id, value, timestamp) readings. Returns how many were accepted."""
+        received = time.monotonic()
+        now = datetime.utcnow()
+        accepted = 0
+        with self._lock:
+            self.counters["received"] += len(readings) + invalid
+            self.counters["dropped_invalid"] += invalid
+            for product_id, value, timestamp in readings:
+                if product_id <= 0 or not math.isfinite(value):
+                    self.counters["dropped_invalid"] += 1
+                    continue
+                at = _utc_naive(timestamp) or now
+                window = self._buffer.get(product_id)
+                if window is not None:
+                    window.add(value, at)
+                elif len(self._buffer) < self.max_products:
+                    self._buffer[product_id] = _Window(value, at, received)
+                else:
+                    self.counters["dropped_buffer_full"] += 1
+                    continue
+                accepted += 1
+        return accepted
+
+    def _rows(self, db, windows):
+        """Stock rows for the windows of products that exist, and the readings dropped for the rest."""
+        ids = list(windows)
+        products, calibrations = {}, {}
+        for start in range(0, len(ids), FLUSH_BATCH):
+            batch = ids[start:start + FLUSH_BATCH]
+            products.update(db.execute(select(Product.id, Product.max_stock).where(Product.id.in_(batch))).all())
+            calibrations.update(
+                (calibration.product_id, calibration)
+                for calibration in db.scalars(select(SensorCalibration).where(SensorCalibration.product_id.in_(batch)))
+            )
+        rows, unknown = [], 0
+        for product_id, window in windows.items():
+            if product_id not in products:
+                unknown += window.count
+                continue
+            rows.append({
+                "product_id": product_id,
+                "current_stock": sensor_to_units(window.value, calibrations.get(product_id), products[product_id]),
+                "shelf_sensor_value": window.value,
+                "sensor_min": window.low,
+                "sensor_max": window.high,
+                "reading_count": window.count,
+                "timestamp": window.last_at,
+            })
+        return rows, unknown
+
+    def flush(self):
+        """Write the buffered windows, one stock row per product, in one transaction. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                windows, self._buffer = self._buffer, {}
+            if not windows:
+                return 0
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                rows, unknown = self._rows(db, windows)
+                for start in range(0, len(rows), FLUSH_BATCH):
+                    db.execute(insert(Stock), rows[start:start + FLUSH_BATCH])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to flush sensor readings for {len(windows)} products, keeping them: {e}")
+                with self._lock:
+                    self.counters["flush_failures"] += 1
+                    # Readings that arrived meanwhile are newer than the failed windows
+                    for product_id, window in windows.items():
+                        newer = self._buffer.get(product_id)
+                        if newer is not None:
+                            window.merge(newer)
+                        self._buffer[product_id] = window
+                return 0
+            finally:
+                db.close()
+            committed = time.monotonic()
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self.counters["flushes"] += 1
+                self.counters["rows_written"] += len(rows)
+                self.counters["dropped_unknown_product"] += unknown
+                for window in windows.values():
+                    latency = committed - window.received
+                    self._latency_total += latency
+                    self._latency_count += 1
+                    self._latency_max = max(self._latency_max, latency)
+                self._last_flush_seconds = seconds
+                self._flush_seconds_max = max(self._flush_seconds_max, seconds)
+            return len(rows)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Sensor flush loop error: {e}")
+
+    def _bind_unix_socket(self, path):
+        """A Unix datagram socket bound at `path`; a stale socket file from a dead process is replaced."""
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                probe.connect(path)
+                raise OSError(f"{path} is in use by another process")
+            except ConnectionRefusedError:
+                os.remove(path)
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        return sock
+
+    async def start(self, udp_host="", udp_port=0, unix_socket=""):
+        """Start the flush loop and the optional UDP / Unix socket listeners."""
+        loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._flush_loop())
+        if udp_port:
+            try:
+                # With several workers each binds the port and the kernel spreads datagrams
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _SensorProtocol(self), local_addr=(udp_host, udp_port),
+                    reuse_port=hasattr(socket, "SO_REUSEPORT"),
+                )
+                self._transports.append(transport)
+                logger.info(f"Sensor UDP listener on {udp_host}:{udp_port}")
+            except OSError as e:
+                logger.warning(f"Sensor UDP listener not started: {e}")
+        if unix_socket and hasattr(socket, "AF_UNIX"):
+            try:
+                sock = self._bind_unix_socket(unix_socket)
+                transport, _ = await loop.create_datagram_endpoint(lambda: _SensorProtocol(self), sock=sock)
+                self._transports.append(transport)
+                self._unix_path = unix_socket
+                logger.info(f"Sensor socket listener on {unix_socket}")
+            except OSError as e:
+                logger.warning(f"Sensor socket listener not started: {e}")
+
+    async def stop(self):
+        """Stop listening and write what is still buffered."""
+        for transport in self._transports:
+            transport.close()
+        self._transports = []
+        if self._unix_path:
+            try:
+                os.remove(self._unix_path)
+            except FileNotFoundError:
+                pass
+            self._unix_path = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                **self.counters,
+                "buffered_products": len(self._buffer),
+                "buffered_readings": sum(window.count for window in self._buffer.values()),
+                "max_products": self.max_products,
+                "flush_interval_seconds": self.flush_interval,
+                "latency_ms_max": round(self._latency_max * 1000, 1),
+                "last_flush_ms": round(self._last_flush_seconds * 1000, 1),
+                "flush_ms_max": round(self._flush_seconds_max * 1000, 1),
+                "listeners": [str(transport.get_extra_info("sockname")) for transport in self._transports],
+            }
+            # From a window's first reading until its row was committed
+            stats["latency_ms_mean"] = round(self._latency_total * 1000 / self._latency_count, 1) if self._latency_count else 0.0
+        return stats
+
+
+sensor_ingest = SensorIngest(
+    flush_interval=settings.SENSOR_FLUSH_INTERVAL_SECONDS,
+    max_products=settings.SENSOR_MAX_BUFFERED_PRODUCTS,
+)
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+from app.core.config import settings
+from app.db.models.inventory_lot import InventoryLot
+from app.services.fefo_allocator import consumable_lots
+from app.services.sales_rollup import daily_units
+
+# Created on first Monte Carlo request and reused until shutdown()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _pool
+
+
+def shutdown():
+    """Stop the simulation worker processes; the next request starts new ones."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def project_expired_units(demand, lot_quantity, lot_day):
+    """
+    Expired units per product and day for the whole catalog at once.
+
+    `demand` is a (products, days) array of forecast daily sales. Lots are
+    given as (products, max_lots) arrays sorted by expiry day per product, with
+    `lot_day` the day index the lot expires on and padding lots holding zero
+    quantity. Lots are consumed first-expired-first-out: comparing cumulative
+    demand up to each lot's expiry with cumulative lot quantities gives the
+    units each lot sells, and whatever is left expires on its expiry day.
+    """
+    products, horizon = demand.shape
+    cum_demand = np.concatenate((np.zeros((products, 1)), np.cumsum(demand, axis=1)), axis=1)
+    demand_at_expiry = np.take_along_axis(cum_demand, lot_day + 1, axis=1)
+
+    capacity = np.cumsum(lot_quantity, axis=1)
+    sold = capacity + np.minimum(np.minimum.accumulate(demand_at_expiry - capacity, axis=1), 0)
+    sold_per_lot = np.diff(sold, axis=1, prepend=0)
+    wasted = lot_quantity - sold_per_lot
+
+    expired = np.zeros((products, horizon))
+    rows = np.broadcast_to(np.arange(products)[:, None], lot_day.shape)
+    np.add.at(expired, (rows, lot_day), wasted)
+    return expired
+
+
+def _simulate_batch(forecast, lot_quantity, lot_day, samples, seed):
+    """Daily catalog-wide expired units for `samples` Poisson demand draws."""
+    rng = np.random.default_rng(seed)
+    totals = np.empty((samples, forecast.shape[1]))
+    for i in range(samples):
+        demand = rng.poisson(forecast)
+        totals[i] = project_expired_units(demand, lot_quantity, lot_day).sum(axis=0)
+    return totals
+
+
+def _load_lots(db, start, horizon):
+    """Per-product (expiry day index, quantity) for lots expiring in the window."""
+    end = start + timedelta(days=horizon - 1)
+    rows = consumable_lots(
+        db, InventoryLot.product_id, InventoryLot.expiry_date, InventoryLot.quantity
+    ).filter(InventoryLot.expiry_date.between(start, end))
+    lots = defaultdict(list)
+    for product_id, expiry_date, quantity in rows:
+        lots[product_id].append(((expiry_date - start).days, int(quantity)))
+    return lots
+
+
+def _forecast_matrix(db, product_ids, start, horizon):
+    """
+    Daily demand per product from its recent sales: the mean units sold on
+    the same weekday over the last FORECAST_HISTORY_DAYS days (from the
+    sales_daily rollup). Products without sales in that window get none.
+    """
+    history_days = settings.FORECAST_HISTORY_DAYS
+    first, history = daily_units(db, history_days, end=start - timedelta(days=1), product_ids=product_ids)
+    sold = np.zeros((len(product_ids), history_days))
+    for row, product_id in enumerate(product_ids):
+        if product_id in history:
+            sold[row] = history[product_id]
+
+    weekdays = (first.weekday() + np.arange(history_days)) % 7
+    # Weekdays missing from a short window fall back to the overall mean
+    profile = np.stack([
+        sold[:, weekdays == day].mean(axis=1) if (weekdays == day).any() else sold.mean(axis=1)
+        for day in range(7)
+    ], axis=1)
+    return profile[:, (start.weekday() + np.arange(horizon)) % 7]
+
+
+def _lot_matrices(product_ids, lots):
+    max_lots = max(len(lots[pid]) for pid in product_ids)
+    lot_day = np.zeros((len(product_ids), max_lots), dtype=np.int64)
+    lot_quantity = np.zeros((len(product_ids), max_lots))
+    for row, product_id in enumerate(product_ids):
+        product_lots = sorted(lots[product_id])
+        # Padding keeps quantity 0 on the last real expiry day so it stays sorted
+        days, quantities = zip(*product_lots)
+        lot_day[row, :len(days)] = days
+        lot_day[row, len(days):] = days[-1]
+        lot_quantity[row, :len(quantities)] = quantities
+    return lot_quantity, lot_day
+
+
+def get_waste_projection(db, days=7, simulations=0):
+    """
+    Project units expiring unsold per day over the next `days` days using
+    each product's recent daily sales and FEFO consumption. With `simulations` > 0, demand
+    is also sampled from a Poisson distribution around the forecast and the
+    runs are spread across a process pool to report mean and p90 per day.
+    """
+    today = date.today()
+    lots = _load_lots(db, today, days)
+    dates = [today + timedelta(days=i) for i in range(days)]
+    if not lots:
+        return {
+            "horizon_days": days,
+            "total_expired_units": 0,
+            "daily": [{"date": d, "expired_units": 0} for d in dates],
+            "products": [],
+        }
+
+    product_ids = sorted(lots)
+    forecast = _forecast_matrix(db, product_ids, today, days)
+    lot_quantity, lot_day = _lot_matrices(product_ids, lots)
+
+    expired = project_expired_units(forecast, lot_quantity, lot_day)
+    per_day = expired.sum(axis=0)
+    per_product = expired.sum(axis=1)
+    result = {
+        "horizon_days": days,
+        "total_expired_units": int(round(per_day.sum())),
+        "daily": [
+            {"date": d, "expired_units": int(round(units))}
+            for d, units in zip(dates, per_day)
+        ],
+        "products": [
+            {"product_id": pid, "expired_units": int(round(units))}
+            for pid, units in zip(product_ids, per_product)
+            if units > 0
+        ],
+    }
+
+    if simulations > 0:
+        workers = os.cpu_count() or 1
+        chunks = [len(c) for c in np.array_split(np.arange(simulations), workers) if len(c)]
+        seeds = np.random.SeedSequence().spawn(len(chunks))
+        pool = _get_pool()
+        futures = [
+            pool.submit(_simulate_batch, forecast, lot_quantity, lot_day, n, seed)
+            for n, seed in zip(chunks, seeds)
+        ]
+        totals = np.concatenate([f.result() for f in futures])
+        mean = totals.mean(axis=0)
+        p90 = np.percentile(totals, 90, axis=0)
+        result["simulations"] = simulations
+        for entry, m, p in zip(result["daily"], mean, p90):
+            entry["expired_units_mean"] = round(float(m), 2)
+            entry["expired_units_p90"] = round(float(p), 2)
+
+    return result
@@ -1,3 +1,5 @@
+import calendar
+import re
 from datetime import datetime, date
 
 def parse_date(date_str: str) -> date:
@@ -10,3 +12,174 @@ def parse_date(date_str: str) -> date:
 
 def days_until(target_date: date) -> int:
     return (target_date - date.today()).days
+
+# Longest plausible shelf life per product category, in days. Ambiguous
+# dates are resolved towards one that falls between today and this horizon.
+CATEGORY_SHELF_LIFE_DAYS = {
+    "dairy": 180,
+    "bakery": 30,
+    "meat": 90,
+    "fruit": 60,
+    "fruits": 60,
+    "vegetable": 60,
+    "vegetables": 60,
+    "beverage": 540,
+    "beverages": 540,
+}
+DEFAULT_SHELF_LIFE_DAYS = 730
+
+# Month names and abbreviations, matched on upper-cased text and looked up
+# by their first three letters
+_MONTHS = {month.upper(): index for index, month in enumerate(calendar.month_abbr) if month}
+_MONTH_NAME = (
+    r"(?:JAN(?:UARY)?|FEB(?:RUARY)?|MAR(?:CH)?|APR(?:IL)?|MAY|JUNE?|JULY?|AUG(?:UST)?"
+    r"|SEPT?(?:EMBER)?|OCT(?:OBER)?|NOV(?:EMBER)?|DEC(?:EMBER)?)"
+)
+
+# One alternation, scanned once per string, that yields expiry/made
+# keywords and date tokens in reading order. Every numeric shape shares the
+# leading number so the engine tries each position once: n/b/c with a
+# repeated separator, compact yyyymmdd (n + ymd), or a day before a month
+# name. The last branch is a month name with an optional day before the
+# year. Month names are only bounded by digits/punctuation after them,
+# because OCR often drops the spaces ("EXP12JAN25").
+_DATE_TOKEN = re.compile(
+    rf"""
+    (?<![A-Z])(?P<expiry>EXP(?:IRY|IRES)?|BBE?|BEST\s*BEFORE|USE\s*BY|SELL\s*BY)
+  | (?<![A-Z])(?P<made>MFG|MFD|MFR|PKD|PACKED|PROD(?:UCED)?|MANUFACTURED)
+  | (?<!\d)(?P<n>\d{{1,4}})(?:
+        (?P<sep>[./-])(?P<b>\d{{1,2}})(?P=sep)(?P<c>\d{{2,4}})
+      | (?P<ymd>\d{{4}})
+      | (?:ST|ND|RD|TH)?[\s./-]*(?P<dm_m>{_MONTH_NAME})(?![A-Z])[\s.,/-]*(?P<dm_y>\d{{2,4}})
+    )(?!\d)
+  | (?P<md_m>{_MONTH_NAME})(?![A-Z])[\s.,/-]*
+    (?:(?P<md_d>\d{{1,2}})(?:ST|ND|RD|TH)?(?:[\s.,/-]+|(?=\d{{4}}(?!\d))))?
+    (?P<md_y>\d{{2,4}})(?!\d)
+    """,
+    re.VERBOSE,
+)
+# How far back (characters) a keyword still applies to a date
+_KEYWORD_REACH = 24
+
+# strftime-style names of the numeric readings, per separator and year
+# directive of the last number (%y for 2 digits)
+_NUMERIC_FORMATS = {
+    (sep, year): (f"%Y{sep}%m{sep}%d", f"%d{sep}%m{sep}{year}", f"%m{sep}%d{sep}{year}", f"%y{sep}%m{sep}%d")
+    for sep in "./-"
+    for year in ("%Y", "%y")
+}
+
+def _year(text):
+    year = int(text)
+    return 2000 + year if len(text) == 2 else year
+
+def _year_format(text):
+    return "%y" if len(text) == 2 else "%Y"
+
+def _interpretations(match):
+    """(year, month, day, format, prior) readings of one date-like token."""
+    n, sep, ymd, dm_month = match.group("n", "sep", "ymd", "dm_m")
+    if sep is not None:
+        b, c = match.group("b", "c")
+        ymd_format, dmy_format, mdy_format, short_ymd_format = _NUMERIC_FORMATS[sep, _year_format(c)]
+        if len(n) == 4:
+            return [(int(n), int(b), int(c), ymd_format, 1.0)]
+        if len(n) == 3 or len(c) == 3:
+            return []
+        first, second, year = int(n), int(b), _year(c)
+        # Only offer readings whose month can exist; exceptions from date() are slow
+        readings = []
+        if second <= 12:
+            readings.append((year, second, first, dmy_format, 0.9))
+        if first <= 12 and first != second:
+            readings.append((year, first, second, mdy_format, 0.7))
+        if len(n) == 2 and len(c) == 2 and second <= 12:
+            readings.append((_year(n), second, int(c), short_ymd_format, 0.4))
+        return readings
+    if ymd is not None:
+        if len(n) != 4 or not n.startswith("20"):
+            return []
+        return [(int(n), int(ymd[:2]), int(ymd[2:]), "%Y%m%d", 0.8)]
+    if dm_month is not None:
+        if len(n) > 2:
+            return []
+        dm_year = match.group("dm_y")
+        return [(_year(dm_year), _MONTHS[dm_month[:3]], int(n), f"%d %b {_year_format(dm_year)}", 1.0)]
+    md_month, md_day, md_year = match.group("md_m", "md_d", "md_y")
+    month = _MONTHS[md_month[:3]]
+    year = _year(md_year)
+    if md_day is not None:
+        return [(year, month, int(md_day), f"%b %d {_year_format(md_year)}", 0.95)]
+    # Month and year only: the product is good until the end of that month
+    if year < 1 or year > 9999:
+        return []
+    return [(year, month, calendar.monthrange(year, month)[1], f"%b {_year_format(md_year)}", 0.85)]
+
+def _scored_readings(text, today, category):
+    """
+    (score, date, token, format, span, plausible) for every valid reading of
+    every token; `plausible` is whether the date is within the shelf-life
+    window ahead of today.
+    """
+    if not text:
+        return []
+    readings = []
+    today_ordinal = horizon = None
+    keyword_end, keyword_context = -_KEYWORD_REACH - 1, 0.0
+    for match in _DATE_TOKEN.finditer(text.upper()):
+        kind = match.lastgroup
+        if kind == "expiry" or kind == "made":
+            # The closest keyword before a date decides which date it is
+            keyword_end, keyword_context = match.end(), 0.5 if kind == "expiry" else -0.6
+            continue
+        if today_ordinal is None:
+            today_ordinal = (today or date.today()).toordinal()
+            horizon = CATEGORY_SHELF_LIFE_DAYS.get((category or "").strip().lower(), DEFAULT_SHELF_LIFE_DAYS)
+        context = keyword_context if match.start() - keyword_end <= _KEYWORD_REACH else 0.0
+        token = match.group(0)
+        for year, month, day, fmt, prior in _interpretations(match):
+            try:
+                value = date(year, month, day)
+            except ValueError:
+                continue
+            days_ahead = value.toordinal() - today_ordinal
+            plausible = 0 <= days_ahead <= horizon
+            if plausible:
+                plausibility = 0.5
+            elif days_ahead < 0:
+                # Already expired is possible, long expired is not
+                plausibility = -0.25 if days_ahead >= -horizon else -1.0
+            else:
+                plausibility = -0.5 if days_ahead <= 3 * horizon else -1.0
+            readings.append((prior + context + plausibility, value, token, fmt, match.span(), plausible))
+    return readings
+
+def find_date_candidates(text, today=None, category=None):
+    """
+    Every date that can be read from OCR text, best first, as dicts with
+    `date`, `score`, `text` (the matched characters), `format`, `span`
+    (character offsets in `text`) and `plausible`.
+
+    Each token is scored by how common its format is, by nearby keywords
+    (EXP/BEST BEFORE raise it, MFG/PACKED lower it) and by whether it lands
+    between `today` and the category's shelf-life horizon, which is what
+    decides dd/mm vs mm/dd and 2-digit-year readings.
+    """
+    best = {}
+    for reading in _scored_readings(text, today, category):
+        # The same date read several ways keeps its best reading
+        value = reading[1]
+        if value not in best or reading[0] > best[value][0]:
+            best[value] = reading
+    return [
+        {"date": value, "score": round(score, 3), "text": token, "format": fmt, "span": span, "plausible": plausible}
+        for score, value, token, fmt, span, plausible in sorted(best.values(), key=lambda reading: reading[0], reverse=True)
+    ]
+
+def parse_expiry_date(text, today=None, category=None):
+    """Best expiry date in OCR text, or None if it contains no date."""
+    readings = _scored_readings(text, today, category)
+    if not readings:
+        return None
+    # First of equal scores wins, as in find_date_candidates
+    return max(readings, key=lambda reading: reading[0])[1]
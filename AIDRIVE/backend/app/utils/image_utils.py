@@ -1,8 +1,122 @@
 import cv2
 import numpy as np
 
+def decode_image(data):
+    """Decode encoded image bytes (or any buffer) without touching disk."""
+    buffer = np.frombuffer(memoryview(data), dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
 def preprocess_image(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
     resized = cv2.resize(gray, (400, 100))
     _, thresh = cv2.threshold(resized, 127, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return thresh
+
+# Region detection runs on a copy whose longest side is at most this
+DETECTION_MAX_SIDE = 1000
+# Text line height (px) that crops are rescaled to before OCR
+OCR_LINE_HEIGHTS = (40, 64)
+# Larger line height tried on enhanced crops of small or blurred text
+ENHANCED_LINE_HEIGHT = 96
+
+def find_text_regions(gray, max_regions=8):
+    """
+    Candidate text lines as rotated rectangles ((cx, cy), (w, h), angle) in
+    `gray` coordinates, largest first. A morphological gradient highlights
+    character strokes, and a wide closing merges characters into lines.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECTION_MAX_SIDE / max(height, width))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, strokes = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    lines = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (17, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < 8 or w < 2 * h or h > small.shape[0] * 0.5:
+            continue
+        # Text lines are dense in strokes; large flat blobs are not
+        fill = cv2.countNonZero(strokes[y:y + h, x:x + w]) / float(w * h)
+        if fill < 0.15 or fill > 0.9:
+            continue
+        (cx, cy), (rw, rh), angle = cv2.minAreaRect(contour)
+        regions.append(((cx / scale, cy / scale), (rw / scale, rh / scale), angle))
+    regions.sort(key=lambda r: r[1][0] * r[1][1], reverse=True)
+    return regions[:max_regions]
+
+def crop_region(gray, region, pad=0.25):
+    """Cut a rotated rectangle out of `gray` and rotate it level."""
+    (cx, cy), (w, h), angle = region
+    # minAreaRect reports either orientation; keep the long side horizontal
+    if w < h:
+        w, h = h, w
+        angle += 90
+    # Labels are photographed roughly upright; never turn text upside down
+    angle = (angle + 90) % 180 - 90
+    pad_px = int(h * pad) + 2
+    w, h = int(w) + 2 * pad_px, int(h) + 2 * pad_px
+
+    # Rotate only a neighbourhood of the region, not the whole photo
+    half = int(np.hypot(w, h) / 2) + 1
+    x0, y0 = max(int(cx) - half, 0), max(int(cy) - half, 0)
+    patch = gray[y0:int(cy) + half, x0:int(cx) + half]
+    center = (cx - x0, cy - y0)
+    rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+    level = cv2.warpAffine(patch, rotation, (patch.shape[1], patch.shape[0]), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return cv2.getRectSubPix(level, (w, h), center)
+
+def prepare_crop(crop, line_height):
+    """Scale a text-line crop to `line_height`, binarize dark-on-light and add a margin."""
+    factor = line_height / float(crop.shape[0])
+    interpolation = cv2.INTER_CUBIC if factor > 1 else cv2.INTER_AREA
+    scaled = cv2.resize(crop, None, fx=factor, fy=factor, interpolation=interpolation)
+    _, binary = cv2.threshold(scaled, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) < binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+    return cv2.copyMakeBorder(binary, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+
+def enhance_crop(crop):
+    """Denoise, equalize contrast locally and sharpen a grayscale text-line crop."""
+    denoised = cv2.fastNlMeansDenoising(crop, None, h=10, templateWindowSize=7, searchWindowSize=21)
+    equalized = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(denoised)
+    blurred = cv2.GaussianBlur(equalized, (0, 0), 2)
+    return cv2.addWeighted(equalized, 1.6, blurred, -0.6, 0)
+
+def prepare_sparse(gray):
+    """Whole frame, bounded in size and adaptively thresholded, for sparse-text OCR."""
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECTION_MAX_SIDE / max(height, width))
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+def iter_ocr_candidates(image):
+    """
+    Images to OCR, cheapest and most likely first: each detected text line
+    at each scale, the legacy full-frame preprocessing, then progressively
+    more expensive variants (denoised and sharpened lines, larger lines,
+    sparse-text OCR of the whole frame) for callers that keep going when
+    the cheap reads are not confident. Yields (stage, image, psm).
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    regions = find_text_regions(gray)
+    crops = [crop for crop in (crop_region(gray, region) for region in regions) if crop.size]
+    for line_height in OCR_LINE_HEIGHTS:
+        for crop in crops:
+            # psm 7: treat the crop as a single text line
+            yield f"region@{line_height}", prepare_crop(crop, line_height), 7
+    yield "full_frame", preprocess_image(image), None
+    enhanced = []
+    for crop in crops:
+        enhanced.append(enhance_crop(crop))
+        yield f"enhanced@{OCR_LINE_HEIGHTS[-1]}", prepare_crop(enhanced[-1], OCR_LINE_HEIGHTS[-1]), 7
+    for crop in enhanced:
+        yield f"enhanced@{ENHANCED_LINE_HEIGHT}", prepare_crop(crop, ENHANCED_LINE_HEIGHT), 7
+    # psm 11: sparse text, find as much text as possible in no particular order
+    yield "sparse", prepare_sparse(gray), 11
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync vs async request path under concurrent load
+
+Serves GET /api/v1/products/ twice in one process: the previous sync
+handler (sync Session, run in the threadpool) and the async handler from
+app.api.v1.endpoints.products (AsyncSession on the event loop), both on
+the same database. Each is hit with `--concurrency` clients for
+`--requests` requests in total, optionally alongside slow sync requests
+holding threadpool slots (as OCR uploads do), and the script reports
+requests/sec and p50/p99 latency.
+
+The database is seeded with `--products` rows. SQLite (the default, a temp
+file) shows the threadpool effect; point --database-url at MySQL to
+include network round trips.
+
+Usage:
+    python -m benchmarks.bench_async_db --requests 5000 --concurrency 100
+    python -m benchmarks.bench_async_db --blockers 40
+    python -m benchmarks.bench_async_db --database-url mysql+pymysql://root:pw@localhost/bench
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.v1.endpoints import products
+from app.db.base import Base
+from app.db.database import async_database_url
+from app.db.models.product import Product
+from app.dependencies import get_async_db
+
+
+def build_apps(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    SyncSession = sessionmaker(bind=engine, autoflush=False)
+    AsyncSession = async_sessionmaker(create_async_engine(async_database_url(database_url)), expire_on_commit=False)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_bench_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    def blocker():
+        # A slow sync request that holds a threadpool slot, like an upload
+        time.sleep(0.5)
+        return {}
+
+    sync_app = FastAPI()
+
+    @sync_app.get("/api/v1/products/")
+    def list_products_sync(db: Session = Depends(get_sync_db)):
+        return [
+            {"id": p.id, "name": p.name, "barcode": p.barcode, "category": p.category,
+             "min_stock": p.min_stock, "max_stock": p.max_stock}
+            for p in db.query(Product).all()
+        ]
+
+    async_app = FastAPI()
+    async_app.include_router(products.router, prefix="/api/v1/products")
+    async_app.dependency_overrides[get_async_db] = get_bench_async_db
+    for app in (sync_app, async_app):
+        app.get("/blocker")(blocker)
+    return engine, sync_app, async_app
+
+
+def seed(engine, count):
+    with engine.begin() as conn:
+        conn.execute(Product.__table__.delete())
+        conn.execute(insert(Product), [
+            {"name": f"Product {i}", "barcode": f"{i:013d}", "category": "dairy", "min_stock": 5, "max_stock": 50}
+            for i in range(count)
+        ])
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def load(app, requests, concurrency, blockers):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    remaining = requests
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.get("/api/v1/products/")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        stop = asyncio.Event()
+
+        async def block():
+            while not stop.is_set():
+                await client.get("/blocker")
+
+        blocking = [asyncio.create_task(block()) for _ in range(blockers)]
+        await asyncio.sleep(0.05 if blockers else 0)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*blocking)
+    latencies.sort()
+    return wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL (default: a temporary SQLite file)")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--blockers", type=int, default=0, help="concurrent slow sync requests holding threadpool slots")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine, sync_app, async_app = build_apps(database_url)
+    seed(engine, args.products)
+
+    print(f"{args.requests} requests, {args.concurrency} clients, {args.blockers} blockers, {args.products} products")
+    for name, app in (("sync", sync_app), ("async", async_app)):
+        asyncio.run(load(app, min(200, args.requests), min(10, args.concurrency), 0))  # warm up
+        wall, latencies = asyncio.run(load(app, args.requests, args.concurrency, args.blockers))
+        print(
+            f"{name:<6} {args.requests / wall:8.0f} req/s   "
+            f"p50 {statistics.median(latencies):7.1f} ms   p99 {percentile(latencies, 0.99):7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
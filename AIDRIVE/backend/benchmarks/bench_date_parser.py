@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR date parsing
+
+Parses a corpus of OCR-like strings (numeric dates with / - . separators,
+2-digit years, month names, compact yyyymmdd, keywords and lines with no
+date at all) with the original approach (regex search + parse_date trying
+three strptime formats) and with parse_expiry_date(), and reports
+strings/sec and how many strings each could read, over the whole corpus
+and over the numeric strings both can read.
+
+Usage:
+    python -m benchmarks.bench_date_parser --strings 1000000 [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.date_utils import parse_date, parse_expiry_date
+
+FORMATS = [
+    "EXP %d/%m/%Y",
+    "%Y-%m-%d",
+    "BEST BEFORE %Y.%m.%d",
+    "USE BY %d-%m-%y",
+    "EXP %d %b %y",
+    "BB %b %d %Y",
+    "BEST BEFORE END %b %Y",
+    "MFG %d/%m/%Y",
+    "%Y%m%d",
+    "NET WT 500G L2345 18:20",
+    "",
+]
+
+def make_corpus(count, seed=0):
+    rng = random.Random(seed)
+    today = date.today()
+    days = [today + timedelta(days=i) for i in range(-30, 400)]
+    # Build a pool of distinct strings and sample from it, like repeated scans
+    pool = [rng.choice(days).strftime(rng.choice(FORMATS)).upper() for _ in range(20000)]
+    return [rng.choice(pool) for _ in range(count)]
+
+_ORIGINAL_PATTERN = re.compile(r"(\d{2,4}[/-]\d{1,2}[/-]\d{1,4})")
+
+def original(text):
+    match = _ORIGINAL_PATTERN.search(text)
+    if match:
+        try:
+            return parse_date(match.group(1))
+        except Exception:
+            return None
+    return None
+
+def run(name, func, corpus, repeat):
+    # Best of `repeat` passes, like timeit, to keep scheduler noise out
+    elapsed = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parsed = sum(func(text) is not None for text in corpus)
+        elapsed = min(elapsed, time.perf_counter() - started)
+    print(f"{name:<18} {len(corpus) / elapsed:12,.0f} strings/s   {elapsed:6.2f} s   parsed {parsed / len(corpus):6.1%}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strings", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.strings)
+    today = date.today()
+    tokenizer = lambda text: parse_expiry_date(text, today=today)
+    print(f"all {len(corpus):,} strings")
+    baseline = run("regex + strptime", original, corpus, args.repeat)
+    elapsed = run("parse_expiry_date", tokenizer, corpus, args.repeat)
+    print(f"speedup: {baseline / elapsed:.2f}x")
+
+    # Like for like: only the numeric dates the original loop can read
+    readable = [text for text in corpus if original(text) is not None]
+    print(f"\n{len(readable):,} strings the original loop reads")
+    baseline = run("regex + strptime", original, readable, args.repeat)
+    elapsed = run("parse_expiry_date", tokenizer, readable, args.repeat)
+    print(f"speedup: {baseline / elapsed:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR accuracy and throughput on the synthetic label corpus
+
+Pushes every label through read_expiry (what extract_expiry_from_image
+returns the date of) in a process pool and reports images/sec, p50/p99
+per-image latency (measured inside the worker) and exact-date accuracy,
+overall and broken down by font, date format, keyword, degradation level
+and OCR confidence, plus the mean time spent per OCR stage. Labels come
+from a corpus written by benchmarks.label_corpus, or are generated in
+memory with --count.
+
+Usage:
+    python -m benchmarks.bench_ocr_accuracy --count 500 --workers 4
+    python -m benchmarks.bench_ocr_accuracy --corpus corpus/labels --failures 20
+    python -m benchmarks.bench_ocr_accuracy --threshold 1.01 --min-confidence 0   # no early exit
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.ocr_engine import read_expiry
+from benchmarks.label_corpus import DIFFICULTY, iter_corpus, read_manifest
+
+# Bin edges for the degradation parameters: thirds of the "hard" ranges
+BINS = {
+    "rotation": (4.0, 8.0),
+    "blur": (0.7, 1.4),
+    "noise": (6.0, 12.0),
+    "lighting": (0.2, 0.4),
+}
+
+# Upper edges of the reported confidence buckets
+CONFIDENCE_BUCKETS = (0.3, 0.6, 0.85, 1.01)
+
+def _init_worker(threshold, min_confidence):
+    if threshold is not None:
+        settings.OCR_CONFIDENCE_THRESHOLD = threshold
+    if min_confidence is not None:
+        settings.OCR_MIN_CONFIDENCE = min_confidence
+
+def timed_extract(source):
+    started = time.perf_counter()
+    result = read_expiry(source)
+    return result["expiry_date"], (time.perf_counter() - started) * 1000, result["confidence"], result["timings"]
+
+def _bin(name, value):
+    low, high = BINS[name]
+    value = abs(float(value))
+    return "low" if value < low else "mid" if value < high else "high"
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+def report(samples, results, wall, failures):
+    latencies = sorted(ms for _, ms, _, _ in results)
+    hits = [expiry == meta["expiry_date"] for (_, meta), (expiry, _, _, _) in zip(samples, results)]
+    print(
+        f"{len(samples)} images in {wall:.1f} s: {len(samples) / wall:.1f} images/sec   "
+        f"p50 {statistics.median(latencies):.1f} ms   p99 {percentile(latencies, 0.99):.1f} ms   "
+        f"accuracy {sum(hits) / len(hits):.1%}   no date {sum(e is None for e, _, _, _ in results)}"
+    )
+    stage_ms = defaultdict(float)
+    for _, _, _, timings in results:
+        for stage, ms in timings.items():
+            stage_ms[stage] += ms
+    print("mean ms per image by stage: " + ", ".join(
+        f"{stage} {ms / len(results):.1f}" for stage, ms in sorted(stage_ms.items(), key=lambda item: -item[1])
+    ))
+    groups = defaultdict(lambda: [0, 0])
+    for (_, meta), hit, (_, _, confidence, _) in zip(samples, hits, results):
+        keys = [("font", meta["font"]), ("date_format", meta["date_format"]), ("keyword", meta["keyword"] or "(none)"),
+                ("distractors", str(meta["distractors"]))]
+        keys += [(name, _bin(name, meta[name])) for name in BINS]
+        if confidence is not None:
+            upper = next(edge for edge in CONFIDENCE_BUCKETS if confidence < edge)
+            keys.append(("confidence", f"< {min(upper, 1.0):.2f}"))
+        for key in keys:
+            groups[key][0] += hit
+            groups[key][1] += 1
+    current = None
+    for (name, value), (correct, total) in sorted(groups.items()):
+        if name != current:
+            print(f"\n{name}")
+            current = name
+        print(f"  {value:<16} {correct / total:6.1%}  ({total})")
+    if failures:
+        print("\nfailures (expected / read / confidence / printed text)")
+        misses = [
+            (index, meta, expiry, confidence)
+            for index, ((_, meta), (expiry, _, confidence, _), hit) in enumerate(zip(samples, results, hits)) if not hit
+        ]
+        for index, meta, expiry, confidence in misses[:failures]:
+            print(f"  #{index:<6} {meta['expiry_date']}  {str(expiry):<10}  {confidence}  {meta['text']!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory written by benchmarks.label_corpus")
+    parser.add_argument("--count", type=int, default=200, help="labels to generate when --corpus is not given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", choices=sorted(DIFFICULTY), default="medium")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--failures", type=int, default=0, help="print this many misread labels")
+    parser.add_argument("--threshold", type=float, help="override OCR_CONFIDENCE_THRESHOLD")
+    parser.add_argument("--min-confidence", type=float, help="override OCR_MIN_CONFIDENCE")
+    args = parser.parse_args()
+
+    if args.corpus:
+        samples = [(row["path"], row) for row in read_manifest(args.corpus)]
+    else:
+        samples = list(iter_corpus(args.count, args.seed, args.difficulty))
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=(args.threshold, args.min_confidence)
+    ) as pool:
+        # Warm up every worker so the Tesseract load is not timed
+        list(pool.map(timed_extract, [samples[0][0]] * args.workers))
+        started = time.perf_counter()
+        chunksize = max(1, len(samples) // (args.workers * 8))
+        results = list(pool.map(timed_extract, [source for source, _ in samples], chunksize=chunksize))
+        wall = time.perf_counter() - started
+
+    print(f"workers {args.workers}")
+    report(samples, results, wall, args.failures)
+
+if __name__ == "__main__":
+    main()
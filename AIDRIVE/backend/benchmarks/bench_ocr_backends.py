@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pytesseract (subprocess per image) vs tesserocr (persistent engine)
+
+Runs the preprocessed labels through image_to_text() with each available
+backend and reports the first call (engine start-up) separately from the
+steady-state per-image latency.
+
+Usage:
+    python -m benchmarks.bench_ocr_backends --images 100
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract
+from app.services.ocr_engine import TESSEROCR_AVAILABLE, image_to_text, load_image
+from app.utils.image_utils import preprocess_image
+from benchmarks.labels import make_label_batch
+
+def available_backends():
+    backends = []
+    if shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        backends.append("pytesseract")
+    else:
+        print("pytesseract: tesseract binary not found, skipping")
+    if TESSEROCR_AVAILABLE:
+        backends.append("tesserocr")
+    else:
+        print("tesserocr: not installed, skipping")
+    return backends
+
+def run(backend, images):
+    started = time.perf_counter()
+    image_to_text(images[0], backend=backend)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for image in images[1:]:
+        started = time.perf_counter()
+        image_to_text(image, backend=backend)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{backend:<12} first {first_ms:8.1f} ms   p50 {statistics.median(latencies):7.1f} ms   "
+        f"p99 {p99:7.1f} ms   {1000 / statistics.mean(latencies):6.1f} images/s"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100)
+    args = parser.parse_args()
+
+    images = [preprocess_image(load_image(content)) for content, _ in make_label_batch(max(args.images, 2))]
+    for backend in available_backends():
+        run(backend, images)
+
+if __name__ == "__main__":
+    main()
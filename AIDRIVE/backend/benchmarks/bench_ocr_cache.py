@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR result cache
+
+Times a cold OCR read against memory-tier and disk-tier cache hits for the
+same uploads, then checks how perceptual (dHash) matching behaves: how far
+re-encoded copies of a label drift, and how often a label with a different
+date would be matched at each distance threshold.
+
+Usage:
+    python -m benchmarks.bench_ocr_cache --images 100
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from app.services.ocr_cache import OCRResultCache, dhash
+from app.services.ocr_engine import config_version, read_expiry
+from benchmarks.labels import make_label_batch, render_label
+
+def timed(func, items):
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        func(item)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+def tiers(contents, path):
+    cache = OCRResultCache(len(contents), path, len(contents), dhash_distance=-1, config=config_version())
+
+    def cold(content):
+        fingerprint = cache.fingerprint(content)
+        if cache.get(fingerprint) is None:
+            result = read_expiry(content)
+            cache.put(fingerprint, result["expiry_date"], result["detected_text"], result["confidence"])
+
+    print(f"cold OCR + store   p50 {timed(cold, contents):8.3f} ms")
+    print(f"memory hit         p50 {timed(lambda c: cache.get(cache.fingerprint(c)), contents):8.3f} ms")
+    # A fresh instance has an empty memory tier but the same SQLite file
+    reopened = OCRResultCache(len(contents), path, len(contents), dhash_distance=-1, config=config_version())
+    print(f"disk hit           p50 {timed(lambda c: reopened.get(reopened.fingerprint(c)), contents):8.3f} ms")
+    print(f"stats: {reopened.stats()}")
+
+def perceptual(samples):
+    drift, collisions = [], []
+    for i in range(samples):
+        label = render_label("EXP 05/05/2027", seed=i)
+        _, encoded = cv2.imencode(".jpg", label, [cv2.IMWRITE_JPEG_QUALITY, 60])
+        copy = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        other = render_label("EXP 06/05/2027", seed=i)
+        drift.append((dhash(label) ^ dhash(copy)).bit_count())
+        collisions.append((dhash(label) ^ dhash(other)).bit_count())
+    for distance in (0, 2, 4, 8):
+        same = sum(d <= distance for d in drift) / samples
+        wrong = sum(d <= distance for d in collisions) / samples
+        print(f"dhash distance {distance}: re-encoded copy matched {same:6.1%}   different date matched {wrong:6.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100)
+    args = parser.parse_args()
+
+    contents = [content for content, _ in make_label_batch(args.images)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tiers(contents, os.path.join(tmp, "ocr_results.sqlite3"))
+    perceptual(args.images)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: write-then-imread vs in-memory decode of uploaded labels
+
+Compares the old scan path (copy the upload to disk, then cv2.imread it)
+with decoding the upload bytes directly (cv2.imdecode on a memoryview).
+Pass --ocr to include the Tesseract call in both paths.
+
+Usage:
+    python -m benchmarks.bench_ocr_decode --images 200 [--ocr]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import cv2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.image_utils import decode_image, preprocess_image
+from benchmarks.labels import make_label_batch
+
+def disk_path(content, directory, index):
+    path = os.path.join(directory, f"label_{index}.jpg")
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+    return cv2.imread(path)
+
+def memory_path(content, directory, index):
+    return decode_image(content)
+
+def run(name, loader, batch, directory, ocr):
+    if ocr:
+        import pytesseract
+    started = time.perf_counter()
+    for index, (content, _) in enumerate(batch):
+        image = loader(content, directory, index)
+        processed = preprocess_image(image)
+        if ocr:
+            pytesseract.image_to_string(processed)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<16} {len(batch) / elapsed:10.1f} images/s   {elapsed / len(batch) * 1000:8.3f} ms/image")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--ocr", action="store_true", help="include pytesseract.image_to_string")
+    args = parser.parse_args()
+
+    batch = make_label_batch(args.images)
+    print(f"{len(batch)} labels, avg {sum(len(c) for c, _ in batch) / len(batch) / 1024:.1f} KiB each")
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm-up so neither path pays for first-call initialisation
+        run("warm-up", memory_path, batch[:10], directory, args.ocr)
+        disk = run("write + imread", disk_path, batch, directory, args.ocr)
+        memory = run("imdecode", memory_path, batch, directory, args.ocr)
+    print(f"speedup: {disk / memory:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: matching OCR label text to products
+
+Builds a synthetic catalogue (brand + variety + item + pack size, EAN-13
+barcodes) and OCR-like label text for random products: the name with
+character confusions (O/0, I/1, S/5, B/8) and dropped characters, plus an
+expiry line, a lot code and a net weight. Each label is matched with the
+trigram ProductIndex and with a linear scan scoring every product the
+same way, and the script reports p50/p99 latency per label, top-1
+accuracy and how many labels reach PRODUCT_MATCH_MIN_SCORE.
+
+Usage:
+    python -m benchmarks.bench_product_match --products 10000 --labels 2000
+    python -m benchmarks.bench_product_match --noise 0.1 --barcode-share 0.3
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.product_index import ProductIndex, trigrams
+
+BRANDS = ("Amul", "Nestle", "Britannia", "Mother Dairy", "Heritage", "Nandini", "Epigamia", "Danone",
+          "Tropicana", "Real", "Haldiram", "Parle", "Kissan", "Fresho", "Organic Tattva", "Akshayakalpa")
+VARIETIES = ("Fresh", "Toned", "Low Fat", "Full Cream", "Greek", "Mango", "Strawberry", "Plain", "Salted",
+             "Masala", "Whole Wheat", "Multigrain", "Chocolate", "Vanilla", "Organic", "Lite", "Classic")
+ITEMS = ("Milk", "Curd", "Yogurt", "Paneer", "Butter", "Cheese Slices", "Bread", "Buns", "Juice",
+         "Lassi", "Buttermilk", "Cream", "Ghee", "Tofu", "Eggs", "Spinach", "Tomatoes", "Cake")
+SIZES = ("200G", "250G", "400G", "500G", "1KG", "200ML", "500ML", "1L", "6 PCS", "12 PCS")
+
+# Common OCR confusions on printed labels
+CONFUSIONS = {"O": "0", "0": "O", "I": "1", "1": "I", "S": "5", "5": "S", "B": "8", "8": "B", "G": "6"}
+
+
+def _ean13(rng):
+    digits = [rng.randrange(10) for _ in range(12)]
+    check = (10 - sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return "".join(map(str, digits)) + str(check)
+
+
+def make_catalogue(count, seed=0):
+    rng = random.Random(seed)
+    names, products = set(), []
+    while len(products) < count:
+        name = f"{rng.choice(BRANDS)} {rng.choice(VARIETIES)} {rng.choice(ITEMS)} {rng.choice(SIZES)}"
+        if name in names:
+            # The combinations run out before large catalogues; add a line number
+            name = f"{name} {len(products)}"
+        names.add(name)
+        products.append((len(products) + 1, name, _ean13(rng)))
+    return products
+
+
+def _garble(text, rng, noise):
+    out = []
+    for char in text.upper():
+        roll = rng.random()
+        if roll < noise / 2 and char in CONFUSIONS:
+            out.append(CONFUSIONS[char])
+        elif roll < noise * 0.6:
+            continue
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def make_labels(products, count, noise, barcode_share, seed=0):
+    """(product_id, OCR-like label text) pairs."""
+    rng = random.Random(seed + 1)
+    labels = []
+    for _ in range(count):
+        product_id, name, barcode = rng.choice(products)
+        expiry = date.today() + timedelta(days=rng.randint(1, 365))
+        lines = [
+            _garble(barcode if rng.random() < barcode_share else name, rng, noise),
+            f"EXP {expiry:%d/%m/%Y}",
+            f"LOT {rng.randint(1000, 99999)}",
+            f"NET WT {rng.choice(SIZES)}",
+        ]
+        rng.shuffle(lines)
+        labels.append((product_id, " ".join(lines)))
+    return labels
+
+
+def linear_scan(products, text):
+    """Best product by scoring every one: the share of its name or barcode trigrams in `text`."""
+    query = trigrams(text)
+    best, best_score = None, 0.0
+    for product_id, name_grams, barcode_grams in products:
+        score = max(len(query & name_grams) / len(name_grams), len(query & barcode_grams) / len(barcode_grams))
+        if score > best_score:
+            best, best_score = product_id, score
+    return best, best_score
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run(name, match, labels):
+    latencies, correct, confident = [], 0, 0
+    for product_id, text in labels:
+        started = time.perf_counter()
+        best, score = match(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+        correct += best == product_id
+        confident += score >= settings.PRODUCT_MATCH_MIN_SCORE
+    latencies.sort()
+    print(
+        f"{name:<12} p50 {statistics.median(latencies):8.3f} ms   p99 {percentile(latencies, 0.99):8.3f} ms   "
+        f"top-1 {correct / len(labels):6.1%}   >= min score {confident / len(labels):6.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--labels", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.05, help="per-character OCR error rate")
+    parser.add_argument("--barcode-share", type=float, default=0.2, help="share of labels showing the barcode, not the name")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    products = make_catalogue(args.products, args.seed)
+    labels = make_labels(products, args.labels, args.noise, args.barcode_share, args.seed)
+
+    index = ProductIndex(max_age_seconds=float("inf"))
+    started = time.perf_counter()
+    index.load(products)
+    print(f"{args.products} products indexed in {(time.perf_counter() - started) * 1000:.0f} ms: {index.stats()}")
+
+    def indexed(text):
+        matches = index.match(None, text, limit=1)
+        return (matches[0]["product_id"], matches[0]["score"]) if matches else (None, 0.0)
+
+    scanned = [(product_id, trigrams(name), trigrams(barcode)) for product_id, name, barcode in products]
+    run("index", indexed, labels)
+    run("linear scan", lambda text: linear_scan(scanned, text), labels[:max(1, len(labels) // 10)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk sales ingestion throughput
+
+Streams `--rows` sales line items to POST /api/v1/sales/bulk in-process
+(httpx ASGI transport, 64 KiB body pieces) as NDJSON and as CSV, once per
+chunk size in `--chunk-sizes`, and reports rows/sec for each. For
+reference it also times storing the same rows one at a time, an ORM add
+and commit per row as the sample data scripts do, on `--baseline-rows`
+of them.
+
+The database is seeded with `--products` products. SQLite (the default, a
+temp file) runs anywhere; point --database-url at MySQL for realistic
+commit costs.
+
+Usage:
+    python -m benchmarks.bench_sales_bulk --rows 200000
+    python -m benchmarks.bench_sales_bulk --chunk-sizes 500,5000,20000 --idempotency-key
+    python -m benchmarks.bench_sales_bulk --database-url mysql+pymysql://root:pw@localhost/bench
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints import sales
+from app.core.config import settings
+from app.db.base import Base
+from app.db.database import async_database_url
+from app.db.models.product import Product
+from app.db.models.sales import Sales
+from app.db.models.sales_daily import SalesDaily
+from app.dependencies import get_async_db
+
+PIECE_BYTES = 64 * 1024
+
+
+def build_app(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    AsyncSession = async_sessionmaker(create_async_engine(async_database_url(database_url)), expire_on_commit=False)
+
+    async def get_bench_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(sales.router, prefix="/api/v1/sales")
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+    return engine, app
+
+
+def seed(engine, count):
+    with engine.begin() as conn:
+        conn.execute(SalesDaily.__table__.delete())
+        conn.execute(Sales.__table__.delete())
+        conn.execute(Product.__table__.delete())
+        conn.execute(insert(Product), [
+            {"id": i + 1, "name": f"Product {i}", "barcode": f"{i:013d}", "category": "dairy", "min_stock": 5, "max_stock": 50}
+            for i in range(count)
+        ])
+
+
+def make_rows(count, products, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 1)
+    product_ids = rng.integers(1, products + 1, count).tolist()
+    quantities = (1 + rng.poisson(0.4, count)).tolist()
+    offsets = np.sort(rng.integers(0, 30 * 86400, count)).tolist()
+    timestamps = [(start + timedelta(seconds=offset)).isoformat() for offset in offsets]
+    return list(zip(product_ids, quantities, timestamps))
+
+
+def ndjson_body(rows):
+    return "".join(
+        json.dumps({"product_id": p, "quantity_sold": q, "timestamp": t}) + "\n" for p, q, t in rows
+    ).encode()
+
+
+def csv_body(rows):
+    return ("product_id,quantity_sold,timestamp\n" + "".join(f"{p},{q},{t}\n" for p, q, t in rows)).encode()
+
+
+async def post(app, body, content_type, key=None):
+    async def pieces():
+        for offset in range(0, len(body), PIECE_BYTES):
+            yield body[offset:offset + PIECE_BYTES]
+
+    headers = {"Content-Type": content_type}
+    if key:
+        headers["Idempotency-Key"] = key
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        response = await client.post("/api/v1/sales/bulk", content=pieces(), headers=headers)
+        wall = time.perf_counter() - started
+    response.raise_for_status()
+    return wall, response.json()
+
+
+def row_at_a_time(engine, rows):
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    started = time.perf_counter()
+    try:
+        for product_id, quantity, timestamp in rows:
+            db.add(Sales(product_id=product_id, quantity_sold=quantity, timestamp=datetime.fromisoformat(timestamp)))
+            db.commit()
+    finally:
+        db.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL (default: a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--chunk-sizes", default="1000,5000,20000")
+    parser.add_argument("--idempotency-key", action="store_true", help="send an Idempotency-Key (one marker row per chunk)")
+    parser.add_argument("--baseline-rows", type=int, default=2000, help="rows stored one at a time for reference (0 to skip)")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine, app = build_app(database_url)
+    seed(engine, args.products)
+    rows = make_rows(args.rows, args.products)
+    bodies = {"ndjson": (ndjson_body(rows), "application/x-ndjson"), "csv": (csv_body(rows), "text/csv")}
+
+    print(f"{args.rows} rows, {args.products} products")
+    run = 0
+    for chunk_size in (int(size) for size in args.chunk_sizes.split(",")):
+        settings.SALES_BULK_CHUNK_ROWS = chunk_size
+        for name, (body, content_type) in bodies.items():
+            run += 1
+            key = f"bench-{run}" if args.idempotency_key else None
+            wall, result = asyncio.run(post(app, body, content_type, key))
+            assert result["inserted"] == args.rows, result
+            print(
+                f"{name:<6} chunk {chunk_size:>6}   {args.rows / wall:9,.0f} rows/s   "
+                f"{len(body) / wall / 1e6:6.1f} MB/s   {wall:6.2f} s"
+            )
+    if args.baseline_rows:
+        wall = row_at_a_time(engine, rows[:args.baseline_rows])
+        print(f"row-at-a-time ORM add + commit   {args.baseline_rows / wall:9,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Synthetic expiry-label corpus with ground truth
+
+Renders labels with varied Hershey fonts (cv2.putText), date formats and
+keywords, optional distractor lines (lot codes, a MFG date), then applies
+rotation, blur, sensor noise, uneven lighting and JPEG compression. Each
+image is written to the output directory and listed in manifest.csv with
+its expiry date and every rendering parameter, so accuracy can be broken
+down by condition.
+
+Dates are drawn 1-365 days after the day the corpus is generated; evaluate
+within a few months so they still fall in the parser's plausibility window.
+
+Usage:
+    python -m benchmarks.label_corpus --count 5000 --out corpus/labels
+    python -m benchmarks.label_corpus --count 500 --difficulty hard --seed 7
+"""
+
+import argparse
+import calendar
+import csv
+import os
+import random
+import sys
+from datetime import date, timedelta
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FONTS = {
+    "simplex": cv2.FONT_HERSHEY_SIMPLEX,
+    "plain": cv2.FONT_HERSHEY_PLAIN,
+    "duplex": cv2.FONT_HERSHEY_DUPLEX,
+    "complex": cv2.FONT_HERSHEY_COMPLEX,
+    "triplex": cv2.FONT_HERSHEY_TRIPLEX,
+    "complex_small": cv2.FONT_HERSHEY_COMPLEX_SMALL,
+    "simplex_italic": cv2.FONT_HERSHEY_SIMPLEX | cv2.FONT_ITALIC,
+}
+
+# strftime patterns printed on labels; "%b %Y" labels expire at month end
+# and "%m/%d/%Y" is only used when the day cannot be read as a month
+DATE_FORMATS = (
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%Y-%m-%d", "%Y.%m.%d",
+    "%Y%m%d", "%d %b %Y", "%d%b%y", "%b %d %Y", "%b %Y", "%m/%d/%Y",
+)
+KEYWORDS = ("EXP", "EXP:", "EXPIRY", "BEST BEFORE", "BB", "USE BY", "")
+
+# (max rotation degrees, max blur sigma, max noise sigma, max lighting falloff, min JPEG quality)
+DIFFICULTY = {
+    "easy": (2.0, 0.6, 4.0, 0.10, 85),
+    "medium": (6.0, 1.2, 10.0, 0.35, 60),
+    "hard": (12.0, 2.0, 18.0, 0.60, 35),
+}
+
+MANIFEST_FIELDS = (
+    "filename", "expiry_date", "text", "font", "date_format", "keyword", "distractors",
+    "rotation", "blur", "noise", "lighting", "jpeg_quality",
+)
+
+
+def _format_date(value, fmt):
+    return value.strftime(fmt).upper()
+
+
+def _draw_date(rng):
+    """A ground-truth expiry date and the format it is printed in."""
+    fmt = rng.choice(DATE_FORMATS)
+    value = date.today() + timedelta(days=rng.randint(1, 365))
+    if fmt == "%b %Y":
+        value = value.replace(day=calendar.monthrange(value.year, value.month)[1])
+    elif fmt == "%m/%d/%Y" and value.day <= 12:
+        value = value.replace(day=rng.randint(13, 28))
+    return value, fmt
+
+
+def _fit_text(canvas, text, font, y, color, thickness):
+    """putText scaled so `text` spans most of the canvas width."""
+    width = canvas.shape[1]
+    (text_w, _), _ = cv2.getTextSize(text, font, 1.0, thickness)
+    scale = min(2.0, 0.85 * width / max(text_w, 1))
+    cv2.putText(canvas, text, (int(width * 0.05), y), font, scale, color, thickness, cv2.LINE_AA)
+
+
+def _degrade(image, rng, rotation, blur, noise, lighting):
+    height, width = image.shape[:2]
+    if rotation:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), rotation, 1.0)
+        image = cv2.warpAffine(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+    if blur > 0.05:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    if lighting > 0:
+        # Linear falloff from a random edge, like a shelf light to one side
+        direction = rng.uniform(0, 2 * np.pi)
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+        ramp = np.cos(direction) * xs / width + np.sin(direction) * ys / height
+        ramp = (ramp - ramp.min()) / max(float(ramp.max() - ramp.min()), 1e-6)
+        image = image.astype(np.float32) * (1.0 - lighting * ramp)[..., None]
+    if noise > 0:
+        image = image.astype(np.float32) + np.random.default_rng(rng.randrange(2 ** 32)).normal(0, noise, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def generate_label(rng, difficulty="medium", size=(640, 200)):
+    """
+    One synthetic label: (BGR image, JPEG quality, metadata dict). `rng` is
+    a random.Random; the same seed always yields the same label.
+    """
+    max_rotation, max_blur, max_noise, max_lighting, min_quality = DIFFICULTY[difficulty]
+    expiry, fmt = _draw_date(rng)
+    keyword = rng.choice(KEYWORDS)
+    font_name = rng.choice(list(FONTS))
+    text = f"{keyword} {_format_date(expiry, fmt)}".strip()
+
+    width, height = size
+    distractors = rng.random() < 0.4
+    if distractors:
+        height = int(height * 1.6)
+    paper = rng.randint(215, 250)
+    ink = rng.randint(0, 60)
+    image = np.full((height, width, 3), paper, dtype=np.uint8)
+    thickness = rng.choice((1, 2, 2, 3))
+    if distractors:
+        made = expiry - timedelta(days=rng.randint(30, 400))
+        _fit_text(image, f"LOT {rng.randint(1000, 99999)}  MFG {_format_date(made, '%d/%m/%Y')}",
+                  FONTS["plain"], int(height * 0.25), (ink + 60,) * 3, 1)
+        _fit_text(image, text, FONTS[font_name], int(height * 0.65), (ink,) * 3, thickness)
+    else:
+        _fit_text(image, text, FONTS[font_name], height // 2 + 15, (ink,) * 3, thickness)
+
+    rotation = round(rng.uniform(-max_rotation, max_rotation), 2)
+    blur = round(rng.uniform(0, max_blur), 2)
+    noise = round(rng.uniform(0, max_noise), 2)
+    lighting = round(rng.uniform(0, max_lighting), 2)
+    quality = rng.randint(min_quality, 95)
+    image = _degrade(image, rng, rotation, blur, noise, lighting)
+    return image, quality, {
+        "expiry_date": expiry.isoformat(),
+        "text": text,
+        "font": font_name,
+        "date_format": fmt,
+        "keyword": keyword,
+        "distractors": int(distractors),
+        "rotation": rotation,
+        "blur": blur,
+        "noise": noise,
+        "lighting": lighting,
+        "jpeg_quality": quality,
+    }
+
+
+def iter_corpus(count, seed=0, difficulty="medium"):
+    """Yield (JPEG bytes, metadata) for `count` labels."""
+    for i in range(count):
+        image, quality, meta = generate_label(random.Random(seed * 1_000_003 + i), difficulty)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise RuntimeError("Could not encode label image")
+        yield encoded.tobytes(), meta
+
+
+def write_corpus(out_dir, count, seed=0, difficulty="medium"):
+    """Write images and manifest.csv to `out_dir`; returns the manifest path."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = os.path.join(out_dir, "manifest.csv")
+    with open(manifest, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        for i, (content, meta) in enumerate(iter_corpus(count, seed, difficulty)):
+            filename = f"{i:06d}.jpg"
+            with open(os.path.join(out_dir, filename), "wb") as image_file:
+                image_file.write(content)
+            writer.writerow({"filename": filename, **meta})
+    return manifest
+
+
+def read_manifest(corpus_dir):
+    """Manifest rows of a corpus written by write_corpus, with absolute image paths."""
+    with open(os.path.join(corpus_dir, "manifest.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["path"] = os.path.join(corpus_dir, row["filename"])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--out", default="corpus/labels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--difficulty", choices=sorted(DIFFICULTY), default="medium")
+    args = parser.parse_args()
+
+    manifest = write_corpus(args.out, args.count, args.seed, args.difficulty)
+    print(f"wrote {args.count} labels ({args.difficulty}) and {manifest}")
+
+
+if __name__ == "__main__":
+    main()
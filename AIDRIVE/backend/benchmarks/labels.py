@@ -0,0 +1,67 @@
+"""
+Synthetic expiry labels shared by the benchmark scripts.
+"""
+
+import random
+from datetime import date, timedelta
+import cv2
+import numpy as np
+
+def render_label(text, width=640, height=200, seed=None):
+    """Render `text` in black on a light, slightly noisy background (BGR)."""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 235, dtype=np.uint8)
+    image = cv2.add(image, rng.integers(0, 20, image.shape, dtype=np.uint8))
+    cv2.putText(image, text, (20, height // 2 + 15), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 3, cv2.LINE_AA)
+    return image
+
+def make_label_batch(count, seed=0, encoding=".jpg"):
+    """Encoded label images and the expiry dates printed on them."""
+    rng = random.Random(seed)
+    batch = []
+    for i in range(count):
+        expiry = date.today() + timedelta(days=rng.randint(1, 365))
+        image = render_label(f"EXP {expiry.strftime('%d/%m/%Y')}", seed=seed + i)
+        ok, encoded = cv2.imencode(encoding, image)
+        if not ok:
+            raise RuntimeError("Could not encode label image")
+        batch.append((encoded.tobytes(), expiry))
+    return batch
+
+def render_photo(text, seed=None, size=(1280, 960)):
+    """
+    A phone-photo-like frame: the date line printed small at a random spot,
+    slightly rotated, next to distractor text, on a textured background.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    image = np.full((height, width, 3), 200, dtype=np.uint8)
+    image = cv2.GaussianBlur(cv2.add(image, rng.integers(0, 40, image.shape, dtype=np.uint8)), (5, 5), 0)
+
+    label_w, label_h = 520, 170
+    label = np.full((label_h, label_w, 3), 245, dtype=np.uint8)
+    cv2.putText(label, "NET WT 500g", (18, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (60, 60, 60), 2, cv2.LINE_AA)
+    cv2.putText(label, text, (18, 115), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (15, 15, 15), 2, cv2.LINE_AA)
+    cv2.putText(label, "L2345 18:20", (18, 155), cv2.FONT_HERSHEY_PLAIN, 1.2, (80, 80, 80), 1, cv2.LINE_AA)
+
+    angle = float(rng.uniform(-6, 6))
+    rotation = cv2.getRotationMatrix2D((label_w / 2, label_h / 2), angle, 1.0)
+    label = cv2.warpAffine(label, rotation, (label_w, label_h), borderValue=(245, 245, 245))
+
+    x = int(rng.integers(0, width - label_w))
+    y = int(rng.integers(0, height - label_h))
+    image[y:y + label_h, x:x + label_w] = label
+    return image
+
+def make_photo_batch(count, seed=0, encoding=".jpg"):
+    """Encoded photo-like images with a small date label and their dates."""
+    rng = random.Random(seed)
+    batch = []
+    for i in range(count):
+        expiry = date.today() + timedelta(days=rng.randint(1, 365))
+        image = render_photo(f"EXP {expiry.strftime('%d/%m/%Y')}", seed=seed + i)
+        ok, encoded = cv2.imencode(encoding, image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise RuntimeError("Could not encode photo image")
+        batch.append((encoded.tobytes(), expiry))
+    return batch
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Synthetic store dataset for load tests
+
+Generates `--stores` x `--products` products with `--days` of history up to
+`--end-date` and bulk-loads them into the database:
+- sales: one row per transaction. Daily demand per product follows its
+  base rate times a store factor, a day-of-week profile, a yearly season
+  per category, a small trend and occasional promotions (Poisson counts),
+  with lunch and after-work peaks during opening hours.
+- stock: `--readings-per-day` shelf sensor readings per product, from a
+  stock level that sells down through the day and is restocked to
+  max_stock in the morning once it falls below min_stock.
+- inventory_lots: one lot per restock, expiring after the category's shelf
+  life; about a third are OCR lots with a confidence.
+- sales_daily: the daily sales rollup, rebuilt from sales for the loaded
+  days once everything is in.
+
+The schema has no store column, so every store gets its own product rows
+("Milk 1kg (Store 3)"). Rows are built as NumPy arrays per block of
+products and inserted with executemany in `--chunk-size` chunks, or with
+LOAD DATA LOCAL INFILE from generated CSV on MySQL (`--method infile`,
+needs local_infile enabled on the server). Output is deterministic for a
+given seed, size and end date.
+
+The sample data scripts (populate_sample_data.py, sample_data_script.py,
+generate_comprehensive_data.py) load a small fixed dataset through
+`load_sample_data`.
+
+Usage:
+    python -m benchmarks.synthetic_dataset --stores 10 --products 500 --days 365 --clear
+    python -m benchmarks.synthetic_dataset --database-url sqlite:///./load.db --stores 50 --products 1000 --days 730
+    python -m benchmarks.synthetic_dataset --stores 20 --products 2000 --method infile --clear
+    python -m benchmarks.synthetic_dataset --stores 10 --products 500 --dry-run
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+# category: (shelf life in days, yearly peak day-of-year, seasonal amplitude, items)
+CATEGORIES = {
+    "Dairy": (10, 200, 0.10, ("Milk", "Yogurt", "Cheese", "Butter", "Cream", "Eggs")),
+    "Bakery": (4, 350, 0.10, ("Bread", "Bagels", "Croissants", "Muffins", "Rolls")),
+    "Fruit": (7, 190, 0.30, ("Apples", "Bananas", "Oranges", "Strawberries", "Grapes")),
+    "Vegetable": (8, 170, 0.25, ("Tomatoes", "Potatoes", "Onions", "Lettuce", "Carrots")),
+    "Meat": (5, 185, 0.15, ("Chicken", "Ground Beef", "Pork Chops", "Sausages")),
+    "Beverage": (60, 200, 0.30, ("Orange Juice", "Apple Juice", "Iced Tea", "Lemonade")),
+}
+VARIANTS = ("", " 500g", " 1kg", " Organic", " Family Pack", " Value")
+
+# Demand multiplier per weekday, Monday first
+WEEKLY = np.array([0.85, 0.80, 0.85, 0.95, 1.15, 1.35, 1.05])
+# Share of a day's transactions per opening hour, 08:00 to 21:00
+HOURLY = np.array([2, 3, 4, 6, 10, 9, 6, 5, 6, 9, 12, 11, 8, 5], dtype=float)
+HOURLY /= HOURLY.sum()
+OPENING_HOUR = 8
+# Mean units per transaction is 1 + BASKET_EXTRA
+BASKET_EXTRA = 0.4
+PROMO_RATE = 0.02
+PROMO_LIFT = 1.8
+OCR_LOT_SHARE = 0.3
+# Products generated together; fixed so output does not depend on batching
+BLOCK_PRODUCTS = 256
+
+SECONDS_PER_DAY = 86400
+
+
+class Catalog:
+    """Per-product arrays for every (store, product) row, store-major."""
+
+    def __init__(self, stores, products, seed):
+        rng = np.random.default_rng([seed, 0])
+        names = list(CATEGORIES)
+        template = np.arange(products)
+        self.category = np.tile(template % len(names), stores)
+        self.shelf_life = np.array([CATEGORIES[names[c]][0] for c in self.category])
+        self.peak = np.array([CATEGORIES[names[c]][1] for c in self.category])
+        self.amplitude = np.array([CATEGORIES[names[c]][2] for c in self.category])
+        base = rng.lognormal(math.log(4.0), 0.8, products)
+        store_factor = rng.lognormal(0.0, 0.3, stores)
+        # Expected units per day at an average time of year
+        self.demand = np.outer(store_factor, base).ravel()
+        self.growth = rng.normal(0.03, 0.05, stores * products)
+        restock_days = np.minimum(self.shelf_life, 4)
+        self.min_stock = np.ceil(2 * self.demand).astype(np.int64) + 1
+        self.max_stock = self.min_stock + np.ceil(self.demand * restock_days).astype(np.int64) + 5
+
+        self.names = []
+        self.barcodes = []
+        for store in range(stores):
+            for product in range(products):
+                category = names[product % len(names)]
+                items = CATEGORIES[category][3]
+                item = items[(product // len(names)) % len(items)]
+                variant = VARIANTS[(product // (len(names) * len(items))) % len(VARIANTS)]
+                edition = product // (len(names) * len(items) * len(VARIANTS))
+                suffix = f" #{edition + 1}" if edition else ""
+                self.names.append(f"{item}{variant}{suffix} (Store {store + 1})")
+                self.barcodes.append(f"9{store + 1:04d}{product + 1:08d}")
+        self.category_names = [names[c] for c in self.category]
+
+    def __len__(self):
+        return len(self.demand)
+
+
+def _timestamps(start, day_index, seconds):
+    """'YYYY-MM-DD HH:MM:SS' strings for day offsets from `start` plus seconds into the day."""
+    moments = np.datetime64(start, "s") + (day_index.astype(np.int64) * SECONDS_PER_DAY + seconds).astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(moments, unit="s"), "T", " ")
+
+
+def _dates(start, day_index):
+    return np.datetime_as_string(np.datetime64(start, "D") + day_index.astype("timedelta64[D]"), unit="D")
+
+
+def generate_block(catalog, rows, start, days, readings_per_day, seed, block):
+    """
+    Sales, sensor readings and lots for catalog rows `rows` (a slice) as
+    column arrays keyed by table, with product ids relative to the catalog.
+    """
+    rng = np.random.default_rng([seed, block + 1])
+    products = np.arange(rows.start, rows.stop)
+    count = len(products)
+    day = np.arange(days)
+    dates = np.datetime64(start, "D") + day
+    weekday = (dates.astype("datetime64[D]").view("int64") - 4) % 7  # 1970-01-01 was a Thursday
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(np.int64) + 1
+
+    yearly = 1 + catalog.amplitude[rows, None] * np.cos(2 * np.pi * (day_of_year[None, :] - catalog.peak[rows, None]) / 365.25)
+    trend = 1 + catalog.growth[rows, None] * (day[None, :] - days) / 365.0
+    promo = np.where(rng.random((count, days)) < PROMO_RATE, PROMO_LIFT, 1.0)
+    expected = catalog.demand[rows, None] * WEEKLY[weekday][None, :] * yearly * np.maximum(trend, 0.1) * promo
+
+    # Sales: Poisson transactions per product-day, 1 + Poisson basket sizes
+    transactions = rng.poisson(expected / (1 + BASKET_EXTRA))
+    cell = np.repeat(np.arange(count * days), transactions.ravel())
+    quantity = 1 + rng.poisson(BASKET_EXTRA, len(cell))
+    hour = rng.choice(len(HOURLY), len(cell), p=HOURLY)
+    seconds = (OPENING_HOUR + hour) * 3600 + rng.integers(0, 3600, len(cell))
+    sale_day = cell % days
+    order = np.lexsort((seconds, sale_day))
+    sales = {
+        "product_id": products[cell // days][order],
+        "timestamp": _timestamps(start, sale_day[order], seconds[order]),
+        "quantity_sold": quantity[order],
+    }
+    units = np.bincount(cell, weights=quantity, minlength=count * days).reshape(count, days).astype(np.int64)
+
+    # Stock: restock to max in the morning when below min, sell down through the day
+    min_stock = catalog.min_stock[rows]
+    max_stock = catalog.max_stock[rows]
+    level = np.zeros(count, dtype=np.int64)
+    opening = np.empty((count, days), dtype=np.int64)
+    lot_product, lot_day, lot_quantity = [], [], []
+    for d in range(days):
+        restock = level < min_stock
+        if restock.any():
+            lot_product.append(np.flatnonzero(restock))
+            lot_day.append(np.full(restock.sum(), d))
+            lot_quantity.append((max_stock - level)[restock])
+            level = np.where(restock, max_stock, level)
+        opening[:, d] = level
+        level = np.maximum(level - units[:, d], 0)
+
+    reading_hours = OPENING_HOUR + np.arange(readings_per_day) * (len(HOURLY) / readings_per_day)
+    sold_share = np.interp(reading_hours - OPENING_HOUR, np.arange(len(HOURLY) + 1), np.concatenate([[0], np.cumsum(HOURLY)]))
+    readings = np.maximum(opening[:, :, None] - np.rint(units[:, :, None] * sold_share[None, None, :]).astype(np.int64), 0)
+    sensor = np.clip(readings / max_stock[:, None, None] + rng.normal(0, 0.01, readings.shape), 0, 1)
+    stock = {
+        "product_id": np.repeat(products, days * readings_per_day),
+        "current_stock": readings.ravel(),
+        "shelf_sensor_value": np.round(sensor.ravel(), 3),
+        "timestamp": _timestamps(
+            start,
+            np.tile(np.repeat(day, readings_per_day), count),
+            np.tile(np.rint(reading_hours * 3600).astype(np.int64), count * days),
+        ),
+    }
+
+    # Lots: one per restock, expiring after the shelf life (+-1 day)
+    lot_rows = np.concatenate(lot_product)
+    lot_days = np.concatenate(lot_day)
+    shelf_life = np.maximum(catalog.shelf_life[rows][lot_rows] + rng.integers(-1, 2, len(lot_rows)), 1)
+    expiry = _dates(start, lot_days + shelf_life)
+    ocr = rng.random(len(lot_rows)) < OCR_LOT_SHARE
+    lots = {
+        "source": np.where(ocr, "ocr", "manual"),
+        "product_id": products[lot_rows],
+        "expiry_date": expiry,
+        "quantity": np.concatenate(lot_quantity),
+        "detected_text": np.where(ocr, np.char.add("EXP ", expiry), None),
+        "confidence": np.where(ocr, np.round(rng.uniform(0.85, 0.99, len(lot_rows)), 3), None),
+        "created_at": _timestamps(start, lot_days, np.full(len(lot_rows), 7 * 3600)),
+    }
+    return {"sales": sales, "stock": stock, "inventory_lots": lots}
+
+
+class BulkLoader:
+    """Inserts column arrays with executemany in chunks, or LOAD DATA LOCAL INFILE on MySQL."""
+
+    def __init__(self, engine, chunk_size, method):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.method = method
+        self.placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+        self.rows = {}
+        self.seconds = 0.0
+
+    def insert(self, table, columns):
+        names = list(columns)
+        arrays = [columns[name] for name in names]
+        total = len(arrays[0])
+        started = time.perf_counter()
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            for offset in range(0, total, self.chunk_size):
+                chunk = [array[offset:offset + self.chunk_size].tolist() for array in arrays]
+                if self.method == "infile":
+                    self._load_infile(cursor, table, names, chunk)
+                else:
+                    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join([self.placeholder] * len(names))})"
+                    cursor.executemany(sql, list(zip(*chunk)))
+                raw.commit()
+            cursor.close()
+        finally:
+            raw.close()
+        self.seconds += time.perf_counter() - started
+        self.rows[table] = self.rows.get(table, 0) + total
+
+    def _load_infile(self, cursor, table, names, chunk):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            for row in zip(*chunk):
+                handle.write(",".join("\\N" if value is None else str(value) for value in row))
+                handle.write("\n")
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{handle.name}' INTO TABLE {table} "
+                f"FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n' ({', '.join(names)})"
+            )
+        finally:
+            os.remove(handle.name)
+
+
+def clear_tables(engine):
+    with engine.begin() as conn:
+        for table in ("sales_daily", "sales", "inventory_lots", "stock", "products"):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+
+def load_dataset(engine, stores, products, days, end_date, seed=0, readings_per_day=4,
+                 chunk_size=50000, method="executemany", dry_run=False, progress=None):
+    """
+    Generate and insert the dataset into `engine` (tables must exist).
+    Returns (rows per table, generation seconds, load seconds).
+    """
+    catalog = Catalog(stores, products, seed)
+    start = end_date - timedelta(days=days - 1)
+    loader = BulkLoader(engine, chunk_size, method)
+
+    if dry_run:
+        first_id = 1
+    else:
+        with engine.connect() as conn:
+            first_id = (conn.execute(text("SELECT MAX(id) FROM products")).scalar() or 0) + 1
+        loader.insert("products", {
+            "id": np.arange(first_id, first_id + len(catalog)),
+            "name": np.array(catalog.names, dtype=object),
+            "barcode": np.array(catalog.barcodes, dtype=object),
+            "category": np.array(catalog.category_names, dtype=object),
+            "min_stock": catalog.min_stock,
+            "max_stock": catalog.max_stock,
+        })
+
+    generating = 0.0
+    counts = {}
+    blocks = range(0, len(catalog), BLOCK_PRODUCTS)
+    for block, first in enumerate(blocks):
+        started = time.perf_counter()
+        tables = generate_block(catalog, slice(first, min(first + BLOCK_PRODUCTS, len(catalog))), start, days, readings_per_day, seed, block)
+        generating += time.perf_counter() - started
+        for table, columns in tables.items():
+            columns["product_id"] = columns["product_id"] + first_id
+            counts[table] = counts.get(table, 0) + len(columns["product_id"])
+            if not dry_run:
+                loader.insert(table, columns)
+        if progress:
+            progress(block + 1, len(blocks), counts)
+    counts = {"products": len(catalog), **counts}
+    return counts, generating, loader.seconds
+
+
+def populate(database_url, stores, products, days, end_date, seed=0, readings_per_day=4, chunk_size=50000,
+             method="executemany", clear=False, dry_run=False, progress=None):
+    """
+    Create the tables if needed, optionally clear them, load the dataset
+    and rebuild sales_daily for the loaded days. Returns (rows per table,
+    generation seconds, load seconds).
+    """
+    connect_args = {"local_infile": True} if method == "infile" else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    try:
+        if not dry_run:
+            from app.db.base import Base
+            import app.db.models  # noqa: F401  (registers the tables)
+            Base.metadata.create_all(engine)
+            if clear:
+                clear_tables(engine)
+        counts, generating, loading = load_dataset(
+            engine, stores, products, days, end_date, seed, readings_per_day, chunk_size, method, dry_run, progress,
+        )
+        if not dry_run:
+            from sqlalchemy.orm import Session
+            from app.services.sales_rollup import rebuild_sales_daily
+            with Session(engine) as db:
+                rollup = rebuild_sales_daily(db, end_date - timedelta(days=days - 1))
+            counts["sales_daily"] = rollup["product_days"]
+            loading += rollup["seconds"]
+    finally:
+        engine.dispose()
+    return counts, generating, loading
+
+
+# The small fixed dataset behind the sample data scripts
+SAMPLE_STORES = 1
+SAMPLE_PRODUCTS = 12
+SAMPLE_DAYS = 30
+
+
+def load_sample_data(database_url=None, clear=False):
+    """
+    Load the sample dataset (SAMPLE_PRODUCTS products with SAMPLE_DAYS days
+    of history up to yesterday) into the app database, unless it already
+    has products and `clear` is not set. Returns the rows per table, or
+    None when skipped.
+    """
+    database_url = database_url or settings.get_database_url
+    if not clear:
+        engine = create_engine(database_url)
+        try:
+            with engine.connect() as conn:
+                existing = conn.execute(text("SELECT COUNT(*) FROM products")).scalar()
+        except Exception:
+            existing = 0
+        finally:
+            engine.dispose()
+        if existing:
+            print(f"Database already has {existing} products; pass --clear to replace them")
+            return None
+    counts, _, _ = populate(
+        database_url, SAMPLE_STORES, SAMPLE_PRODUCTS, SAMPLE_DAYS, date.today() - timedelta(days=1), clear=clear,
+    )
+    for table, rows in counts.items():
+        print(f"{table:<15} {rows:>8,} rows")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.get_database_url, help="sync SQLAlchemy URL (default: the app database)")
+    parser.add_argument("--stores", type=int, default=1)
+    parser.add_argument("--products", type=int, default=100, help="products per store")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today() - timedelta(days=1), help="last day of history (default: yesterday)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--readings-per-day", type=int, default=4, help="shelf sensor readings per product and day")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per executemany / LOAD DATA statement")
+    parser.add_argument("--method", choices=("executemany", "infile"), default="executemany")
+    parser.add_argument("--clear", action="store_true", help="delete existing products, stock, sales, lots and the sales rollup first")
+    parser.add_argument("--dry-run", action="store_true", help="generate only, to time generation")
+    args = parser.parse_args()
+
+    if args.method == "infile" and make_url(args.database_url).get_backend_name() != "mysql":
+        parser.error("--method infile needs a MySQL database")
+
+    def progress(done, total, counts):
+        if done == total or done % 10 == 0:
+            print(f"  block {done}/{total}: " + ", ".join(f"{table} {rows:,}" for table, rows in counts.items()), flush=True)
+
+    print(f"{args.stores} stores x {args.products} products x {args.days} days, seed {args.seed}")
+    started = time.perf_counter()
+    counts, generating, loading = populate(
+        args.database_url, args.stores, args.products, args.days, args.end_date, args.seed,
+        args.readings_per_day, args.chunk_size, args.method, args.clear, args.dry_run, progress,
+    )
+    wall = time.perf_counter() - started
+    total = sum(counts.values())
+    for table, rows in counts.items():
+        print(f"{table:<15} {rows:>12,} rows")
+    print(f"{'total':<15} {total:>12,} rows in {wall:.1f}s ({total / wall:,.0f} rows/s; generate {generating:.1f}s, load {loading:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
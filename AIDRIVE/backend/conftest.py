@@ -0,0 +1,74 @@
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pytest
+
+# The app is served in-process on an in-memory SQLite database unless
+# TEST_DATABASE_URL points elsewhere (e.g. a MySQL test database), or
+# TEST_BASE_URL points at a running server. Set before the app is imported.
+_test_dir = tempfile.mkdtemp(prefix="shelf-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", "sqlite://")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["IMAGE_STORE_DIR"] = os.path.join(_test_dir, "images")
+os.environ["OCR_CACHE_PATH"] = os.path.join(_test_dir, "ocr_cache.sqlite3")
+
+# Checks a running server when run as a script (python test_endpoints.py)
+collect_ignore = ["test_endpoints.py"]
+
+SEED_PRODUCTS = [
+    ("Whole Milk 1L", "SEED0001", "Dairy", 10, 60),
+    ("Cheddar Cheese", "SEED0002", "Dairy", 5, 30),
+    ("Sourdough Bread", "SEED0003", "Bakery", 8, 40),
+    ("Bananas", "SEED0004", "Produce", 20, 120),
+    ("Chicken Breast", "SEED0005", "Meat", 6, 36),
+]
+
+
+def seed_database(db, days=28):
+    """
+    A few products with stock, `days` of daily sales and lots expiring over
+    the next two weeks, so alerts, forecasts and the expiry calendar have
+    data to work on.
+    """
+    from app.db.models import ManualExpiry, Product, Sales, Stock
+    from app.services.sales_rollup import rebuild_sales_daily
+
+    today = date.today()
+    for i, (name, barcode, category, min_stock, max_stock) in enumerate(SEED_PRODUCTS):
+        product = Product(name=name, barcode=barcode, category=category, min_stock=min_stock, max_stock=max_stock)
+        db.add(product)
+        db.flush()
+        db.add(Stock(product_id=product.id, current_stock=min_stock + 3 * i, shelf_sensor_value=0.5))
+        for day in range(days, 0, -1):
+            db.add(Sales(
+                product_id=product.id,
+                timestamp=datetime.combine(today - timedelta(days=day), datetime.min.time()) + timedelta(hours=12),
+                quantity_sold=3 + (i + day) % 5,
+            ))
+        for offset in (1, 5, 12):
+            db.add(ManualExpiry(product_id=product.id, expiry_date=today + timedelta(days=offset + i), quantity=4))
+    db.commit()
+    rebuild_sales_daily(db)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """API client: in-process TestClient on the seeded database, or a running server at TEST_BASE_URL."""
+    if os.environ.get("TEST_BASE_URL"):
+        import httpx
+        with httpx.Client(base_url=os.environ["TEST_BASE_URL"]) as live:
+            yield live
+        return
+
+    from fastapi.testclient import TestClient
+    from app.db.database import SessionLocal
+    from app.main import app
+
+    db = SessionLocal()
+    try:
+        seed_database(db)
+    finally:
+        db.close()
+    with TestClient(app) as test_client:
+        yield test_client
@@ -1,168 +1,544 @@
-import pytest
-from httpx import AsyncClient
 import os
-import sys
-
-# MySQL configuration for tests
-os.environ["DATABASE_TYPE"] = "mysql"
-os.environ["MYSQL_HOST"] = "localhost"
-os.environ["MYSQL_PORT"] = "3306"
-os.environ["MYSQL_USER"] = "root"
-os.environ["MYSQL_PASSWORD"] = "january2023"
-os.environ["MYSQL_DATABASE"] = "shelf_management_test"
-
-# NOTE: You must start the FastAPI server (uvicorn app.main:app --reload) before running these tests.
-BASE_URL = "http://127.0.0.1:8000"
-
-@pytest.mark.asyncio
-async def test_products_crud_and_errors():
-    async with AsyncClient(base_url=BASE_URL) as ac:
-        # Create product
-        resp = await ac.post("/api/v1/products/", json={
-            "name": "Milk",
-            "barcode": "12345678",
-            "category": "Dairy",
-            "min_stock": 5,
-            "max_stock": 50
-        })
-        assert resp.status_code == 201, resp.text
-        product = resp.json()
-        product_id = product["id"]
-
-        # Duplicate barcode
-        resp = await ac.post("/api/v1/products/", json={
-            "name": "Milk2",
-            "barcode": "12345678",
-            "category": "Dairy",
-            "min_stock": 1,
-            "max_stock": 10
-        })
-        assert resp.status_code == 409, resp.text
-        assert "already exists" in resp.json()["detail"]
-
-        # Get product
-        resp = await ac.get(f"/api/v1/products/{product_id}")
-        assert resp.status_code == 200, resp.text
-        assert resp.json()["name"] == "Milk"
-
-        # Update product to duplicate barcode
-        resp = await ac.post("/api/v1/products/", json={
-            "name": "Yogurt",
-            "barcode": "87654321",
-            "category": "Dairy",
-            "min_stock": 2,
-            "max_stock": 20
-        })
-        assert resp.status_code == 201, resp.text
-        other = resp.json()
-        other_id = other["id"]
-
-        # Update product
-        resp = await ac.put(f"/api/v1/products/{product_id}", json={
-            "name": "Updated Milk",
-            "barcode": "12345678",
-            "category": "Dairy",
-            "min_stock": 10,
-            "max_stock": 100
-        })
-        assert resp.status_code == 200, resp.text
-        assert resp.json()["name"] == "Updated Milk"
-
-        # Try to update with duplicate barcode
-        resp = await ac.put(f"/api/v1/products/{product_id}", json={
-            "name": "Updated Milk",
-            "barcode": "87654321",  # This barcode belongs to other product
-            "category": "Dairy",
-            "min_stock": 10,
-            "max_stock": 100
-        })
-        assert resp.status_code == 409, resp.text
-
-        # Get all products
-        resp = await ac.get("/api/v1/products/")
-        assert resp.status_code == 200, resp.text
-        products = resp.json()
-        assert len(products) >= 2
-
-        # Delete product
-        resp = await ac.delete(f"/api/v1/products/{product_id}")
-        assert resp.status_code == 200, resp.text
-
-        # Verify deletion
-        resp = await ac.get(f"/api/v1/products/{product_id}")
-        assert resp.status_code == 404, resp.text
-
-        # Clean up
-        await ac.delete(f"/api/v1/products/{other_id}")
-
-@pytest.mark.asyncio
-async def test_expiry_crud():
-    async with AsyncClient(base_url=BASE_URL) as ac:
-        # First create a product
-        resp = await ac.post("/api/v1/products/", json={
-            "name": "Test Product",
-            "barcode": "TEST123",
-            "category": "Test",
-            "min_stock": 1,
-            "max_stock": 10
-        })
-        assert resp.status_code == 201, resp.text
-        product = resp.json()
-        product_id = product["id"]
-
-        # Create expiry record
-        resp = await ac.post("/api/v1/expiry/", json={
-            "product_id": product_id,
-            "expiry_date": "2024-12-31",
-            "quantity": 5,
-            "batch_number": "BATCH001"
-        })
-        assert resp.status_code == 201, resp.text
-        expiry = resp.json()
-        expiry_id = expiry["id"]
-
-        # Get expiry record
-        resp = await ac.get(f"/api/v1/expiry/{expiry_id}")
-        assert resp.status_code == 200, resp.text
-        assert resp.json()["batch_number"] == "BATCH001"
-
-        # Get all expiry records
-        resp = await ac.get("/api/v1/expiry/")
-        assert resp.status_code == 200, resp.text
-        expiries = resp.json()
-        assert len(expiries) >= 1
-
-        # Update expiry record
-        resp = await ac.put(f"/api/v1/expiry/{expiry_id}", json={
-            "product_id": product_id,
-            "expiry_date": "2024-11-30",
-            "quantity": 3,
-            "batch_number": "BATCH001_UPDATED"
-        })
-        assert resp.status_code == 200, resp.text
-        assert resp.json()["batch_number"] == "BATCH001_UPDATED"
-
-        # Delete expiry record
-        resp = await ac.delete(f"/api/v1/expiry/{expiry_id}")
-        assert resp.status_code == 200, resp.text
-
-        # Clean up
-        await ac.delete(f"/api/v1/products/{product_id}")
-
-@pytest.mark.asyncio
-async def test_alerts():
-    async with AsyncClient(base_url=BASE_URL) as ac:
-        # Test getting alerts
-        resp = await ac.get("/api/v1/alerts/")
-        assert resp.status_code == 200, resp.text
-        alerts = resp.json()
-        assert isinstance(alerts, list)
-
-@pytest.mark.asyncio
-async def test_forecast():
-    async with AsyncClient(base_url=BASE_URL) as ac:
-        # Test getting forecast
-        resp = await ac.get("/api/v1/forecast/")
-        assert resp.status_code == 200, resp.text
-        forecast = resp.json()
-        assert isinstance(forecast, dict) 
\ No newline at end of file
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+# The `client` fixture (conftest.py) serves the app in-process on a seeded
+# in-memory SQLite database. Set TEST_DATABASE_URL to use another database,
+# or TEST_BASE_URL (e.g. http://127.0.0.1:8000) to test a running server.
+
+def test_products_crud_and_errors(client):
+    # Create product
+    resp = client.post("/api/v1/products/", json={
+        "name": "Milk",
+        "barcode": "12345678",
+        "category": "Dairy",
+        "min_stock": 5,
+        "max_stock": 50
+    })
+    assert resp.status_code == 201, resp.text
+    product = resp.json()
+    product_id = product["id"]
+
+    # Duplicate barcode
+    resp = client.post("/api/v1/products/", json={
+        "name": "Milk2",
+        "barcode": "12345678",
+        "category": "Dairy",
+        "min_stock": 1,
+        "max_stock": 10
+    })
+    assert resp.status_code == 409, resp.text
+    assert "already exists" in resp.json()["detail"]
+
+    # Get product
+    resp = client.get(f"/api/v1/products/{product_id}")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["name"] == "Milk"
+
+    # Update product to duplicate barcode
+    resp = client.post("/api/v1/products/", json={
+        "name": "Yogurt",
+        "barcode": "87654321",
+        "category": "Dairy",
+        "min_stock": 2,
+        "max_stock": 20
+    })
+    assert resp.status_code == 201, resp.text
+    other = resp.json()
+    other_id = other["id"]
+
+    # Update product
+    resp = client.put(f"/api/v1/products/{product_id}", json={
+        "name": "Updated Milk",
+        "barcode": "12345678",
+        "category": "Dairy",
+        "min_stock": 10,
+        "max_stock": 100
+    })
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["name"] == "Updated Milk"
+
+    # Try to update with duplicate barcode
+    resp = client.put(f"/api/v1/products/{product_id}", json={
+        "name": "Updated Milk",
+        "barcode": "87654321",  # This barcode belongs to other product
+        "category": "Dairy",
+        "min_stock": 10,
+        "max_stock": 100
+    })
+    assert resp.status_code == 409, resp.text
+
+    # Get all products
+    resp = client.get("/api/v1/products/")
+    assert resp.status_code == 200, resp.text
+    products = resp.json()
+    assert len(products) >= 2
+
+    # Delete product
+    resp = client.delete(f"/api/v1/products/{product_id}")
+    assert resp.status_code == 204, resp.text
+
+    # Verify deletion
+    resp = client.get(f"/api/v1/products/{product_id}")
+    assert resp.status_code == 404, resp.text
+
+    # Clean up
+    client.delete(f"/api/v1/products/{other_id}")
+
+def test_expiry_crud(client):
+    # First create a product
+    resp = client.post("/api/v1/products/", json={
+        "name": "Test Product",
+        "barcode": "TEST123",
+        "category": "Test",
+        "min_stock": 1,
+        "max_stock": 10
+    })
+    assert resp.status_code == 201, resp.text
+    product = resp.json()
+    product_id = product["id"]
+
+    # Create expiry record
+    resp = client.post("/api/v1/manual-expiry/", json={
+        "product_id": product_id,
+        "expiry_date": "2024-12-31",
+        "quantity": 5
+    })
+    assert resp.status_code == 201, resp.text
+    expiry = resp.json()
+    expiry_id = expiry["id"]
+
+    # Get expiry record
+    resp = client.get(f"/api/v1/manual-expiry/{expiry_id}")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["quantity"] == 5
+
+    # Get all expiry records
+    resp = client.get("/api/v1/manual-expiry/")
+    assert resp.status_code == 200, resp.text
+    expiries = resp.json()
+    assert len(expiries) >= 1
+
+    # Update expiry record
+    resp = client.put(f"/api/v1/manual-expiry/{expiry_id}", json={
+        "product_id": product_id,
+        "expiry_date": "2024-11-30",
+        "quantity": 3
+    })
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["expiry_date"] == "2024-11-30"
+    assert resp.json()["quantity"] == 3
+
+    # Delete expiry record
+    resp = client.delete(f"/api/v1/manual-expiry/{expiry_id}")
+    assert resp.status_code == 200, resp.text
+
+    # Clean up
+    client.delete(f"/api/v1/products/{product_id}")
+
+def test_alerts(client):
+    # Test getting alerts
+    resp = client.get("/api/v1/alerts/")
+    assert resp.status_code == 200, resp.text
+    alerts = resp.json()
+    assert isinstance(alerts, list)
+
+def test_forecast(client):
+    # Test getting forecast
+    resp = client.get("/api/v1/forecast/")
+    assert resp.status_code == 200, resp.text
+    forecast = resp.json()
+    assert isinstance(forecast, list)
+    for row in forecast:
+        assert {"product_id", "forecast"} <= row.keys()
+
+def test_expiry_calendar(client):
+    resp = client.get("/api/v1/expiry/calendar", params={"days": 7})
+    assert resp.status_code == 200, resp.text
+    buckets = resp.json()
+    assert isinstance(buckets, list)
+    for bucket in buckets:
+        assert {"expiry_date", "category", "units", "lots"} <= bucket.keys()
+
+def test_product_match(client):
+    resp = client.post("/api/v1/products/", json={
+        "name": "Greek Yogurt",
+        "barcode": "55501234",
+        "category": "Dairy",
+        "min_stock": 1,
+        "max_stock": 10
+    })
+    assert resp.status_code == 201, resp.text
+    product_id = resp.json()["id"]
+
+    resp = client.get("/api/v1/products/match", params={"text": "GREEK Y0GURT EXP 12/05/2027"})
+    assert resp.status_code == 200, resp.text
+    matches = resp.json()
+    assert matches[0]["product_id"] == product_id
+    assert 0 < matches[0]["score"] <= 1
+
+    client.delete(f"/api/v1/products/{product_id}")
+
+def test_ocr_admission(client):
+    resp = client.get("/api/v1/admin/ocr-admission")
+    assert resp.status_code == 200, resp.text
+    stats = resp.json()
+    assert {"in_flight", "queued", "rejected_queue_full", "retry_after"} <= stats["requests"].keys()
+    assert {"pending", "max_pending", "rejected"} <= stats["workers"].keys()
+
+def test_db_pool(client):
+    client.get("/api/v1/products/")
+    resp = client.get("/api/v1/admin/db-pool")
+    assert resp.status_code == 200, resp.text
+    stats = resp.json()
+    assert stats["async"]["checkouts"] >= 1
+    assert {"checkouts", "wait_ms_mean", "timeouts", "pool"} <= stats["sync"].keys()
+
+def test_ocr_upload_expiry_date(client):
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    resp = client.post("/api/v1/ocr-expiry/upload", params={
+        "product_id": product_id, "expiry_date": "2030-01-31", "detected_text": "EXP 31/01/2030"
+    })
+    assert resp.status_code == 201, resp.text
+    assert resp.json()["expiry_date"] == "2030-01-31"
+    lot_id = resp.json()["id"]
+
+    resp = client.post("/api/v1/ocr-expiry/upload", params={"product_id": product_id, "expiry_date": "31/01/2030"})
+    assert resp.status_code == 422, resp.text
+
+    client.delete(f"/api/v1/ocr-expiry/{lot_id}")
+
+def test_sales_bulk(client):
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    body = "\n".join([
+        f'{{"product_id": {product_id}, "quantity_sold": 2, "timestamp": "2026-01-05T10:15:00Z"}}',
+        f'{{"product_id": {product_id}, "quantity_sold": 1}}',
+        f'{{"product_id": {product_id}, "quantity_sold": 0}}',
+        '{"product_id": 999999, "quantity_sold": 1}',
+        "not json",
+    ])
+    headers = {"Content-Type": "application/x-ndjson", "Idempotency-Key": "test-sales-bulk-1"}
+    resp = client.post("/api/v1/sales/bulk", content=body, headers=headers)
+    assert resp.status_code == 200, resp.text
+    result = resp.json()
+    assert (result["received"], result["inserted"], result["rejected"]) == (5, 2, 3)
+    assert [error["line"] for error in result["errors"]] == [3, 4, 5]
+
+    # A retry with the same key stores nothing twice
+    resp = client.post("/api/v1/sales/bulk", content=body, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert (resp.json()["inserted"], resp.json()["duplicate"]) == (0, 2)
+
+    csv_body = f"product_id,quantity_sold,timestamp\n{product_id},3,2026-01-05 11:00:00\n{product_id},x,\n"
+    resp = client.post("/api/v1/sales/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200, resp.text
+    assert (resp.json()["inserted"], resp.json()["rejected"]) == (1, 1)
+
+    resp = client.post("/api/v1/sales/bulk", content="quantity_sold\n1\n", headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 400, resp.text
+
+def test_sales_bulk_limits(client, monkeypatch):
+    from app.core.config import settings
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("changes this process's ingestion limits")
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    row = f'{{"product_id": {product_id}, "quantity_sold": 1, "timestamp": "2026-01-06T10:00:00"}}\n'
+    headers = {"Content-Type": "application/x-ndjson"}
+
+    monkeypatch.setattr(settings, "SALES_BULK_MAX_LINE_BYTES", len(row) + 10)
+    padded = row[:-2] + ', "note": "' + "x" * 100 + '"}\n'
+    resp = client.post("/api/v1/sales/bulk", content=row + padded + row, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert (resp.json()["inserted"], resp.json()["rejected"]) == (2, 1)
+    assert resp.json()["errors"][0]["line"] == 2
+
+    monkeypatch.setattr(settings, "SALES_BULK_MAX_BODY_BYTES", len(row) * 2)
+    resp = client.post("/api/v1/sales/bulk", content=row * 3, headers=headers)
+    assert resp.status_code == 413, resp.text
+    monkeypatch.undo()
+
+    # A retry cut into different chunks is refused
+    key = {**headers, "Idempotency-Key": "chunk-size-test"}
+    assert client.post("/api/v1/sales/bulk", content=row * 3, headers=key).status_code == 200
+    monkeypatch.setattr(settings, "SALES_BULK_CHUNK_ROWS", 2)
+    resp = client.post("/api/v1/sales/bulk", content=row * 3, headers=key)
+    assert resp.status_code == 409, resp.text
+
+def test_fefo_allocation(client):
+    resp = client.post("/api/v1/products/", json={
+        "name": "FEFO Cream", "barcode": "FEFO0001", "category": "Dairy", "min_stock": 1, "max_stock": 10
+    })
+    assert resp.status_code == 201, resp.text
+    product_id = resp.json()["id"]
+    expiry_date = (date.today() + timedelta(days=20)).isoformat()
+    resp = client.post("/api/v1/expiry/manual", json={"product_id": product_id, "expiry_date": expiry_date, "quantity": 5})
+    assert resp.status_code == 201, resp.text
+    lot_id = resp.json()["id"]
+
+    def lot_quantity():
+        return next(lot["quantity"] for lot in client.get("/api/v1/expiry/manual/").json() if lot["id"] == lot_id)
+
+    # Sold units come off the lot as the sales are stored; older sales predate it
+    body = (
+        f'{{"product_id": {product_id}, "quantity_sold": 3}}\n'
+        f'{{"product_id": {product_id}, "quantity_sold": 1, "timestamp": "2025-01-01T10:00:00"}}\n'
+    )
+    resp = client.post("/api/v1/sales/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    assert lot_quantity() == 2
+
+    # Replay only consumes sales not allocated yet, once
+    resp = client.post("/api/v1/expiry/fefo/replay")
+    assert resp.status_code == 200, resp.text
+    resp = client.post("/api/v1/expiry/fefo/replay")
+    assert resp.json() == {"sales_replayed": 0, "lots_updated": 0, "units_consumed": 0}
+    assert lot_quantity() == 2
+
+def test_sales_daily(client):
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    resp = client.get("/api/v1/sales/daily", params={"product_id": product_id, "days": 3})
+    assert resp.status_code == 200, resp.text
+    assert [row["transactions"] for row in resp.json()[:2]] == [1, 1]
+
+    # Bulk uploads add to the rollup, and a rebuild gives the same totals
+    row = f'{{"product_id": {product_id}, "quantity_sold": 4, "timestamp": "2025-03-02T09:00:00"}}\n'
+    resp = client.post("/api/v1/sales/bulk", content=row * 2, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    params = {"product_id": product_id, "days": 1, "end": "2025-03-02"}
+    assert (client.get("/api/v1/sales/daily", params=params).json()[0]["units"]) == 8
+    resp = client.post("/api/v1/admin/sales-daily/rebuild")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["product_days"] > 0
+    day = client.get("/api/v1/sales/daily", params=params).json()[0]
+    assert (day["units"], day["transactions"]) == (8, 2)
+
+def test_sensor_ingest(client):
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    resp = client.put(f"/api/v1/sensors/calibration/{product_id}", json={"tare": 0.5, "unit_weight": 0.25})
+    assert resp.status_code == 200, resp.text
+    assert client.get(f"/api/v1/sensors/calibration/{product_id}").json()["unit_weight"] == 0.25
+
+    resp = client.post("/api/v1/sensors/readings", json=[
+        {"product_id": product_id, "value": 3.0, "timestamp": "2026-03-01T10:00:05Z"},
+        # Arrives late: widens the range but does not replace the value
+        {"product_id": product_id, "value": 2.5, "timestamp": "2026-03-01T10:00:00Z"},
+        {"product_id": -1, "value": 1.0},
+    ])
+    assert resp.status_code == 202, resp.text
+    assert resp.json() == {"accepted": 2, "dropped": 1}
+
+    resp = client.post("/api/v1/admin/sensor-ingest/flush")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["rows_written"] >= 1
+    if not os.environ.get("TEST_BASE_URL"):
+        from app.db.database import SessionLocal
+        from app.db.models import Stock
+
+        db = SessionLocal()
+        try:
+            row = db.query(Stock).filter(Stock.product_id == product_id).order_by(Stock.id.desc()).first()
+        finally:
+            db.close()
+        assert row.current_stock == (3.0 - 0.5) / 0.25 == 10
+        assert (row.shelf_sensor_value, row.sensor_min, row.sensor_max, row.reading_count) == (3.0, 2.5, 3.0, 2)
+    stats = client.get("/api/v1/admin/sensor-ingest").json()
+    assert stats["dropped_invalid"] >= 1
+    assert {"rows_written", "dropped_buffer_full", "latency_ms_max"} <= stats.keys()
+
+def test_background_job_runs(client):
+    resp = client.post("/api/v1/admin/jobs/alerts/run")
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["last_status"] == "success"
+    jobs = {job["name"]: job for job in client.get("/api/v1/admin/jobs").json()}
+    assert jobs["alerts"]["last_status"] == "success"
+    assert {"open", "raised", "resolved"} <= jobs["alerts"]["last_result"].keys()
+    assert jobs["alerts"]["last_worker"]
+    assert client.post("/api/v1/admin/jobs/missing/run").status_code == 404
+
+def test_alert_history(client):
+    resp = client.post("/api/v1/admin/jobs/discounts/run")
+    assert resp.status_code == 200, resp.text
+    resp = client.post("/api/v1/admin/jobs/alerts/run")
+    assert resp.status_code == 200, resp.text
+    current = client.get("/api/v1/alerts/").json()
+    history = client.get("/api/v1/alerts/history", params={"open_only": True}).json()
+    assert len(history) == len(current)
+    for alert in history:
+        assert alert["resolved_at"] is None
+        assert {"type", "product_id", "lot_id", "details", "first_seen_at"} <= alert.keys()
+    assert client.get("/api/v1/alerts/history", params={"limit": 0}).status_code == 422
+
+def test_scan_job_status_from_another_worker(client):
+    from app.services.ocr_jobs import OCRJobQueue, ocr_jobs
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("writes the job row through this process's database connection")
+
+    job = {
+        "job_id": "feedc0de" * 4, "product_id": None, "status": "failed", "created_at": datetime.utcnow(),
+        "finished": time.time(), "result": None, "error": "Could not extract expiry date from image.",
+        "timings": {"ocr": 1.5}, "suggestions": [],
+    }
+    # Saved by a queue in another worker, not held by this process's queue
+    OCRJobQueue(1, 3600, 1)._save_job(job)
+    resp = client.get(f"/api/v1/expiry/scan/jobs/{job['job_id']}", params={"wait": 1})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["status"] == "failed"
+    assert resp.json()["timings"] == {"ocr": 1.5}
+    assert ocr_jobs.status(job["job_id"])["error"] == job["error"]
+    assert client.get("/api/v1/expiry/scan/jobs/unknown").status_code == 404
+
+def test_image_reconcile_keeps_recent_references(client):
+    from app.db.database import SessionLocal
+    from app.db.models import StoredImage
+    from app.services.image_store import PURGE_GRACE_SECONDS, image_store
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("reconciles through this process's database connection")
+    db = SessionLocal()
+    try:
+        # Acquired for a lot that is not inserted yet
+        image = image_store.describe(b"reconcile-test-image")
+        image_id = image_store.acquire(db, [image])[image["sha256"]]
+        db.commit()
+        image_store.reconcile(db)
+        assert db.get(StoredImage, image_id).ref_count == 1
+
+        db.get(StoredImage, image_id).acquired_at = datetime.utcnow() - timedelta(seconds=PURGE_GRACE_SECONDS + 1)
+        db.commit()
+        assert image_store.reconcile(db)["refcounts_fixed"] >= 1
+        db.expire_all()
+        assert db.get(StoredImage, image_id) is None
+    finally:
+        db.close()
+
+def test_image_thumbnail(client):
+    import cv2
+    import numpy as np
+    from app.core.config import settings
+    from app.db.database import SessionLocal
+    from app.services.image_store import image_store
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("stores the image through this process's image store")
+    ok, encoded = cv2.imencode(".png", np.full((600, 900, 3), 120, dtype=np.uint8))
+    content = encoded.tobytes()
+    db = SessionLocal()
+    try:
+        image = image_store.describe(content)
+        image_store.write_bytes(content, image["path"])
+        image_id = image_store.acquire(db, [image])[image["sha256"]]
+        db.commit()
+    finally:
+        db.close()
+
+    # Derivatives are made on first request if ingest has not run yet
+    resp = client.get(f"/api/v1/images/{image_id}/thumbnail")
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"] == "image/webp"
+    assert resp.headers["etag"] == f'"{image["sha256"]}-thumbnail"'
+    thumbnail = cv2.imdecode(np.frombuffer(resp.content, np.uint8), cv2.IMREAD_COLOR)
+    assert max(thumbnail.shape[:2]) == settings.IMAGE_THUMBNAIL_MAX_SIDE
+    assert client.get(f"/api/v1/images/{image_id}").status_code == 200
+
+    os.remove(image_store.derivative_path(image["sha256"], "thumbnail"))
+    resp = client.get(f"/api/v1/images/{image_id}/thumbnail")
+    assert resp.status_code == 404, resp.text
+    assert resp.json()["detail"] == "Image file not found"
+    resp = client.get("/api/v1/images/999999/thumbnail")
+    assert resp.status_code == 404, resp.text
+    assert resp.json()["detail"] == "Image not found"
+
+def _label_files(count, tag):
+    return [("files", (f"{tag}-{i}.jpg", f"{tag}-label-{i}".encode(), "image/jpeg")) for i in range(count)]
+
+def test_ocr_batch_rejections(client, monkeypatch):
+    from app.core.config import settings
+    from app.middlewares.ocr_admission import ocr_admission
+    from app.services.ocr_jobs import ocr_jobs
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("changes this process's OCR limits")
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    data = {"product_id": str(product_id)}
+
+    # More images than OCR_BATCH_MAX_FILES
+    monkeypatch.setattr(settings, "OCR_BATCH_MAX_FILES", 2)
+    resp = client.post("/api/v1/ocr-expiry/batch", files=_label_files(3, "many"), data=data)
+    assert resp.status_code == 413, resp.text
+
+    # A body over the byte limit is refused before it is read
+    monkeypatch.setitem(ocr_admission.limits, "/api/v1/ocr-expiry/batch", 64)
+    resp = client.post("/api/v1/ocr-expiry/batch", files=_label_files(2, "large"), data=data)
+    assert resp.status_code == 413, resp.text
+    monkeypatch.undo()
+
+    # Every worker slot is taken
+    monkeypatch.setattr(ocr_jobs, "_pending", ocr_jobs.max_pending)
+    resp = client.post("/api/v1/ocr-expiry/batch", files=_label_files(2, "full"), data=data)
+    assert resp.status_code == 503, resp.text
+    assert int(resp.headers["Retry-After"]) >= 1
+    monkeypatch.undo()
+
+    # Every request slot is taken and the queue is disabled
+    monkeypatch.setattr(ocr_admission, "max_queued", 0)
+    monkeypatch.setattr(ocr_admission, "in_flight", ocr_admission.max_in_flight)
+    resp = client.post("/api/v1/ocr-expiry/batch", files=_label_files(1, "busy"), data=data)
+    assert resp.status_code == 429, resp.text
+    assert int(resp.headers["Retry-After"]) >= 1
+
+def test_ocr_batch_writes_images_before_commit(client, monkeypatch):
+    from app.services.image_store import image_store
+    from app.services.ocr_jobs import ocr_jobs
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("stubs this process's OCR workers")
+    product_id = client.get("/api/v1/products/").json()[0]["id"]
+    reading = {"expiry_date": "2030-03-31", "detected_text": "EXP 31/03/2030", "confidence": 0.95}
+    monkeypatch.setattr(ocr_jobs, "extract_many", lambda contents, categories=None: [dict(reading) for _ in contents])
+    files = _label_files(2, "stored")
+    paths = [image_store.describe(content)["path"] for _, (_, content, _) in files]
+
+    resp = client.post("/api/v1/ocr-expiry/batch", files=files, data={"product_id": str(product_id)})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["inserted"] == 2
+    assert [result["image_path"] for result in resp.json()["results"]] == paths
+    assert all(os.path.exists(path) for path in paths)
+
+    # The rows are rolled back: files written for them are removed, files already stored stay
+    def fail(db, images):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(image_store, "acquire", fail)
+    files = _label_files(1, "rolled-back") + _label_files(1, "stored")
+    new_path = image_store.describe(files[0][1][1])["path"]
+    resp = client.post("/api/v1/ocr-expiry/batch", files=files, data={"product_id": str(product_id)})
+    assert resp.status_code == 500, resp.text
+    assert not os.path.exists(new_path)
+    assert os.path.exists(paths[0])
+
+def test_scan_job_stores_lot(client):
+    import cv2
+    import numpy as np
+    from app.services.ocr_cache import ocr_cache
+
+    if os.environ.get("TEST_BASE_URL"):
+        pytest.skip("seeds this process's OCR cache")
+    product = client.get("/api/v1/products/").json()[0]
+    ok, encoded = cv2.imencode(".png", np.full((40, 120, 3), 200, dtype=np.uint8))
+    content = encoded.tobytes()
+    # A cached reading, so the scan job stores the lot without running Tesseract
+    ocr_cache.put(ocr_cache.fingerprint(content, category=product["category"]), "2030-02-28", "EXP 28/02/2030", 0.95)
+
+    resp = client.post(
+        "/api/v1/expiry/scan", params={"product_id": product["id"]}, files={"file": ("label.png", content, "image/png")}
+    )
+    assert resp.status_code == 202, resp.text
+    job = client.get(f"/api/v1/expiry/scan/jobs/{resp.json()['job_id']}", params={"wait": 10}).json()
+    assert job["status"] == "done", job
+    lots = {lot["id"]: lot for lot in client.get("/api/v1/expiry/").json()}
+    assert lots[job["result"]["id"]]["expiry_date"] == "2030-02-28"
+    assert lots[job["result"]["id"]]["product_id"] == product["id"]
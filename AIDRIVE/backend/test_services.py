@@ -0,0 +1,812 @@
+# Unit tests for service and utility logic, without the HTTP layer. Tests
+# that need tables use their own in-memory SQLite database.
+
+import asyncio
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import cv2
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.base import Base
+from benchmarks.synthetic_dataset import Catalog, generate_block, load_dataset
+from app.db.models import (
+    Alert, Expiry, InventoryLot, ManualExpiry, OCRExpiry, Product, ProductForecast, SalesDaily, SensorCalibration, Stock,
+    StoredImage,
+)
+from app.services import image_store, ocr_engine, ocr_jobs, sensor_ingest, waste_projection
+from app.services.expiry_logic import apply_discount_logic, record_alerts
+from app.services.fefo_allocator import FEFOAllocator, allocate_sales, fefo_consumption
+from app.services.forecast_model import get_forecasts, refresh_forecasts
+from app.services.ocr_cache import OCRResultCache
+from app.services.sales_ingest import BodyTooLarge, iter_lines
+from app.services.sales_rollup import add_statement, daily_totals
+from app.services.scheduler import CronSchedule, _claim_run, _parse_cron_field
+from app.services.waste_projection import get_waste_projection
+from app.utils.date_utils import find_date_candidates, parse_expiry_date
+from app.utils import image_utils
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _add_lots(db, lots, product_id=1):
+    """Lots as (expiry_date, quantity, created_at); returns their ids."""
+    if db.get(Product, product_id) is None:
+        db.add(Product(id=product_id, name=f"P{product_id}", barcode=f"B{product_id}", category="Dairy", min_stock=1, max_stock=10))
+    rows = [
+        ManualExpiry(product_id=product_id, expiry_date=expiry_date, quantity=quantity, created_at=created_at)
+        for expiry_date, quantity, created_at in lots
+    ]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+
+T0 = datetime(2026, 3, 1, 9, 0)
+
+
+def test_fefo_consumption_skips_expired_lots():
+    # Lot 1 expires on day 2, lot 2 on day 5; the day-3 sale can't use lot 1
+    consumed = fefo_consumption(
+        [date(2026, 3, 2), date(2026, 3, 5)], [5, 5],
+        [T0, T0 + timedelta(days=2), T0 + timedelta(days=6)], [3, 4, 2],
+    )
+    assert consumed.tolist() == [3, 4]
+
+
+def test_fefo_consumption_expiry_day_is_sellable():
+    consumed = fefo_consumption([date(2026, 3, 1)], [5], [datetime(2026, 3, 1, 23, 59)], [2])
+    assert consumed.tolist() == [2]
+
+
+def test_fefo_consumption_lot_created_after_sales():
+    lots = ([date(2026, 3, 10), date(2026, 3, 20)], [5, 5])
+    sales = ([T0, T0 + timedelta(days=2)], [4, 4])
+    # Lot 2 arrives between the sales: the first sale only has lot 1
+    consumed = fefo_consumption(*lots, *sales, lot_created=[T0 - timedelta(days=1), T0 + timedelta(days=1)])
+    assert consumed.tolist() == [5, 3]
+    # Both lots arrive after every sale
+    consumed = fefo_consumption(*lots, *sales, lot_created=[T0 + timedelta(days=5)] * 2)
+    assert consumed.tolist() == [0, 0]
+
+
+def test_fefo_consumption_empty():
+    assert fefo_consumption([], [], [T0], [1]).tolist() == []
+    assert fefo_consumption([date(2026, 3, 2)], [5], [], []).tolist() == [0]
+
+
+def test_allocate_takes_oldest_unexpired_lot(db):
+    expired, first, second = _add_lots(db, [
+        (date(2026, 2, 27), 5, T0 - timedelta(days=10)),
+        (date(2026, 3, 3), 2, T0 - timedelta(days=10)),
+        (date(2026, 3, 8), 5, T0 - timedelta(days=10)),
+    ])
+    allocator = FEFOAllocator()
+    taken, unmatched = allocator.allocate(db, {"product_id": 1, "quantity_sold": 4, "timestamp": T0})
+    assert (taken, unmatched) == ([(first, 2), (second, 2)], 0)
+    taken, unmatched = allocator.allocate(db, {"product_id": 1, "quantity_sold": 5, "timestamp": T0})
+    assert (taken, unmatched) == ([(second, 3)], 2)
+
+    assert allocator.flush(db) == 2
+    db.commit()
+    quantities = {lot.id: lot.quantity for lot in db.query(ManualExpiry)}
+    assert quantities == {expired: 5, first: 0, second: 0}
+
+
+def test_allocate_skips_lots_not_in_stock_yet(db):
+    old, new = _add_lots(db, [
+        (date(2026, 3, 10), 5, T0 - timedelta(days=1)),
+        (date(2026, 3, 5), 5, T0 + timedelta(hours=1)),
+    ])
+    allocator = FEFOAllocator()
+    # The earlier-expiring lot only arrives after this sale
+    assert allocator.allocate(db, {"product_id": 1, "quantity_sold": 2, "timestamp": T0}) == ([(old, 2)], 0)
+    later = {"product_id": 1, "quantity_sold": 2, "timestamp": T0 + timedelta(hours=2)}
+    assert allocator.allocate(db, later) == ([(new, 2)], 0)
+
+
+def test_allocate_sales_subtracts_in_one_update(db):
+    first, second = _add_lots(db, [(date(2026, 3, 3), 3, T0), (date(2026, 3, 9), 3, T0)])
+    sales = [
+        {"product_id": 1, "quantity_sold": 2, "timestamp": T0 + timedelta(hours=5)},
+        {"product_id": 1, "quantity_sold": 2, "timestamp": T0 + timedelta(hours=1)},
+    ]
+    assert allocate_sales(db, sales) == (2, 0)
+    db.commit()
+    assert {lot.id: lot.quantity for lot in db.query(ManualExpiry)} == {first: 0, second: 2}
+
+
+def test_allocator_matches_vectorized_replay(db):
+    rng = np.random.default_rng(7)
+    lots = [
+        (date(2026, 3, 1) + timedelta(days=int(day)), int(quantity), T0 + timedelta(hours=int(hours)))
+        for day, quantity, hours in zip(rng.integers(0, 20, 12), rng.integers(1, 8, 12), rng.integers(-48, 240, 12))
+    ]
+    ids = _add_lots(db, lots)
+    sales = [
+        {"product_id": 1, "quantity_sold": int(units), "timestamp": T0 + timedelta(hours=int(hours))}
+        for units, hours in zip(rng.integers(1, 5, 60), rng.integers(0, 24 * 20, 60))
+    ]
+
+    allocator = FEFOAllocator()
+    allocator.allocate_many(db, sales)
+    sequential = dict.fromkeys(ids, 0)
+    sequential.update(allocator._consumed)
+
+    order = sorted(range(len(lots)), key=lambda i: (lots[i][0], lots[i][2], ids[i]))
+    vectorized = fefo_consumption(
+        [lots[i][0] for i in order], [lots[i][1] for i in order],
+        [sale["timestamp"] for sale in sales], [sale["quantity_sold"] for sale in sales],
+        lot_created=[lots[i][2] for i in order],
+    )
+    assert {ids[i]: int(units) for i, units in zip(order, vectorized)} == sequential
+
+
+def test_waste_projection_uses_sales_history(db):
+    today = date.today()
+    _add_lots(db, [(today + timedelta(days=2), 10, T0)], product_id=1)
+    _add_lots(db, [(today + timedelta(days=1), 4, T0)], product_id=2)
+    # Product 1 sells 2 a day; product 2 has no sales
+    db.add_all(SalesDaily(product_id=1, day=today - timedelta(days=day), units=2, transactions=1) for day in range(1, 29))
+    db.commit()
+
+    projection = get_waste_projection(db, days=5)
+    # 3 days x 2 units sell before product 1's lot expires; all of product 2's lot expires
+    assert projection["products"] == [{"product_id": 1, "expired_units": 4}, {"product_id": 2, "expired_units": 4}]
+    assert [entry["expired_units"] for entry in projection["daily"]] == [0, 4, 4, 0, 0]
+
+
+def test_waste_projection_pool_shutdown(db):
+    _add_lots(db, [(date.today() + timedelta(days=2), 10, T0)])
+    try:
+        projection = waste_projection.get_waste_projection(db, days=3, simulations=20)
+        assert projection["simulations"] == 20
+        pool = waste_projection._pool
+        assert pool is not None
+    finally:
+        waste_projection.shutdown()
+    assert waste_projection._pool is None
+    # The next Monte Carlo request starts a new pool
+    try:
+        waste_projection.get_waste_projection(db, days=3, simulations=4)
+        assert waste_projection._pool not in (None, pool)
+    finally:
+        waste_projection.shutdown()
+
+
+def test_discounts_mark_sellable_expiring_lots(db):
+    today = date.today()
+    expired, expiring, later = _add_lots(db, [
+        (today - timedelta(days=1), 5, T0), (today + timedelta(days=1), 5, T0), (today + timedelta(days=10), 5, T0),
+    ])
+    assert apply_discount_logic(db, percent=25) == {"lots_discounted": 1, "products": [1]}
+    # Already marked down: the next run leaves it alone
+    assert apply_discount_logic(db, percent=50)["lots_discounted"] == 0
+    percents = {lot.id: lot.discount_percent for lot in db.query(ManualExpiry)}
+    assert percents == {expired: None, expiring: 25, later: None}
+
+
+def test_record_alerts_raises_and_resolves(db):
+    today = date.today()
+    first, second = _add_lots(db, [(today + timedelta(days=1), 5, T0), (today + timedelta(days=2), 5, T0)])
+    assert record_alerts(db) == {"open": 2, "raised": 2, "resolved": 0}
+    assert record_alerts(db) == {"open": 2, "raised": 0, "resolved": 0}
+
+    db.get(ManualExpiry, first).quantity = 0
+    db.commit()
+    assert record_alerts(db) == {"open": 1, "raised": 0, "resolved": 1}
+    resolved = db.query(Alert).filter(Alert.lot_id == first).one()
+    assert resolved.resolved_at is not None and resolved.details["quantity"] == 5
+    assert db.query(Alert).filter(Alert.resolved_at.is_(None)).one().lot_id == second
+
+
+def test_forecasts_are_stored(db):
+    _add_lots(db, [], product_id=1)
+    refreshed = refresh_forecasts(db)
+    assert [row["product_id"] for row in refreshed] == [1]
+    assert db.get(ProductForecast, 1).forecast == refreshed[0]["forecast"]
+    # A product added after the refresh is forecast on read
+    _add_lots(db, [], product_id=2)
+    assert [row["product_id"] for row in get_forecasts(db)] == [1, 2]
+    assert db.query(ProductForecast).count() == 1
+
+
+def test_ocr_cache_drops_entries_read_differently(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    cache = OCRResultCache(8, path, 100, -1, config="v1")
+    cache.put(cache.fingerprint(b"label", category="Dairy"), "2026-03-05", "EXP 05/03/26", 0.9)
+    assert cache.get(cache.fingerprint(b"label", category="Dairy"))["expiry_date"] == "2026-03-05"
+    # The same image read for another category misses, and its entry is gone
+    assert cache.get(cache.fingerprint(b"label", category="Bakery")) is None
+    assert cache.get(cache.fingerprint(b"label", category="Dairy")) is None
+    assert cache.metrics["stale_dropped"] == 1
+
+    cache.put(cache.fingerprint(b"label", category="Dairy"), "2026-03-05", "EXP 05/03/26", 0.9)
+    assert OCRResultCache(8, path, 100, -1, config="v1").get(cache.fingerprint(b"label", category="Dairy"))
+    # A cache under another parser version or OCR config drops it from disk
+    reopened = OCRResultCache(8, path, 100, -1, config="v2")
+    assert reopened.get(reopened.fingerprint(b"label", category="Dairy")) is None
+    assert reopened.metrics["stale_dropped"] == 1
+    assert OCRResultCache(8, path, 100, -1, config="v1").get(cache.fingerprint(b"label", category="Dairy")) is None
+
+
+def test_extract_many_feeds_workers_in_windows(monkeypatch):
+    queue = ocr_jobs.OCRJobQueue(workers=2, ttl_seconds=60, max_pending=3)
+    queue._pool = ThreadPoolExecutor(2)
+    peak = []
+
+    def read_expiry(content, category=None):
+        peak.append(queue._pending)
+        return {"expiry_date": None, "detected_text": None, "confidence": 0.0, "timings": {}}
+
+    monkeypatch.setattr(ocr_jobs, "read_expiry", read_expiry)
+    monkeypatch.setattr(ocr_jobs.settings, "OCR_CACHE_ENABLED", False)
+    # More images than max_pending are read rather than refused
+    assert len(queue.extract_many([b"label"] * 8)) == 8
+    assert max(peak) <= 3 and len(peak) == 8
+    assert queue._pending == 0 and queue.metrics["rejected"] == 0
+
+    queue._pending = 3
+    with pytest.raises(ocr_jobs.OCRQueueFull):
+        queue.extract_many([b"label"])
+    queue.shutdown()
+
+
+def _lines(pieces, **limits):
+    async def stream():
+        for piece in pieces:
+            yield piece
+
+    async def collect():
+        return [item async for item in iter_lines(stream(), **limits)]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("pieces, expected", [
+    ([b"a\nbb\n", b"ccc"], [(1, b"a"), (2, b"bb"), (3, b"ccc")]),
+    ([b"a", b"b\nc", b"\n"], [(1, b"ab"), (2, b"c")]),
+    # Too long within one piece, across pieces, and as the last line
+    ([b"ok\n0123456789\nok\n"], [(1, b"ok"), (2, None), (3, b"ok")]),
+    ([b"01234", b"56789", b"01\nok"], [(1, None), (2, b"ok")]),
+    ([b"ok\n", b"0123456", b"789"], [(1, b"ok"), (2, None)]),
+])
+def test_iter_lines(pieces, expected):
+    assert _lines(pieces, max_line_bytes=8) == expected
+
+
+def test_iter_lines_body_limit():
+    assert len(_lines([b"a\n"] * 4, max_body_bytes=8)) == 4
+    with pytest.raises(BodyTooLarge):
+        _lines([b"a\n"] * 5, max_body_bytes=8)
+
+
+
+def test_sales_daily_upsert_adds(db):
+    _add_lots(db, [], product_id=1)
+    rows = [{"product_id": 1, "quantity_sold": 2, "timestamp": T0}, {"product_id": 1, "quantity_sold": 3, "timestamp": T0}]
+    db.execute(add_statement("sqlite"), daily_totals(rows))
+    db.execute(add_statement("sqlite"), daily_totals(rows[:1]))
+    row = db.query(SalesDaily).one()
+    assert (row.day, row.units, row.transactions) == (T0.date(), 7, 3)
+    with pytest.raises(ValueError, match="postgresql"):
+        add_statement("postgresql")
+
+def test_sensor_flush_failure_keeps_readings(db, monkeypatch):
+    _add_lots(db, [], product_id=1)
+    db.add(SensorCalibration(product_id=1, tare=0.5, unit_weight=0.25))
+    db.commit()
+    ingest = sensor_ingest.SensorIngest(flush_interval=60, max_products=10)
+    ingest.submit_many([(1, 3.0, T0), (1, 2.0, T0 - timedelta(seconds=5))])
+
+    # A database without tables: the flush fails and keeps the window
+    monkeypatch.setattr(sensor_ingest, "SessionLocal", sessionmaker(bind=create_engine("sqlite://")))
+    assert ingest.flush() == 0
+    assert ingest.stats()["flush_failures"] == 1
+    ingest.submit_many([(1, 2.75, T0 + timedelta(seconds=5))])
+    assert ingest.stats()["buffered_readings"] == 3
+
+    monkeypatch.setattr(sensor_ingest, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    assert ingest.flush() == 1
+    row = db.query(Stock).one()
+    assert (row.shelf_sensor_value, row.sensor_min, row.sensor_max, row.reading_count) == (2.75, 2.0, 3.0, 3)
+    assert row.current_stock == (2.75 - 0.5) / 0.25 == 9
+
+
+TODAY = date(2026, 1, 10)
+
+
+@pytest.mark.parametrize("text, expected, fmt", [
+    ("EXP 2026-03-15", date(2026, 3, 15), "%Y-%m-%d"),
+    ("EXP 15/03/2026", date(2026, 3, 15), "%d/%m/%Y"),
+    ("EXP 15.03.26", date(2026, 3, 15), "%d.%m.%y"),
+    ("USE BY 03/15/2026", date(2026, 3, 15), "%m/%d/%Y"),
+    ("BEST BEFORE 20260315", date(2026, 3, 15), "%Y%m%d"),
+    ("EXP 15 MAR 2026", date(2026, 3, 15), "%d %b %Y"),
+    ("BEST BEFORE 31ST MAR 2026", date(2026, 3, 31), "%d %b %Y"),
+    ("EXP12JAN27", date(2027, 1, 12), "%d %b %y"),
+    ("MAR 15, 2026", date(2026, 3, 15), "%b %d %Y"),
+    # Month and year only: good until the end of the month
+    ("BB JAN 2026", date(2026, 1, 31), "%b %Y"),
+    ("BB FEB 28", date(2028, 2, 29), "%b %y"),
+    # The expiry keyword beats the manufacturing date, in either order
+    ("MFG 01/12/2025 EXP 01/03/2026", date(2026, 3, 1), "%d/%m/%Y"),
+    ("EXP 05/02/26 MFG 05/11/25", date(2026, 2, 5), "%d/%m/%y"),
+    ("PKD 10-01-2026 USE BY 20-01-2026", date(2026, 1, 20), "%d-%m-%Y"),
+    # Ambiguous day and month: dd/mm is preferred
+    ("EXP 03/04/26", date(2026, 4, 3), "%d/%m/%y"),
+])
+def test_parse_expiry_date(text, expected, fmt):
+    assert parse_expiry_date(text, today=TODAY, category="Dairy") == expected
+    best = find_date_candidates(text, today=TODAY, category="Dairy")[0]
+    assert (best["date"], best["format"]) == (expected, fmt)
+    assert text[best["span"][0]:best["span"][1]].upper() == best["text"]
+
+
+@pytest.mark.parametrize("text", ["EXP 31/02/2026", "EXP 30 FEB 2026", "EXP 15/13/2026", "LOT 12345", "no date here", "", None])
+def test_parse_expiry_date_invalid(text):
+    assert parse_expiry_date(text, today=TODAY) is None
+    assert find_date_candidates(text, today=TODAY) == []
+
+
+def test_parse_expiry_date_category_window():
+    # Mar 2 is beyond bakery's 30-day shelf life, Feb 3 is not
+    assert parse_expiry_date("EXP 02/03/26", today=TODAY, category="Bakery") == date(2026, 2, 3)
+    assert parse_expiry_date("EXP 02/03/26", today=TODAY, category="Dairy") == date(2026, 3, 2)
+
+
+
+def _future(days, fmt="%d/%m/%Y"):
+    return (date.today() + timedelta(days=days)).strftime(fmt)
+
+
+def test_rank_expiry_candidates_by_confidence():
+    text, ranked = ocr_engine.rank_expiry_candidates(
+        [("EXP", 90), (_future(20), 40), ("EXP", 95), (_future(40), 90)], category="Dairy"
+    )
+    assert text == f"EXP {_future(20)} EXP {_future(40)}"
+    # Equal parser scores: the date read with higher word confidence wins
+    assert ranked[0]["score"] == ranked[1]["score"]
+    assert [(c["text"], c["confidence"]) for c in ranked[:2]] == [(_future(40), 0.9), (_future(20), 0.4)]
+
+
+def test_rank_expiry_candidates_confidence_rules():
+    # The lowest confidence over the words a date spans
+    day, month, year = _future(60, "%d %b %Y").upper().split()
+    _, ranked = ocr_engine.rank_expiry_candidates([("EXP", 99), (day, 90), (month, 55), (year, 80)])
+    assert (ranked[0]["text"], ranked[0]["confidence"]) == (f"{day} {month} {year}", 0.55)
+    # Halved outside the category's shelf-life window
+    _, ranked = ocr_engine.rank_expiry_candidates([("EXP", 90), ("15/03/2019", 80)])
+    assert not ranked[0]["plausible"] and ranked[0]["confidence"] == 0.4
+    assert ocr_engine.rank_expiry_candidates([("LOT", 90), ("12345", 90)])[1] == []
+
+
+def _stub_ocr(monkeypatch, reads):
+    """find_expiry over one stub step per entry in `reads`: (stage, words)."""
+    calls = []
+    steps = [(stage, np.zeros((4, 4), dtype=np.uint8), 7) for stage, _ in reads]
+    words = dict(reads)
+    monkeypatch.setattr(ocr_engine, "iter_ocr_candidates", lambda image: iter(steps))
+
+    def image_to_data(image, psm=None):
+        stage = steps[len(calls)][0]
+        calls.append(stage)
+        return words[stage]
+
+    monkeypatch.setattr(ocr_engine, "image_to_data", image_to_data)
+    return calls
+
+
+def test_find_expiry_stops_at_confident_date(monkeypatch):
+    calls = _stub_ocr(monkeypatch, [
+        ("region@32", [("EXP", 95), (_future(10), 92)]),
+        ("full_frame", [("EXP", 95), (_future(30), 99)]),
+    ])
+    expiry, stats = ocr_engine.find_expiry(np.zeros((4, 4), dtype=np.uint8), threshold=0.8)
+    assert calls == ["region@32"]
+    assert expiry == (date.today() + timedelta(days=10)).isoformat()
+    assert (stats["attempts"], stats["stage"], stats["confidence"]) == (1, "region@32", 0.92)
+
+
+def test_find_expiry_escalates_when_unsure(monkeypatch):
+    calls = _stub_ocr(monkeypatch, [
+        ("region@32", [("EXP", 95), (_future(10), 50)]),
+        ("full_frame", [("LOT", 95), ("12345", 95)]),
+        ("enhanced@48", [("EXP", 95), (_future(12), 85)]),
+        ("sparse", [("EXP", 95), (_future(14), 99)]),
+    ])
+    expiry, stats = ocr_engine.find_expiry(np.zeros((4, 4), dtype=np.uint8), threshold=0.8)
+    assert calls == ["region@32", "full_frame", "enhanced@48"]
+    assert expiry == (date.today() + timedelta(days=12)).isoformat()
+    assert (stats["attempts"], stats["stage"], stats["confidence"]) == (3, "enhanced@48", 0.85)
+
+    # Nothing reaches the threshold: every step runs and the best read wins
+    calls.clear()
+    expiry, stats = ocr_engine.find_expiry(np.zeros((4, 4), dtype=np.uint8), threshold=1.0)
+    assert len(calls) == 4
+    assert (expiry, stats["stage"]) == ((date.today() + timedelta(days=14)).isoformat(), "sparse")
+
+
+def test_read_expiry_undecodable_image(monkeypatch):
+    monkeypatch.setattr(ocr_engine.settings, "OCR_MIN_CONFIDENCE", 0.5)
+    result = ocr_engine.read_expiry(b"not an image")
+    assert (result["expiry_date"], result["detected_text"], result["confidence"]) == (None, None, 0.0)
+
+
+def _label(text="EXP 12/05/2099"):
+    image = np.full((300, 600, 3), 255, dtype=np.uint8)
+    cv2.putText(image, text, (60, 180), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return image
+
+
+def test_ocr_candidates_start_with_detected_text_lines():
+    image = _label()
+    [((cx, cy), _, _)] = image_utils.find_text_regions(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    assert 60 < cx < 460 and 140 < cy < 190
+    stages = [stage for stage, _, _ in image_utils.iter_ocr_candidates(image)]
+    assert stages == ["region@40", "region@64", "full_frame", "enhanced@64", "enhanced@96", "sparse"]
+    # Without text lines only the whole-frame passes are left
+    blank = np.full((300, 600, 3), 255, dtype=np.uint8)
+    assert [stage for stage, _, _ in image_utils.iter_ocr_candidates(blank)] == ["full_frame", "sparse"]
+
+
+def test_find_expiry_stops_at_first_detected_line(monkeypatch):
+    fed = []
+
+    def image_to_data(image, psm=None):
+        fed.append((image.shape, psm))
+        return [("EXP", 96), (_future(60), 93)]
+
+    monkeypatch.setattr(ocr_engine, "image_to_data", image_to_data)
+    expiry, stats = ocr_engine.find_expiry(_label(), threshold=0.9)
+    assert expiry == (date.today() + timedelta(days=60)).isoformat()
+    # Only the first text-line crop was OCRed, not the whole frame
+    [(shape, psm)] = fed
+    assert psm == 7 and shape[0] < 100
+    assert (stats["attempts"], stats["stage"], stats["pixels"]) == (1, "region@40", shape[0] * shape[1])
+    assert set(stats["timings"]) == {"detect", "region@40"}
+
+
+class _FakeTessAPI:
+    """Stands in for tesserocr.PyTessBaseAPI, counting instances."""
+    instances = []
+
+    def __init__(self, psm, path=None):
+        self.variables, self.modes, self.image = {}, [], None
+        _FakeTessAPI.instances.append(self)
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetPageSegMode(self, psm):
+        self.modes.append(psm)
+
+    def SetImageBytes(self, data, width, height, channels, stride):
+        self.image = (len(data), width, height, channels, stride)
+
+    def GetUTF8Text(self):
+        return "EXP 01/02/2099\n"
+
+    def Recognize(self):
+        pass
+
+    def GetIterator(self):
+        return None
+
+
+class _FakeTessWord:
+    def __init__(self, text, confidence):
+        self.text, self.confidence = text, confidence
+
+    def GetUTF8Text(self, level):
+        if self.text is None:
+            raise RuntimeError("no text")
+        return self.text
+
+    def Confidence(self, level):
+        return self.confidence
+
+
+def test_tesserocr_backend_keeps_one_api_per_thread(monkeypatch):
+    words = [_FakeTessWord("EXP", 95.0), _FakeTessWord(None, 0.0), _FakeTessWord(" ", 10.0), _FakeTessWord("01/02/2099", 88.0)]
+    fake = type("tesserocr", (), {
+        "PyTessBaseAPI": _FakeTessAPI,
+        "RIL": type("RIL", (), {"WORD": 3}),
+        "iterate_level": staticmethod(lambda iterator, level: iter(words)),
+    })
+    monkeypatch.setattr(_FakeTessAPI, "instances", [])
+    monkeypatch.setattr(ocr_engine, "tesserocr", fake, raising=False)
+    monkeypatch.setattr(ocr_engine, "TESSEROCR_AVAILABLE", True)
+    monkeypatch.setattr(ocr_engine, "_local", threading.local())
+    monkeypatch.setattr(ocr_engine.settings, "OCR_BACKEND", "tesserocr")
+    monkeypatch.setattr(ocr_engine.settings, "OCR_CHAR_WHITELIST", "0123456789/EXP ")
+
+    def no_pytesseract(*args, **kwargs):
+        raise AssertionError("pytesseract used with the tesserocr backend")
+
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", no_pytesseract)
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_data", no_pytesseract)
+    image = np.zeros((10, 20, 3), dtype=np.uint8)
+
+    assert ocr_engine.image_to_text(image) == "EXP 01/02/2099\n"
+    assert ocr_engine.image_to_data(image[:, :, 0], psm=11) == [("EXP", 95.0), ("01/02/2099", 88.0)]
+    # Both reads went through the same Tesseract instance
+    [api] = _FakeTessAPI.instances
+    assert api.variables == {"tessedit_char_whitelist": "0123456789/EXP "}
+    assert api.modes == [ocr_engine.settings.OCR_PSM, 11]
+    assert api.image == (200, 20, 10, 1, 20)
+
+    # Another thread gets its own instance
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(ocr_engine.image_to_text, image).result()
+    assert len(_FakeTessAPI.instances) == 2
+
+    # Readings cached under one backend are not reused under the other
+    version = ocr_engine.config_version()
+    monkeypatch.setattr(ocr_engine, "TESSEROCR_AVAILABLE", False)
+    assert ocr_engine.config_version() != version
+
+
+def test_tesserocr_backend_falls_back_to_pytesseract(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "TESSEROCR_AVAILABLE", False)
+    monkeypatch.setattr(ocr_engine.settings, "OCR_BACKEND", "tesserocr")
+    monkeypatch.setattr(ocr_engine.settings, "OCR_CHAR_WHITELIST", "0123456789 /")
+    configs = []
+
+    def image_to_string(image, config):
+        configs.append(config)
+        return "01/02/2099"
+
+    monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", image_to_string)
+    assert ocr_engine.image_to_text(np.zeros((10, 20), dtype=np.uint8), psm=7) == "01/02/2099"
+    assert configs == ["--psm 7 -c 'tessedit_char_whitelist=0123456789 /'"]
+
+@pytest.mark.parametrize("field, low, high, expected", [
+    ("*", 0, 6, set(range(7))),
+    ("*/15", 0, 59, {0, 15, 30, 45}),
+    ("1-5", 0, 7, {1, 2, 3, 4, 5}),
+    ("1,3,5", 1, 31, {1, 3, 5}),
+    ("10-20/5", 0, 59, {10, 15, 20}),
+    ("0,30-32", 0, 59, {0, 30, 31, 32}),
+])
+def test_cron_field(field, low, high, expected):
+    assert _parse_cron_field(field, low, high) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "*/0 * * * *", "a * * * *"])
+def test_cron_invalid(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2026, 3, 1, 9, 7, 30), datetime(2026, 3, 1, 9, 15)),
+    ("*/15 * * * *", datetime(2026, 3, 1, 9, 15), datetime(2026, 3, 1, 9, 30)),
+    ("0 2 * * *", datetime(2026, 3, 1, 2, 0), datetime(2026, 3, 2, 2, 0)),
+    ("30 3 1 * *", datetime(2026, 1, 31, 12, 0), datetime(2026, 2, 1, 3, 30)),
+    ("0 0 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29)),
+    # Weekday only: 2026-03-01 is a Sunday (0 and 7 both mean Sunday)
+    ("0 9 * * 1", datetime(2026, 3, 1, 10, 0), datetime(2026, 3, 2, 9, 0)),
+    ("0 9 * * 0", datetime(2026, 3, 2), datetime(2026, 3, 8, 9, 0)),
+    ("0 9 * * 7", datetime(2026, 3, 2), datetime(2026, 3, 8, 9, 0)),
+    # Both day fields restricted: the 13th or any Friday, whichever comes first
+    ("0 0 13 * 5", datetime(2026, 3, 1), datetime(2026, 3, 6)),
+    ("0 0 13 * 5", datetime(2026, 3, 10), datetime(2026, 3, 13)),
+    ("0 0 1,15 * 1", datetime(2026, 3, 3), datetime(2026, 3, 9)),
+    # A step from `*` counts as unrestricted: odd days that are Mondays
+    ("0 0 */2 * 1", datetime(2026, 3, 1), datetime(2026, 3, 9)),
+])
+def test_cron_next_after(expression, after, expected):
+    assert CronSchedule(expression).next_after(after) == expected
+
+
+def test_cron_never_fires():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2026, 1, 1))
+
+
+def test_claim_run_once_per_fire_time(db):
+    fire_time = datetime.now().replace(second=0, microsecond=0)
+    assert _claim_run(db, "alerts", fire_time).worker
+    # A second worker for the same fire time skips it; the next one is free
+    assert _claim_run(db, "alerts", fire_time) is None
+    assert _claim_run(db, "forecast", fire_time) is not None
+    assert _claim_run(db, "alerts", fire_time + timedelta(minutes=15)) is not None
+
+
+
+# The pre-ledger tables as 07/08_*.sql and mysql_schema.sql created them
+PRE_LEDGER_TABLES = (
+    "CREATE TABLE expiry (id INTEGER PRIMARY KEY, product_id INT NOT NULL, expiry_date DATE NOT NULL,"
+    " image_path VARCHAR(500), detected_text TEXT)",
+    "CREATE TABLE manual_expiry (id INTEGER PRIMARY KEY, product_id INT NOT NULL, expiry_date DATE NOT NULL,"
+    " quantity INT DEFAULT 1, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE ocr_expiry (id INTEGER PRIMARY KEY, product_id INT NOT NULL, expiry_date DATE NOT NULL,"
+    " detected_text VARCHAR(500), image_path VARCHAR(255), quantity INT DEFAULT 1,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+)
+
+
+def _migrate_to_ledger(db):
+    """Run 09_create_inventory_lots_table.sql, with its MySQL RENAME TABLE as SQLite renames."""
+    with open(os.path.join(os.path.dirname(__file__), "09_create_inventory_lots_table.sql")) as f:
+        script = "\n".join(line for line in f if not line.lstrip().startswith("--"))
+    for statement in filter(None, (part.strip() for part in script.split(";"))):
+        if statement.startswith("USE") or statement.startswith("SELECT"):
+            continue
+        if statement.startswith("CREATE TABLE"):
+            # inventory_lots comes from the models, with the later columns
+            continue
+        if statement.startswith("RENAME TABLE"):
+            for old, new in re.findall(r"(\w+) TO (\w+)", statement):
+                db.execute(text(f"ALTER TABLE {old} RENAME TO {new}"))
+            continue
+        db.execute(text(statement))
+    db.commit()
+
+
+def test_inventory_lots_backfill_and_views(db):
+    _add_lots(db, [], product_id=1)
+    for statement in PRE_LEDGER_TABLES:
+        db.execute(text(statement))
+    db.execute(text(
+        "INSERT INTO expiry VALUES (7, 1, '2026-03-01', 'images/a.jpg', 'EXP 01/03/26')"
+    ))
+    db.execute(text(
+        "INSERT INTO manual_expiry VALUES (3, 1, '2026-03-02', 6, '2026-02-01 10:00:00'),"
+        " (4, 1, '2026-03-04', NULL, '2026-02-02 10:00:00')"
+    ))
+    db.execute(text(
+        "INSERT INTO ocr_expiry VALUES (3, 1, '2026-03-03', 'BB 03.03.26', 'images/b.jpg', 2, '2026-02-03 10:00:00')"
+    ))
+    _migrate_to_ledger(db)
+
+    # One ledger, each row loaded as the class for its source
+    lots = {(type(lot), lot.legacy_id): lot for lot in db.query(InventoryLot)}
+    assert set(lots) == {(Expiry, 7), (ManualExpiry, 3), (ManualExpiry, 4), (OCRExpiry, 3)}
+    assert lots[(ManualExpiry, 4)].quantity == 1
+    assert lots[(OCRExpiry, 3)].detected_text == "BB 03.03.26"
+    assert lots[(ManualExpiry, 3)].created_at == datetime(2026, 2, 1, 10, 0)
+    # Subclass queries only see their own source
+    assert [lot.legacy_id for lot in db.query(ManualExpiry).order_by(ManualExpiry.legacy_id)] == [3, 4]
+    assert [lot.expiry_date for lot in db.query(OCRExpiry)] == [date(2026, 3, 3)]
+    assert [lot.image_path for lot in db.query(Expiry)] == ["images/a.jpg"]
+
+    # Lots added through the models show up under the old names, with the old columns
+    new = OCRExpiry(product_id=1, expiry_date=date(2026, 3, 9), quantity=3, detected_text="EXP 09/03/26")
+    db.add(new)
+    db.commit()
+    rows = db.execute(text("SELECT id, product_id, expiry_date, detected_text, image_path, quantity FROM ocr_expiry ORDER BY id")).all()
+    assert [(row.id, row.detected_text, row.quantity) for row in rows] == [
+        (lots[(OCRExpiry, 3)].id, "BB 03.03.26", 2), (new.id, "EXP 09/03/26", 3),
+    ]
+    rows = db.execute(text("SELECT id, expiry_date, quantity FROM manual_expiry ORDER BY expiry_date")).all()
+    assert [(str(row.expiry_date), row.quantity) for row in rows] == [("2026-03-02", 6), ("2026-03-04", 1)]
+    assert db.execute(text("SELECT detected_text FROM expiry")).scalars().all() == ["EXP 01/03/26"]
+    # The join used by the alert views in 06_create_views_and_procedures.sql
+    joined = db.execute(text("SELECT p.name, e.expiry_date FROM products p LEFT JOIN expiry e ON p.id = e.product_id")).all()
+    assert [(row.name, str(row.expiry_date)) for row in joined] == [("P1", "2026-03-01")]
+    # The originals are kept for checking the backfill
+    assert db.execute(text("SELECT COUNT(*) FROM manual_expiry_pre_ledger")).scalar() == 2
+
+def _png(height, width, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(".png", pixels)[1].tobytes()
+
+
+def _age(path, seconds=image_store.PURGE_GRACE_SECONDS + 60):
+    """Backdate a file past the purge grace period."""
+    stamp = os.path.getmtime(path) - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_image_ingest_dedups_and_makes_derivatives(db, tmp_path, monkeypatch):
+    store = image_store.ImageStore(str(tmp_path), chunk_size=4096)
+    content = _png(300, 400)
+    first = store.save_stream(io.BytesIO(content))
+    second = store.save_stream(io.BytesIO(content))
+    assert first == second and first["path"].endswith(".png")
+    stored = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert stored == [os.path.basename(first["path"])]
+
+    # Two lots using the same upload share one row
+    ids = store.acquire(db, [first, second])
+    db.commit()
+    image = db.get(StoredImage, ids[first["sha256"]])
+    assert image.ref_count == 2
+
+    monkeypatch.setattr(image_store, "SessionLocal", sessionmaker(bind=db.get_bind()))
+    monkeypatch.setattr(image_store.settings, "IMAGE_THUMBNAIL_MAX_SIDE", 64)
+    assert store.ingest([image.id]) == 1
+    # Already made: a second ingest has nothing to do
+    assert store.ingest([image.id]) == 0
+    db.expire_all()
+    thumbnail = cv2.imread(image.thumbnail_path)
+    assert max(thumbnail.shape[:2]) == 64
+    assert cv2.imread(image.display_path).shape[:2] == (300, 400)
+
+
+@pytest.mark.parametrize("mode", ["recompress", "purge"])
+def test_image_archive(db, tmp_path, monkeypatch, mode):
+    store = image_store.ImageStore(str(tmp_path), chunk_size=4096)
+    monkeypatch.setattr(image_store.settings, "IMAGE_ARCHIVE_MAX_SIDE", 200)
+    monkeypatch.setattr(image_store.settings, "IMAGE_DISPLAY_MAX_SIDE", 300)
+    saved = store.save_stream(io.BytesIO(_png(400, 600)))
+    image_id = store.acquire(db, [saved, saved])[saved["sha256"]]
+    lot_ids = _add_lots(db, [(date(2026, 3, 5), 1, T0), (date(2026, 3, 6), 1, T0)])
+    for lot_id in lot_ids:
+        lot = db.get(ManualExpiry, lot_id)
+        lot.image_id, lot.image_path = image_id, saved["path"]
+    image = db.get(StoredImage, image_id)
+    image.created_at = datetime.utcnow() - timedelta(days=31)
+    db.commit()
+    _age(saved["path"])
+
+    result = store.archive(db, retention_days=30, mode=mode)
+    assert result["derivatives_made"] == 1 and result["originals_archived"] == 1
+    db.expire_all()
+    image = db.get(StoredImage, image_id)
+    assert image.archived_at is not None
+    assert not os.path.exists(saved["path"])
+    if mode == "purge":
+        assert image.path == image.display_path
+        assert result["bytes_freed"] == saved["size_bytes"]
+    else:
+        assert image.path == store.derivative_path(saved["sha256"], "archive")
+        assert max(cv2.imread(image.path).shape[:2]) == 200
+        assert result["bytes_freed"] == saved["size_bytes"] - image.size_bytes > 0
+    assert image.size_bytes == os.path.getsize(image.path)
+    # Lots follow the image to its new path; references are unchanged
+    assert {lot.image_path for lot in db.query(ManualExpiry)} == {image.path}
+    assert image.ref_count == 2
+    assert store.archive(db, retention_days=30, mode=mode)["originals_archived"] == 0
+
+    # Releasing a lot drops a reference; uploading the image again restores the original
+    store.release(db, image_id)
+    db.commit()
+    db.expire_all()
+    assert db.get(StoredImage, image_id).ref_count == 1
+    again = store.save_stream(io.BytesIO(_png(400, 600)))
+    store.acquire(db, [again])
+    db.commit()
+    db.expire_all()
+    image = db.get(StoredImage, image_id)
+    assert (image.ref_count, image.path, image.archived_at) == (2, saved["path"], None)
+
+
+
+def test_synthetic_dataset_is_deterministic():
+    catalog = Catalog(stores=2, products=5, seed=7)
+    first, again, other = (
+        generate_block(catalog, slice(0, 10), date(2026, 1, 1), 14, 3, seed, block=0) for seed in (7, 7, 8)
+    )
+    for table, columns in first.items():
+        for name, values in columns.items():
+            assert np.array_equal(values, again[table][name]), (table, name)
+    assert not np.array_equal(first["sales"]["timestamp"], other["sales"]["timestamp"])
+    assert Catalog(stores=2, products=5, seed=7).names == catalog.names
+
+
+def test_synthetic_dataset_load(db):
+    engine = db.get_bind()
+    counts, _, _ = load_dataset(engine, stores=1, products=6, days=10, end_date=date(2026, 3, 10), seed=1, readings_per_day=2)
+    assert counts["products"] == 6 and counts["stock"] == 6 * 10 * 2
+    assert counts["sales"] > 0 and counts["inventory_lots"] >= 6
+    for table, rows in counts.items():
+        assert db.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() == rows, table
+    assert db.execute(text("SELECT MIN(timestamp) >= '2026-03-01', MAX(timestamp) < '2026-03-11' FROM sales")).one() == (1, 1)
+    assert {lot.source for lot in db.query(InventoryLot)} <= {"manual", "ocr"}